@@ -0,0 +1,159 @@
+"""
+k-NN-Graph "ähnliche Chats" über die Chat-Embeddings aus Chroma, gespeichert in chat_nachbarn.
+Die Web-App liest die Nachbarn nur noch aus der DB – keine Vektorrechnung pro Klick.
+
+Komplett neu berechnen:
+    python -m agent.aehnliche_chats --voll
+"""
+import argparse
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from agent.config import KNN_K, KNN_BLOCK
+from agent.db_writer import in_bloecken
+from agent.vectorstore import hole_chat_embeddings
+
+
+def lade_matrix(cursor, vectordb):
+    """(db_ids, normierte Embedding-Matrix) aller Chats mit Embedding; Duplikate zählen nicht."""
+    embeddings = hole_chat_embeddings(vectordb)
+    cursor.execute("SELECT id, chat_id FROM chats WHERE duplikat_von IS NULL")
+    ids, vektoren = [], []
+    for row in cursor.fetchall():
+        embedding = embeddings.get(row["chat_id"])
+        if embedding is not None:
+            ids.append(row["id"])
+            vektoren.append(embedding)
+    if not ids:
+        return [], np.zeros((0, 0), dtype=np.float32)
+    matrix = np.asarray(vektoren, dtype=np.float32)
+    normen = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return ids, matrix / np.where(normen == 0, 1, normen)
+
+
+def top_k(matrix, zeilen, k=KNN_K, block=KNN_BLOCK, spalten=None):
+    """
+    Für die Zeilen-Indizes `zeilen`: die k ähnlichsten Spalten (ohne sich selbst).
+    Blockweise Matrixmultiplikation – Speicher O(block x n) statt O(n x n).
+    Liefert {zeile: [(spalte, aehnlichkeit), ...]} absteigend sortiert.
+    """
+    spalten = np.arange(len(matrix)) if spalten is None else np.asarray(spalten, dtype=np.intp)
+    kandidaten = matrix[spalten]
+    ergebnis = {}
+    for start in range(0, len(zeilen), block):
+        teil = np.asarray(zeilen[start:start + block])
+        scores = matrix[teil] @ kandidaten.T
+        scores[teil[:, None] == spalten[None, :]] = -np.inf
+        n = min(k, len(spalten))
+        if n <= 0:
+            ergebnis.update({int(z): [] for z in teil})
+            continue
+        beste = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+        for zeile, idx, zeilen_scores in zip(teil, beste, scores):
+            idx = idx[np.argsort(-zeilen_scores[idx])]
+            ergebnis[int(zeile)] = [(int(spalten[i]), float(zeilen_scores[i])) for i in idx
+                                    if np.isfinite(zeilen_scores[i])]
+    return ergebnis
+
+
+def _lade_bestehende(cursor):
+    cursor.execute("SELECT chat_id, nachbar_id, aehnlichkeit FROM chat_nachbarn ORDER BY chat_id, rang")
+    bestehend = {}
+    for row in cursor.fetchall():
+        bestehend.setdefault(row["chat_id"], []).append((row["nachbar_id"], float(row["aehnlichkeit"])))
+    return bestehend
+
+
+def _schreibe(cursor, nachbarn, entfernen=()):
+    jetzt = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    chat_ids = list(nachbarn) + list(entfernen)
+    for block in in_bloecken(chat_ids):
+        platzhalter = ", ".join(["%s"] * len(block))
+        cursor.execute(f"DELETE FROM chat_nachbarn WHERE chat_id IN ({platzhalter})", block)
+    zeilen = [(chat_id, rang, nachbar_id, aehnlichkeit, jetzt)
+              for chat_id, liste in nachbarn.items()
+              for rang, (nachbar_id, aehnlichkeit) in enumerate(liste, 1)]
+    for block in in_bloecken(zeilen):
+        cursor.executemany(
+            "INSERT INTO chat_nachbarn (chat_id, rang, nachbar_id, aehnlichkeit, aktualisiert_am) "
+            "VALUES (%s, %s, %s, %s, %s)", block
+        )
+
+
+def aktualisiere_nachbarn(cursor, vectordb, geaenderte_chat_ids=None, k=KNN_K, voll=False):
+    """
+    geaenderte_chat_ids: Export-IDs der neu eingebetteten Chats dieses Imports.
+    Inkrementell: deren Zeilen komplett neu; alle anderen Zeilen nur mit den neuen Chats abgleichen.
+    Zeilen, die auf einen geänderten oder gelöschten Chat zeigen, werden ebenfalls komplett neu berechnet.
+    """
+    start = time.perf_counter()
+    ids, matrix = lade_matrix(cursor, vectordb)
+    if not ids:
+        return 0
+    position = {chat_db_id: i for i, chat_db_id in enumerate(ids)}
+    if voll:
+        cursor.execute("DELETE FROM chat_nachbarn")
+    bestehend = {} if voll else _lade_bestehende(cursor)
+    # gelöschte Chats und neue Duplikate verlieren ihre Nachbarliste
+    entfernen = [chat_db_id for chat_db_id in bestehend if chat_db_id not in position]
+
+    if voll or not bestehend:
+        neu_berechnen = list(range(len(ids)))
+        neue_spalten = []
+    else:
+        cursor.execute("SELECT id, chat_id FROM chats")
+        export_zu_db = {row["chat_id"]: row["id"] for row in cursor.fetchall()}
+        geaendert = {position[export_zu_db[c]] for c in (geaenderte_chat_ids or [])
+                     if export_zu_db.get(c) in position}
+        geaendert_db = {ids[i] for i in geaendert}
+        neu_berechnen = set(geaendert)
+        for chat_db_id, i in position.items():
+            liste = bestehend.get(chat_db_id)
+            if liste is None or any(n in geaendert_db or n not in position for n, _ in liste):
+                neu_berechnen.add(i)
+        neu_berechnen = sorted(neu_berechnen)
+        neue_spalten = sorted(geaendert)
+
+    nachbarn = {}
+    for zeile, liste in top_k(matrix, neu_berechnen, k).items():
+        nachbarn[ids[zeile]] = [(ids[s], a) for s, a in liste]
+
+    # Restliche Zeilen: nur die neuen Chats als zusätzliche Kandidaten prüfen
+    if neue_spalten:
+        rest = [i for i in range(len(ids)) if ids[i] not in nachbarn]
+        for zeile, liste in top_k(matrix, rest, k, spalten=neue_spalten).items():
+            alt = bestehend.get(ids[zeile], [])
+            grenze = alt[-1][1] if len(alt) >= k else -np.inf
+            neue = [(ids[s], a) for s, a in liste if a > grenze]
+            if neue:
+                nachbarn[ids[zeile]] = sorted(alt + neue, key=lambda x: -x[1])[:k]
+
+    _schreibe(cursor, nachbarn, entfernen)
+    print(f"🕸️ Ähnliche Chats: {len(nachbarn)} von {len(ids)} Chats aktualisiert "
+          f"({time.perf_counter() - start:.1f}s)")
+    return len(nachbarn)
+
+
+def main():
+    from agent.db_writer import verbinde_mit_datenbank
+    from agent.migrationen import migriere
+    from agent.vectorstore import init_chroma
+
+    parser = argparse.ArgumentParser(description="k-NN-Graph ähnlicher Chats berechnen")
+    parser.add_argument("--voll", action="store_true", help="alle Nachbarn neu berechnen")
+    parser.add_argument("--k", type=int, default=KNN_K)
+    args = parser.parse_args()
+
+    conn = verbinde_mit_datenbank()
+    cursor = conn.cursor()
+    migriere(cursor, conn)  # legt u. a. chat_nachbarn an
+    aktualisiere_nachbarn(cursor, init_chroma(), k=args.k, voll=args.voll)
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+
+from agent.config import BM25_INDEX_PFAD, TITEL_WEIGHT, BM25_K1, BM25_B
+
+FELDER = ("titel", "zusammenfassung", "text")
+FELD_GEWICHTE = {"titel": TITEL_WEIGHT, "zusammenfassung": 1.0, "text": 1.0}
+
+STOPPWOERTER = {
+    "der", "die", "das", "und", "oder", "ein", "eine", "einen", "ist", "im", "in", "zu", "mit", "von", "für",
+    "auf", "den", "dem", "des", "es", "ich", "du", "wie", "was", "nicht", "auch", "an", "bei", "the", "and",
+    "of", "to", "a", "is", "for", "user", "assistant",
+}
+
+
+def tokenisiere(text):
+    return [t for t in re.findall(r"\w+", (text or "").lower()) if len(t) > 1 and t not in STOPPWOERTER]
+
+
+class BM25Index:
+    """
+    Invertierter Index (BM25F) über Titel, Zusammenfassung und Nachrichtentext.
+    Liegt komplett im Speicher; geänderte Chats werden inkrementell in SQLite nachgeschrieben.
+    Titel-Treffer zählen TITEL_WEIGHT-fach.
+    """
+
+    def __init__(self, pfad=BM25_INDEX_PFAD, k1=BM25_K1, b=BM25_B):
+        self.pfad = pfad
+        self.k1 = k1
+        self.b = b
+        self.postings = {}        # term -> {chat_id: gewichtete tf}
+        self.felder = {}          # chat_id -> {feld: Counter}
+        self.laengen = {}         # chat_id -> gewichtete Länge
+        self.gesamt_laenge = 0.0
+        self._geaendert = set()
+        self._entfernt = set()
+        self._lock = threading.RLock()
+        if pfad:
+            self._lade()
+
+    # --- Aufbau ---------------------------------------------------------------
+
+    def _verbindung(self):
+        os.makedirs(os.path.dirname(self.pfad) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.pfad)
+        conn.execute("CREATE TABLE IF NOT EXISTS dokumente (chat_id TEXT PRIMARY KEY, felder TEXT)")
+        return conn
+
+    def _lade(self):
+        if not os.path.exists(self.pfad):
+            return
+        conn = self._verbindung()
+        try:
+            for chat_id, felder in conn.execute("SELECT chat_id, felder FROM dokumente"):
+                self._indexiere(chat_id, {f: Counter(z) for f, z in json.loads(felder).items()})
+        finally:
+            conn.close()
+
+    def _gewichtete_tf(self, felder):
+        tf = Counter()
+        for feld, zaehler in felder.items():
+            gewicht = FELD_GEWICHTE.get(feld, 1.0)
+            for term, anzahl in zaehler.items():
+                tf[term] += gewicht * anzahl
+        return tf
+
+    def _indexiere(self, chat_id, felder):
+        tf = self._gewichtete_tf(felder)
+        self.felder[chat_id] = felder
+        laenge = sum(tf.values())
+        self.laengen[chat_id] = laenge
+        self.gesamt_laenge += laenge
+        for term, wert in tf.items():
+            self.postings.setdefault(term, {})[chat_id] = wert
+
+    def _deindexiere(self, chat_id):
+        felder = self.felder.pop(chat_id, None)
+        if felder is None:
+            return
+        self.gesamt_laenge -= self.laengen.pop(chat_id, 0.0)
+        for term in self._gewichtete_tf(felder):
+            eintraege = self.postings.get(term)
+            if eintraege is not None:
+                eintraege.pop(chat_id, None)
+                if not eintraege:
+                    del self.postings[term]
+
+    def aktualisiere(self, chat_id, titel=None, zusammenfassung=None, text=None):
+        """Setzt die Felder eines Chats neu; None lässt das bisherige Feld stehen."""
+        with self._lock:
+            felder = dict(self.felder.get(chat_id, {}))
+            for feld, wert in (("titel", titel), ("zusammenfassung", zusammenfassung), ("text", text)):
+                if wert is not None:
+                    felder[feld] = Counter(tokenisiere(wert))
+            self._deindexiere(chat_id)
+            self._indexiere(chat_id, felder)
+            self._geaendert.add(chat_id)
+            self._entfernt.discard(chat_id)
+
+    def entferne(self, chat_id):
+        with self._lock:
+            self._deindexiere(chat_id)
+            self._geaendert.discard(chat_id)
+            self._entfernt.add(chat_id)
+
+    def speichere(self):
+        """Schreibt nur die seit dem letzten Speichern geänderten Chats."""
+        if not self.pfad:
+            return
+        with self._lock:
+            if not self._geaendert and not self._entfernt:
+                return
+            zeilen = [(cid, json.dumps({f: dict(z) for f, z in self.felder[cid].items()}, ensure_ascii=False))
+                      for cid in self._geaendert if cid in self.felder]
+            entfernt = [(cid,) for cid in self._entfernt]
+            self._geaendert.clear()
+            self._entfernt.clear()
+        conn = self._verbindung()
+        try:
+            conn.executemany("INSERT OR REPLACE INTO dokumente (chat_id, felder) VALUES (?, ?)", zeilen)
+            conn.executemany("DELETE FROM dokumente WHERE chat_id = ?", entfernt)
+            conn.commit()
+        finally:
+            conn.close()
+
+    # --- Suche ----------------------------------------------------------------
+
+    def __len__(self):
+        return len(self.felder)
+
+    def suche(self, query, k=20):
+        """[(chat_id, score), ...] absteigend – nur Index-Lookups der Query-Terme, kein Scan über alle Chats."""
+        with self._lock:
+            n = len(self.felder)
+            if n == 0:
+                return []
+            avgdl = self.gesamt_laenge / n or 1.0
+            scores = Counter()
+            for term in set(tokenisiere(query)):
+                eintraege = self.postings.get(term)
+                if not eintraege:
+                    continue
+                idf = math.log(1 + (n - len(eintraege) + 0.5) / (len(eintraege) + 0.5))
+                for chat_id, tf in eintraege.items():
+                    norm = tf + self.k1 * (1 - self.b + self.b * self.laengen[chat_id] / avgdl)
+                    scores[chat_id] += idf * tf * (self.k1 + 1) / norm
+            return scores.most_common(k)
+
+
+def baue_aus_datenbank(cursor, index):
+    """Kompletter Neuaufbau aus MySQL (z. B. für Chats, die vor dem Index importiert wurden)."""
+    cursor.execute("SELECT id, chat_id, titel, zusammenfassung FROM chats")
+    chats = {row["id"]: row for row in cursor.fetchall()}
+    texte = {}
+    cursor.execute("SELECT chat_id, text FROM chat_messages ORDER BY chat_id, position")
+    for row in cursor.fetchall():
+        texte.setdefault(row["chat_id"], []).append(row["text"] or "")
+    for db_id, chat in chats.items():
+        index.aktualisiere(chat["chat_id"], chat["titel"] or "", chat["zusammenfassung"] or "",
+                           "\n\n".join(texte.get(db_id, [])))
+    index.speichere()
+    print(f"🗂️ BM25-Index mit {len(chats)} Chats aufgebaut.")
+    return index
@@ -1,10 +1,89 @@
+import io
 import json
+import zipfile
 import pandas as pd
 
 def lade_json(pfad):
     with open(pfad, 'r', encoding='utf-8') as f:
         return json.load(f)
 
+def oeffne_export(pfad):
+    """conversations.json direkt oder aus dem ZIP, wie es der ChatGPT-Export liefert (ohne Entpacken)."""
+    if not zipfile.is_zipfile(pfad):
+        return open(pfad, 'r', encoding='utf-8-sig')
+    archiv = zipfile.ZipFile(pfad)
+    namen = [n for n in archiv.namelist() if n.rsplit("/", 1)[-1] == "conversations.json"]
+    if not namen:
+        archiv.close()
+        raise ValueError(f"{pfad}: keine conversations.json im Archiv")
+    return io.TextIOWrapper(archiv.open(namen[0]), encoding='utf-8-sig')
+
+def lade_json_stream(pfad, puffer_groesse=1 << 16):
+    """
+    Liest das Top-Level-Array aus conversations.json (oder dem Export-ZIP) Chat für Chat.
+    Es liegt immer nur der aktuelle Chat (plus Lesepuffer) im Speicher,
+    die Verarbeitung kann also schon starten, während der Rest der Datei noch gelesen wird.
+    """
+    decoder = json.JSONDecoder()
+    with oeffne_export(pfad) as f:
+        puffer = ""
+        pos = 0
+        dateiende = False
+
+        def nachladen(groesse):
+            nonlocal puffer, pos, dateiende
+            daten = f.read(groesse)
+            if not daten:
+                dateiende = True
+            puffer = puffer[pos:] + daten
+            pos = 0
+
+        def ueberspringe_leerraum():
+            nonlocal pos
+            while True:
+                while pos < len(puffer) and puffer[pos].isspace():
+                    pos += 1
+                if pos < len(puffer) or dateiende:
+                    return
+                nachladen(puffer_groesse)
+
+        ueberspringe_leerraum()
+        if pos >= len(puffer) or puffer[pos] != "[":
+            raise ValueError(f"{pfad}: JSON-Array erwartet")
+        pos += 1
+
+        erstes = True
+        while True:
+            ueberspringe_leerraum()
+            if pos >= len(puffer):
+                raise ValueError(f"{pfad}: Unerwartetes Dateiende im JSON-Array")
+            if puffer[pos] == "]":
+                return
+            if not erstes:
+                if puffer[pos] != ",":
+                    raise ValueError(f"{pfad}: ',' erwartet an Zeichen {pos}")
+                pos += 1
+                ueberspringe_leerraum()
+            erstes = False
+
+            # Solange nachladen, bis das Objekt vollständig im Puffer liegt (Lesegröße wächst, damit große Chats nicht quadratisch werden)
+            groesse = puffer_groesse
+            while True:
+                try:
+                    chat, ende = decoder.raw_decode(puffer, pos)
+                    break
+                except json.JSONDecodeError:
+                    if dateiende:
+                        raise
+                    nachladen(groesse)
+                    groesse *= 2
+            pos = ende
+            yield chat
+            # Verbrauchten Teil verwerfen, damit der Puffer nicht mit der Datei wächst
+            if pos > puffer_groesse:
+                puffer = puffer[pos:]
+                pos = 0
+
 def lade_excel_chat_infos(pfad):
     df = pd.read_excel(pfad)
     return {str(row.iloc[0]).strip().lower(): str(row.iloc[1]).strip().lower()
@@ -0,0 +1,76 @@
+import hashlib
+
+from agent.config import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken fehlt oder Encoding nicht ladbar -> Wörter als Näherung
+    _encoding = None
+
+
+def tokenisiere(text):
+    if _encoding is not None:
+        return _encoding.encode(text)
+    return text.split(" ")
+
+
+def detokenisiere(tokens):
+    if _encoding is not None:
+        return _encoding.decode(tokens)
+    return " ".join(tokens)
+
+
+def zaehle_tokens(text):
+    return len(tokenisiere(text))
+
+
+def chunk_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def erzeuge_chunks(nachrichten, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """
+    Zerlegt den linearisierten Thread in überlappende Passagen mit höchstens max_tokens Tokens.
+    Das Fenster läuft immer vom Anfang los – wächst ein Chat, bleiben die vorderen Chunks identisch
+    (gleicher Hash) und müssen nicht neu eingebettet werden.
+    """
+    if overlap_tokens >= max_tokens:
+        raise ValueError("overlap_tokens muss kleiner als max_tokens sein")
+    text = "\n\n".join(f"{n['rolle']}: {n['text']}" for n in nachrichten)
+    tokens = tokenisiere(text)
+    if not tokens:
+        return []
+    schritt = max_tokens - overlap_tokens
+    chunks = []
+    for start in range(0, len(tokens), schritt):
+        teil = detokenisiere(tokens[start:start + max_tokens]).strip()
+        if teil:
+            chunks.append(teil)
+        if start + max_tokens >= len(tokens):
+            break
+    return chunks
+
+
+def aggregiere_chunk_treffer(treffer, k=None, modus="max"):
+    """
+    Fasst Chroma-Treffer [(doc, distanz), ...] pro chat_id zusammen.
+    modus: "max" (bester Chunk zählt) oder "mean" (Mittel über alle gefundenen Chunks des Chats).
+    Liefert [(bestes_doc, distanz), ...] in derselben Form wie similarity_search_with_score.
+    """
+    je_chat = {}
+    for doc, distanz in treffer:
+        chat_id = doc.metadata.get("chat_id")
+        je_chat.setdefault(chat_id, []).append((doc, distanz))
+
+    ergebnis = []
+    for eintraege in je_chat.values():
+        eintraege.sort(key=lambda x: x[1])
+        bestes_doc, beste_distanz = eintraege[0]
+        if modus == "mean":
+            distanz = sum(d for _, d in eintraege) / len(eintraege)
+        else:
+            distanz = beste_distanz
+        ergebnis.append((bestes_doc, distanz))
+    ergebnis.sort(key=lambda x: x[1])
+    return ergebnis[:k] if k else ergebnis
@@ -1 +1,95 @@
+import os
+
 CHROMA_PATH = r"D:/Users/doman/Documents/OneDrive/Dokumente/Programmierung/Projekte/AiAgents/chats"
+
+# Marker-Datei: wird nach jedem Import neu geschrieben, damit die Web-Suche ihren Cache verwirft
+IMPORT_STAND_DATEI = os.path.join(CHROMA_PATH, "import_stand.txt")
+
+# Linearisierte Nachrichten je Chat (chat_id + update_time) – spart die Baum-Traversierung beim Re-Import
+NACHRICHTEN_CACHE_PFAD = os.path.join(CHROMA_PATH, "nachrichten_cache.sqlite")
+
+# Import-Dienst (agent/import_dienst.py): überwacht einen Ordner für neue ChatGPT-Exporte (conversations.json oder ZIP)
+IMPORT_ORDNER = os.environ.get("CHAT_IMPORT_ORDNER", os.path.join(CHROMA_PATH, "exporte"))
+IMPORT_INTERVALL = 10              # Sekunden zwischen zwei Blicken in den Ordner
+IMPORT_MAX_VERSUCHE = 5            # danach gilt ein Export mit fehlgeschlagenen Chats als erledigt (bis er sich ändert)
+IMPORT_MAX_BACKOFF = 15 * 60       # Sekunden; Wartezeit verdoppelt sich je Fehlversuch ab IMPORT_INTERVALL
+IMPORT_DIENST_STAND_DATEI = os.path.join(CHROMA_PATH, "import_dienst_stand.json")   # bereits importierte Dateien
+IMPORT_STATUS_DATEI = os.path.join(CHROMA_PATH, "import_status.json")               # Fortschritt + Queue-Tiefen
+
+# Datenbank: "mysql" (Server gptchats) oder "sqlite" (eingebettet mit FTS5, agent/speicher_sqlite.py)
+DB_BACKEND = os.environ.get("CHAT_DB_BACKEND", "mysql")
+SQLITE_DB_PFAD = os.environ.get("CHAT_SQLITE_PFAD", os.path.join(CHROMA_PATH, "gptchats.sqlite"))
+
+# DB-Schreiben: Zeilen pro executemany-Block und Commit-Intervall (Chats) – ein Absturz kostet höchstens N Chats LLM-Arbeit
+DB_BATCH_GROESSE = 500
+COMMIT_ALLE_N_CHATS = 20
+
+# Ollama HTTP-API (statt "ollama run" pro Prompt)
+OLLAMA_URL = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434")
+if not OLLAMA_URL.startswith("http"):
+    OLLAMA_URL = f"http://{OLLAMA_URL}"
+OLLAMA_MODELL = "llama3"
+OLLAMA_KEEP_ALIVE = "30m"          # Modell zwischen den Chats im Speicher halten
+LLM_TIMEOUT_VERBINDUNG = 5         # Sekunden bis die Verbindung steht
+LLM_TIMEOUT_TOKEN = 60             # max. Wartezeit zwischen zwei gestreamten Blöcken
+LLM_TIMEOUT_GESAMT = 300           # harte Obergrenze pro Anfrage
+LLM_MAX_VERSUCHE = 3
+LLM_POOL_GROESSE = 8                # >= LLM_PARALLEL
+
+# Persistenter Antwort-Cache vor allen LLM-Aufrufen (agent/llm_cache.py); CHAT_LLM_CACHE=0 schaltet ihn ab
+LLM_CACHE_AKTIV = os.environ.get("CHAT_LLM_CACHE", "1") != "0"
+LLM_CACHE_PFAD = os.path.join(CHROMA_PATH, "llm_cache.sqlite")
+LLM_CACHE_MAX_MB = 256
+
+# Import-Pipeline: parse -> LLM (parallel) -> Embedding (Batch) -> DB (Batch)
+LLM_PARALLEL = 2                   # passend zu OLLAMA_NUM_PARALLEL des Ollama-Servers
+EMBED_BATCH_GROESSE = 16
+PIPELINE_QUEUE_GROESSE = 32        # max. wartende Chats je Stufe (Backpressure)
+
+# Chunking langer Chats für die Embeddings (Tokens nach tiktoken cl100k, e5 verträgt max. 512)
+CHUNK_MAX_TOKENS = 350
+CHUNK_OVERLAP_TOKENS = 50
+EMBEDDING_CACHE_PFAD = os.path.join(CHROMA_PATH, "embedding_cache")
+
+# Map-Reduce-Zusammenfassung langer Chats (Abschnitte in Tokens, parallele Abschnitts-Anfragen)
+ZUSAMMENFASSUNG_CHUNK_TOKENS = 1500
+ZUSAMMENFASSUNG_PARALLEL = 2       # gleichzeitige Abschnitts-Anfragen insgesamt (ein Pool für alle Chats)
+
+# Embedding-Modell (siehe agent/embedding_service.py: e5-large, e5-base, e5-small, e5-large-int8, ollama-bge-m3)
+EMBEDDING_MODELL = os.environ.get("CHAT_EMBEDDING_MODELL", "e5-large")
+EMBEDDING_GERAET = "cpu"
+ONNX_MODELL_ORDNER = os.path.join(CHROMA_PATH, "onnx_modelle")   # lokal erzeugte int8-ONNX-Modelle
+
+# Keyword-Index (BM25) für die Hybrid-Suche
+BM25_INDEX_PFAD = os.path.join(CHROMA_PATH, "bm25_index.sqlite")
+TITEL_WEIGHT = 1.5                 # Gewichtung für Treffer im Titel (wie in search_test_03)
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+
+# Embedding-Klassifikator vor dem LLM (agent/kategorie_klassifikator.py)
+KLASSIFIKATOR_AKTIV = True
+KLASSIFIKATOR_SCHWELLE = 0.8       # Sicherheit (0-1), ab der das LLM nicht mehr gefragt wird
+KLASSIFIKATOR_MIN_BEISPIELE = 5    # Kategorien mit weniger gelabelten Chats bekommen keinen Prototyp
+KLASSIFIKATOR_MIN_RELEVANZ = 40    # wie beim LLM: schwächere Zuordnungen verwerfen
+
+# Duplikaterkennung (MinHash + LSH, agent/duplikate.py)
+DUPLIKAT_INDEX_PFAD = os.path.join(CHROMA_PATH, "duplikat_index.sqlite")
+DUPLIKAT_SCHWELLE = 0.85           # geschätzte Jaccard-Ähnlichkeit der Wort-5-Gramme
+MINHASH_PERMUTATIONEN = 128
+LSH_BAENDER = 16                   # 16 Bänder à 8 Zeilen -> Kandidaten ab ca. 0.7 Ähnlichkeit
+SHINGLE_GROESSE = 5
+DUPLIKAT_MIN_SHINGLES = 20
+
+# "Ähnliche Chats" (k-NN-Graph über die Chat-Embeddings, agent/aehnliche_chats.py)
+KNN_K = 10
+KNN_BLOCK = 2048                   # Zeilen pro Matrix-Block (Speicher: KNN_BLOCK x Anzahl Chats Floats)
+
+# Themen-Clustering (agent/themen_cluster.py)
+CLUSTER_MODELL_PFAD = os.path.join(CHROMA_PATH, "themen_zentroiden.npy")
+CLUSTER_ANZAHL = None              # None = sqrt(Anzahl Chats / 2)
+CLUSTER_BATCH_GROESSE = 1024
+CLUSTER_ITERATIONEN = 100
+CLUSTER_MIN_GROESSE = 10           # kleinere Cluster werden nicht als Kategorie vorgeschlagen
+CLUSTER_ABDECKUNG = 0.3            # Anteil der Chats mit der häufigsten Kategorie, ab dem ein Thema als abgedeckt gilt
+CLUSTER_SCHLUESSELWOERTER = 8
@@ -1,6 +1,18 @@
-import pymysql
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timezone
+from agent.config import IMPORT_STAND_DATEI, DB_BATCH_GROESSE, DB_BACKEND
+from agent.speicher_sqlite import verbinde_sqlite, ist_sqlite
 
 def verbinde_mit_datenbank():
+    if DB_BACKEND == "sqlite":
+        return verbinde_sqlite()
+    # erst hier: im SQLite-Betrieb muss pymysql nicht installiert sein
+    import pymysql
+    import pymysql.cursors
+
     return pymysql.connect(
         host="127.0.0.1",
         user="chatuser",
@@ -10,27 +22,64 @@ def verbinde_mit_datenbank():
         cursorclass=pymysql.cursors.DictCursor
     )
 
-def insert_update_chats(chat_id, titel, erstellt_am, letzte_aenderung, message_count, chat_link, zusammenfassung, cursor):
+def upsert_sql(cursor, tabelle, spalten, schluessel, aktualisieren):
+    """INSERT mit Update bei Schlüsselkonflikt – MySQL: ON DUPLICATE KEY UPDATE, SQLite: ON CONFLICT ... DO UPDATE."""
+    sql = f"INSERT INTO {tabelle} ({', '.join(spalten)}) VALUES ({', '.join(['%s'] * len(spalten))}) "
+    if ist_sqlite(cursor):
+        return sql + f"ON CONFLICT ({', '.join(schluessel)}) DO UPDATE SET " + ", ".join(f"{s} = excluded.{s}" for s in aktualisieren)
+    return sql + "ON DUPLICATE KEY UPDATE " + ", ".join(f"{s} = VALUES({s})" for s in aktualisieren)
+
+def stelle_spalte_sicher(cursor, tabelle, spalte, definition):
+    # Neue Spalten bei alten Datenbanken nachrüsten (das SQLite-Schema ist von Anfang an vollständig)
+    if ist_sqlite(cursor):
+        return
+    cursor.execute(
+        "SELECT COUNT(*) AS anzahl FROM information_schema.columns "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s",
+        (tabelle, spalte)
+    )
+    if cursor.fetchone()["anzahl"] == 0:
+        print(f"🛠️ Ergänze Spalte {tabelle}.{spalte} ...")
+        cursor.execute(f"ALTER TABLE {tabelle} ADD COLUMN {spalte} {definition}")
+
+def stelle_hash_spalte_sicher(cursor):
+    # chats.inhalts_hash wird für den inkrementellen Import gebraucht
+    stelle_spalte_sicher(cursor, "chats", "inhalts_hash", "CHAR(64) NULL")
+
+def stelle_duplikat_spalte_sicher(cursor):
+    # chats.duplikat_von = Export-ID des kanonischen Chats, NULL bei eigenständigen Chats
+    stelle_spalte_sicher(cursor, "chats", "duplikat_von", "VARCHAR(64) NULL")
+
+def hole_inhalts_hashes(cursor):
+    # Alle bekannten Hashes in einer Abfrage statt einem SELECT pro Chat
+    cursor.execute("SELECT chat_id, inhalts_hash FROM chats")
+    return {row["chat_id"]: row["inhalts_hash"] for row in cursor.fetchall()}
+
+def insert_update_chats(chat_id, titel, erstellt_am, letzte_aenderung, message_count, chat_link, zusammenfassung, cursor, inhalts_hash=None, duplikat_von=None):
         zusammenfassung = "[Noch keine LLM-Zusammenfassung]"
         cursor.execute(
-            "INSERT INTO chats (chat_id, titel, erstellt_am, letzte_aenderung, message_count, chat_link, status, zusammenfassung) "
-            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s) "
-            "ON DUPLICATE KEY UPDATE letzte_aenderung=VALUES(letzte_aenderung), message_count=VALUES(message_count)",
-            (chat_id, titel, erstellt_am, letzte_aenderung, message_count, chat_link, 'neu', zusammenfassung)
+            upsert_sql(cursor, "chats",
+                       ["chat_id", "titel", "erstellt_am", "letzte_aenderung", "message_count", "chat_link", "status",
+                        "zusammenfassung", "inhalts_hash", "duplikat_von"],
+                       ["chat_id"], ["letzte_aenderung", "message_count", "inhalts_hash", "duplikat_von"]),
+            (chat_id, titel, erstellt_am, letzte_aenderung, message_count, chat_link, 'neu', zusammenfassung, inhalts_hash, duplikat_von)
         )
         return cursor.lastrowid
 
-def  insert_kategorien(alle_kategorien, kategorien, kategorien_llm, chat_db_id, cursor):
-    for kat, rel in alle_kategorien.items():
-            quelle = "llama3" if kat in kategorien_llm else "manuell"
-            if kat in kategorien:
-                cursor.execute(
-                    "INSERT INTO chat_kategorien (chat_id, kategorie_id, relevanz, quelle) "
-                    "VALUES (%s, %s, %s, %s) "
-                    "ON DUPLICATE KEY UPDATE relevanz = VALUES(relevanz), quelle = VALUES(quelle)",
-                    (chat_db_id, kategorien[kat], rel, quelle)
-                )     
-            
+def in_bloecken(zeilen, batch_groesse=DB_BATCH_GROESSE):
+    for start in range(0, len(zeilen), batch_groesse):
+        yield zeilen[start:start + batch_groesse]
+
+def  insert_kategorien(alle_kategorien, kategorien, kategorien_llm, chat_db_id, cursor, batch_groesse=DB_BATCH_GROESSE, quelle_llm="llama3"):
+    zeilen = [
+        (chat_db_id, kategorien[kat], rel, quelle_llm if kat in kategorien_llm else "manuell")
+        for kat, rel in alle_kategorien.items()
+        if kat in kategorien
+    ]
+    sql = upsert_sql(cursor, "chat_kategorien", ["chat_id", "kategorie_id", "relevanz", "quelle"],
+                     ["chat_id", "kategorie_id"], ["relevanz", "quelle"])
+    for block in in_bloecken(zeilen, batch_groesse):
+        cursor.executemany(sql, block)
 
 def update_zusammenfassung(chat_id: int, zusammenfassung: str, cursor):
     cursor.execute(
@@ -43,23 +92,214 @@ def update_llm_kategorien(chat_id: int, kategorien: dict, cursor):
     cursor.execute("DELETE FROM chat_kategorien WHERE chat_id=%s AND quelle='llm'", (chat_id,))
     
     # Neue einfügen
-    for kategorie, relevanz in kategorien.items():
-        cursor.execute(
+    zeilen = [(chat_id, kategorie, 'llm', relevanz) for kategorie, relevanz in kategorien.items()]
+    for block in in_bloecken(zeilen):
+        cursor.executemany(
             "INSERT INTO chat_kategorien (chat_id, kategorie, quelle, relevanz) VALUES (%s, %s, %s, %s)",
-            (chat_id, kategorie, 'llm', relevanz)
+            block
         )
 
-def speichere_chat_nachrichten(chat_id, nachrichten, cursor):
+def speichere_chat_nachrichten(chat_id, nachrichten, cursor, batch_groesse=DB_BATCH_GROESSE):
+    # Beim Re-Import ersetzen statt jedes Mal erneut anhängen
+    cursor.execute("DELETE FROM chat_messages WHERE chat_id = %s", (chat_id,))
     sql = '''
         INSERT INTO chat_messages (chat_id, rolle, text, erstellt_am, position)
         VALUES (%s, %s, %s, %s, %s)
     '''
+    zeilen = [
+        (chat_id, nachricht.get("rolle", "unknown"), nachricht.get("text", ""), nachricht.get("erstellt_am"), i)
+        for i, nachricht in enumerate(nachrichten)
+    ]
+    # executemany macht daraus mehrzeilige INSERT ... VALUES (...), (...)
+    for block in in_bloecken(zeilen, batch_groesse):
+        cursor.executemany(sql, block)
+
+def stelle_detail_tabelle_sicher(cursor):
+    # Vorberechnete Detailansicht je Chat (Nachrichten, Kategorien, Zusammenfassung) für die Web-App
+    if ist_sqlite(cursor):
+        return
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS chat_details (
+            chat_id INT PRIMARY KEY,
+            daten LONGTEXT NOT NULL,
+            etag CHAR(64) NOT NULL,
+            aktualisiert_am DATETIME NOT NULL
+        ) CHARACTER SET utf8mb4
+    """)
+
+def stelle_nachbar_tabelle_sicher(cursor):
+    # k-NN-Graph ähnlicher Chats (agent/aehnliche_chats.py)
+    if ist_sqlite(cursor):
+        return  # im SQLite-Schema enthalten
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS chat_nachbarn (
+            chat_id INT NOT NULL,
+            rang TINYINT NOT NULL,
+            nachbar_id INT NOT NULL,
+            aehnlichkeit FLOAT NOT NULL,
+            aktualisiert_am DATETIME NOT NULL,
+            PRIMARY KEY (chat_id, rang)
+        )
+    """)
+
+def stelle_cluster_tabellen_sicher(cursor):
+    # Themen-Cluster und Zuordnung der Chats (agent/themen_cluster.py)
+    if ist_sqlite(cursor):
+        return  # im SQLite-Schema enthalten
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS themen (
+            id INT PRIMARY KEY,
+            schluesselwoerter VARCHAR(255) NOT NULL,
+            groesse INT NOT NULL,
+            top_kategorie VARCHAR(255) NULL,
+            abdeckung FLOAT NOT NULL,
+            vorschlag TINYINT NOT NULL DEFAULT 0
+        ) CHARACTER SET utf8mb4
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS chat_themen (
+            chat_id INT PRIMARY KEY,
+            thema_id INT NOT NULL,
+            aehnlichkeit FLOAT NOT NULL,
+            INDEX idx_chat_themen_thema (thema_id)
+        )
+    """)
+
+def speichere_chat_detail(chat_db_id, cursor, nachrichten=None):
+    """
+    Baut den Detail-Datensatz eines Chats und legt ihn in chat_details ab.
+    Ohne nachrichten werden sie aus chat_messages gelesen. Liefert (daten, etag, aktualisiert_am) oder None.
+    """
+    cursor.execute(
+        "SELECT id, chat_id, titel, zusammenfassung, erstellt_am, letzte_aenderung, chat_link FROM chats WHERE id = %s",
+        (chat_db_id,)
+    )
+    chat = cursor.fetchone()
+    if not chat:
+        return None
+
+    cursor.execute("""
+        SELECT k.name, ck.relevanz, ck.quelle FROM chat_kategorien ck
+        JOIN kategorien k ON k.id = ck.kategorie_id
+        WHERE ck.chat_id = %s
+        ORDER BY ck.relevanz DESC
+    """, (chat_db_id,))
+    kategorien = [{"name": row["name"], "relevanz": row["relevanz"], "quelle": row["quelle"]} for row in cursor.fetchall()]
+
+    if nachrichten is None:
+        cursor.execute("SELECT rolle, text, erstellt_am FROM chat_messages WHERE chat_id = %s ORDER BY position", (chat_db_id,))
+        nachrichten = cursor.fetchall()
+
+    daten = dict(chat)
+    daten["kategorien"] = kategorien
+    daten["nachrichten"] = [
+        {"rolle": n.get("rolle", "unknown"), "text": n.get("text", ""), "erstellt_am": n.get("erstellt_am")}
+        for n in nachrichten
+    ]
+    # Datumswerte landen als Text im JSON – die Web-App bekommt denselben Stand wie aus chat_details
+    roh = json.dumps(daten, ensure_ascii=False, sort_keys=True, default=str)
+    daten = json.loads(roh)
+    etag = hashlib.sha256(roh.encode("utf-8")).hexdigest()
+    jetzt = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+
+    # Zeitstempel nur bei geändertem Inhalt weiterschieben (Reihenfolge der Zuweisungen ist in MySQL relevant)
+    if ist_sqlite(cursor):
+        sql = ("INSERT INTO chat_details (chat_id, daten, etag, aktualisiert_am) VALUES (%s, %s, %s, %s) "
+               "ON CONFLICT (chat_id) DO UPDATE SET aktualisiert_am = CASE WHEN etag = excluded.etag "
+               "THEN aktualisiert_am ELSE excluded.aktualisiert_am END, daten = excluded.daten, etag = excluded.etag")
+    else:
+        sql = ("INSERT INTO chat_details (chat_id, daten, etag, aktualisiert_am) VALUES (%s, %s, %s, %s) "
+               "ON DUPLICATE KEY UPDATE aktualisiert_am = IF(etag = VALUES(etag), aktualisiert_am, VALUES(aktualisiert_am)), "
+               "daten = VALUES(daten), etag = VALUES(etag)")
+    cursor.execute(sql, (chat_db_id, roh, etag, jetzt))
+    cursor.execute("SELECT aktualisiert_am FROM chat_details WHERE chat_id = %s", (chat_db_id,))
+    return daten, etag, cursor.fetchone()["aktualisiert_am"]
+
+def baue_fehlende_chat_details(cursor):
+    # Chats, die der Import übersprungen hat (unverändert), bekommen ihren Detail-Datensatz einmalig nachgeliefert
+    cursor.execute("SELECT c.id FROM chats c LEFT JOIN chat_details d ON d.chat_id = c.id WHERE d.chat_id IS NULL")
+    fehlend = [row["id"] for row in cursor.fetchall()]
+    for chat_db_id in fehlend:
+        speichere_chat_detail(chat_db_id, cursor)
+    if fehlend:
+        print(f"🗂️ {len(fehlend)} Chat-Detailansichten nachgebaut.")
+    return len(fehlend)
+
+def uebernehme_duplikat_ergebnisse(duplikate, cursor):
+    """
+    duplikate: {chat_id: kanonische chat_id}. Markiert die Duplikate in chats.duplikat_von und übernimmt
+    Zusammenfassung und LLM-/Embedding-Kategorien des kanonischen Chats (manuelle Kategorien bleiben).
+    Liefert [(chat_db_id, chat_id, zusammenfassung), ...] der aktualisierten Chats.
+    """
+    if not duplikate:
+        return []
+    for block in in_bloecken([(kanonisch, chat_id) for chat_id, kanonisch in duplikate.items()]):
+        cursor.executemany("UPDATE chats SET duplikat_von = %s WHERE chat_id = %s", block)
+    chat_ids = list(duplikate)
+    platzhalter = ", ".join(["%s"] * len(chat_ids))
+    if ist_sqlite(cursor):
+        # SQLite kennt kein UPDATE ... JOIN / DELETE ... JOIN / INSERT IGNORE
+        cursor.execute(
+            f"UPDATE chats SET zusammenfassung = (SELECT k.zusammenfassung FROM chats k WHERE k.chat_id = chats.duplikat_von) "
+            f"WHERE duplikat_von IS NOT NULL AND chat_id IN ({platzhalter})",
+            list(chat_ids)
+        )
+        cursor.execute(
+            f"DELETE FROM chat_kategorien WHERE quelle IN ('llama3', 'gpt4', 'embedding') AND chat_id IN "
+            f"(SELECT id FROM chats WHERE duplikat_von IS NOT NULL AND chat_id IN ({platzhalter}))",
+            list(chat_ids)
+        )
+        einfuegen = "INSERT OR IGNORE"
+    else:
+        cursor.execute(
+            f"UPDATE chats d JOIN chats k ON k.chat_id = d.duplikat_von "
+            f"SET d.zusammenfassung = k.zusammenfassung WHERE d.chat_id IN ({platzhalter})",
+            list(chat_ids)
+        )
+        cursor.execute(
+            f"DELETE ck FROM chat_kategorien ck JOIN chats d ON d.id = ck.chat_id "
+            f"WHERE d.duplikat_von IS NOT NULL AND d.chat_id IN ({platzhalter}) "
+            f"AND ck.quelle IN ('llama3', 'gpt4', 'embedding')",
+            list(chat_ids)
+        )
+        einfuegen = "INSERT IGNORE"
+    cursor.execute(
+        f"{einfuegen} INTO chat_kategorien (chat_id, kategorie_id, relevanz, quelle) "
+        f"SELECT d.id, ck.kategorie_id, ck.relevanz, ck.quelle FROM chats d "
+        f"JOIN chats k ON k.chat_id = d.duplikat_von JOIN chat_kategorien ck ON ck.chat_id = k.id "
+        f"WHERE d.chat_id IN ({platzhalter}) AND ck.quelle IN ('llama3', 'gpt4', 'embedding')",
+        list(chat_ids)
+    )
+    cursor.execute(
+        f"SELECT id, chat_id, zusammenfassung FROM chats WHERE duplikat_von IS NOT NULL AND chat_id IN ({platzhalter})",
+        list(chat_ids)
+    )
+    return [(row["id"], row["chat_id"], row["zusammenfassung"]) for row in cursor.fetchall()]
+
+def verwerfe_hashes_offener_duplikate(chat_ids, cursor):
+    """
+    Duplikate, deren kanonischer Chat (noch) keinen Hash hat – sein LLM-Schritt ist gescheitert –, haben nur den
+    Platzhalter übernommen. Ohne eigenen Hash fasst der nächste Lauf sie wieder an und übernimmt dann das Ergebnis.
+    Liefert die chat_ids der zurückgesetzten Duplikate.
+    """
+    if not chat_ids:
+        return []
+    platzhalter = ", ".join(["%s"] * len(chat_ids))
+    cursor.execute(
+        f"SELECT d.chat_id FROM chats d JOIN chats k ON k.chat_id = d.duplikat_von "
+        f"WHERE k.inhalts_hash IS NULL AND d.chat_id IN ({platzhalter})",
+        list(chat_ids)
+    )
+    offen = [row["chat_id"] for row in cursor.fetchall()]
+    for block in in_bloecken([(chat_id,) for chat_id in offen]):
+        cursor.executemany("UPDATE chats SET inhalts_hash = NULL WHERE chat_id = %s", block)
+    return offen
 
-    for i, nachricht in enumerate(nachrichten):
-        cursor.execute(sql, (
-            chat_id,
-            nachricht.get("rolle", "unknown"),
-            nachricht.get("text", ""),
-            nachricht.get("erstellt_am"),
-            i
-        ))
+def markiere_import_stand(pfad=IMPORT_STAND_DATEI):
+    # Nach jedem Commit neuer Chats/Kategorien aufrufen – die Web-Suche verwirft daraufhin ihren Cache
+    try:
+        os.makedirs(os.path.dirname(pfad) or ".", exist_ok=True)
+        with open(pfad, "w", encoding="utf-8") as f:
+            f.write(str(time.time_ns()))
+    except OSError as e:
+        print(f"⚠️ Import-Stand konnte nicht geschrieben werden: {e}")
@@ -0,0 +1,173 @@
+"""
+Erkennung fast identischer Chats (Regenerierungen, kopierte Prompts) per MinHash + LSH.
+Signaturen aller Chats liegen in einer kleinen SQLite-Datei; neue Chats werden nur mit den Kandidaten
+aus ihren LSH-Buckets verglichen statt mit allen bisherigen Chats.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+
+import numpy as np
+
+from agent.config import (DUPLIKAT_INDEX_PFAD, DUPLIKAT_SCHWELLE, MINHASH_PERMUTATIONEN, LSH_BAENDER,
+                          SHINGLE_GROESSE, DUPLIKAT_MIN_SHINGLES)
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def shingles(text, groesse=SHINGLE_GROESSE):
+    woerter = re.findall(r"\w+", (text or "").lower())
+    if len(woerter) < groesse:
+        return {" ".join(woerter)} if woerter else set()
+    return {" ".join(woerter[i:i + groesse]) for i in range(len(woerter) - groesse + 1)}
+
+
+class MinHasher:
+    def __init__(self, permutationen=MINHASH_PERMUTATIONEN, seed=1):
+        # feste Zufallszahlen: Signaturen müssen zwischen Läufen vergleichbar bleiben
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, 1 << 32, size=permutationen, dtype=np.uint64)
+        self.b = rng.randint(0, 1 << 32, size=permutationen, dtype=np.uint64)
+
+    def signatur(self, menge):
+        werte = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in menge),
+            dtype=np.uint64, count=len(menge),
+        )
+        # (a*x + b) mod p – a, x < 2^32, also kein Überlauf in uint64
+        perm = (np.outer(werte, self.a) + self.b) % _MERSENNE & _MAX_HASH
+        return perm.min(axis=0).astype(np.uint32)
+
+
+def jaccard_schaetzung(sig1, sig2):
+    return float(np.mean(sig1 == sig2))
+
+
+class DuplikatIndex:
+    """
+    pfad=None hält den Index nur im Speicher.
+    finde_oder_registriere() liefert die chat_id des kanonischen Chats (des zuerst gesehenen) oder None.
+    """
+
+    def __init__(self, pfad=DUPLIKAT_INDEX_PFAD, schwelle=DUPLIKAT_SCHWELLE, baender=LSH_BAENDER,
+                 hasher=None, min_shingles=DUPLIKAT_MIN_SHINGLES):
+        self.pfad = pfad
+        self.schwelle = schwelle
+        self.hasher = hasher or MinHasher()
+        self.baender = baender
+        self.zeilen = len(self.hasher.a) // baender
+        self.min_shingles = min_shingles
+        self.signaturen = {}   # chat_id -> np.uint32-Array
+        self.kanonisch = {}    # chat_id -> kanonische chat_id (nur für Duplikate)
+        self.buckets = {}      # (band, hash) -> set(chat_id)
+        self.duplikate_gefunden = 0
+        self.neue_duplikate = {}   # in diesem Lauf erkannt: chat_id -> kanonische chat_id
+        self._geaendert = set()
+        self._lock = threading.Lock()
+        if pfad:
+            self._lade()
+
+    def _verbindung(self):
+        os.makedirs(os.path.dirname(self.pfad) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.pfad)
+        conn.execute("CREATE TABLE IF NOT EXISTS signaturen (chat_id TEXT PRIMARY KEY, signatur BLOB, kanonisch TEXT)")
+        return conn
+
+    def _lade(self):
+        conn = self._verbindung()
+        for chat_id, signatur, kanonisch in conn.execute("SELECT chat_id, signatur, kanonisch FROM signaturen"):
+            self._eintragen(chat_id, np.frombuffer(signatur, dtype=np.uint32), kanonisch)
+        conn.close()
+
+    def _band_schluessel(self, signatur):
+        for band in range(self.baender):
+            yield band, signatur[band * self.zeilen:(band + 1) * self.zeilen].tobytes()
+
+    def _eintragen(self, chat_id, signatur, kanonisch=None):
+        self.signaturen[chat_id] = signatur
+        if kanonisch:
+            self.kanonisch[chat_id] = kanonisch
+        for schluessel in self._band_schluessel(signatur):
+            self.buckets.setdefault(schluessel, set()).add(chat_id)
+
+    def _austragen(self, chat_id):
+        signatur = self.signaturen.pop(chat_id, None)
+        self.kanonisch.pop(chat_id, None)
+        if signatur is None:
+            return
+        for schluessel in self._band_schluessel(signatur):
+            bucket = self.buckets.get(schluessel)
+            if bucket:
+                bucket.discard(chat_id)
+                if not bucket:
+                    del self.buckets[schluessel]
+
+    def finde_oder_registriere(self, chat_id, text):
+        menge = shingles(text)
+        if len(menge) < self.min_shingles:
+            return None  # zu kurz – "Hallo" ist kein Duplikat von "Hallo"
+        signatur = self.hasher.signatur(menge)
+        with self._lock:
+            self._austragen(chat_id)  # geänderter Chat: alte Signatur ersetzen
+            kandidaten = set()
+            for schluessel in self._band_schluessel(signatur):
+                kandidaten |= self.buckets.get(schluessel, set())
+            kanonisch, beste_aehnlichkeit = None, self.schwelle
+            for kandidat in kandidaten:
+                ziel = self.kanonisch.get(kandidat, kandidat)
+                if ziel == chat_id:
+                    continue  # eigene Duplikate eines geänderten kanonischen Chats
+                aehnlichkeit = jaccard_schaetzung(signatur, self.signaturen[kandidat])
+                if aehnlichkeit >= beste_aehnlichkeit:
+                    kanonisch, beste_aehnlichkeit = ziel, aehnlichkeit
+            self._eintragen(chat_id, signatur, kanonisch)
+            self._geaendert.add(chat_id)
+            if kanonisch:
+                self.duplikate_gefunden += 1
+                self.neue_duplikate[chat_id] = kanonisch
+            return kanonisch
+
+    def speichere(self):
+        if not self.pfad:
+            return
+        with self._lock:
+            zeilen = [(cid, self.signaturen[cid].tobytes(), self.kanonisch.get(cid))
+                      for cid in self._geaendert if cid in self.signaturen]
+            self._geaendert.clear()
+        if not zeilen:
+            return
+        conn = self._verbindung()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO signaturen (chat_id, signatur, kanonisch) VALUES (?, ?, ?)", zeilen)
+        conn.close()
+
+    def __len__(self):
+        return len(self.signaturen)
+
+
+def baue_aus_datenbank(cursor, index, block_groesse=200):
+    """
+    Einmalig alle bereits importierten Chats eintragen (in Import-Reihenfolge, der erste bleibt kanonisch).
+    Die Nachrichten kommen blockweise je block_groesse Chats – nie alle auf einmal in den Speicher.
+    """
+    cursor.execute("SELECT id, chat_id FROM chats ORDER BY id")
+    chats = [(row["id"], row["chat_id"]) for row in cursor.fetchall()]
+    for start in range(0, len(chats), block_groesse):
+        block = chats[start:start + block_groesse]
+        platzhalter = ", ".join(["%s"] * len(block))
+        cursor.execute(
+            f"SELECT chat_id, rolle, text FROM chat_messages WHERE chat_id IN ({platzhalter}) ORDER BY chat_id, position",
+            [chat_db_id for chat_db_id, _ in block]
+        )
+        teile = {}
+        for row in cursor.fetchall():
+            teile.setdefault(row["chat_id"], []).append(f"{row['rolle']}: {row['text']}")
+        for chat_db_id, chat_id in block:
+            if chat_db_id in teile:
+                index.finde_oder_registriere(chat_id, "\n\n".join(teile[chat_db_id]))
+    index.speichere()
+    print(f"♊ Duplikat-Index aus der Datenbank aufgebaut: {len(index)} Chats, {index.duplikate_gefunden} Duplikate")
+    index.duplikate_gefunden = 0  # die Statistik zählt nur die Chats des Imports
@@ -0,0 +1,87 @@
+"""
+Vergleicht die Embedding-Modelle aus EMBEDDING_MODELLE auf echten Chats:
+Encode-Durchsatz und Recall@k gegenüber dem ersten Modell (Baseline, i. d. R. e5-large).
+
+    python -m agent.embedding_benchmark --quelle conversations.json --anzahl 500 --modelle e5-large e5-small e5-large-int8
+"""
+import argparse
+import time
+
+import numpy as np
+
+from agent.chat_loader import lade_json_stream
+from agent.chunking import erzeuge_chunks
+from agent.embedding_service import erzeuge_embedding_service, EMBEDDING_MODELLE
+from agent.konversation import linearisiere_chat
+
+
+def lade_korpus(pfad, anzahl):
+    """Erster Chunk je Chat als Passage, der Titel als Query (gehört zu genau dieser Passage)."""
+    passagen, queries = [], []
+    for chat in lade_json_stream(pfad):
+        titel = (chat.get("title") or "").strip()
+        chunks = erzeuge_chunks(linearisiere_chat(chat))
+        if not titel or not chunks:
+            continue
+        passagen.append(f"passage: {chunks[0]}")
+        queries.append(f"query: {titel}")
+        if len(passagen) >= anzahl:
+            break
+    return passagen, queries
+
+
+def top_k(query_vektoren, passagen_vektoren, k):
+    scores = query_vektoren @ passagen_vektoren.T
+    k = min(k, scores.shape[1])
+    teil = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return [set(zeile) for zeile in teil]
+
+
+def messe_modell(name, passagen, queries, k):
+    start = time.perf_counter()
+    service = erzeuge_embedding_service(name)
+    ladezeit = time.perf_counter() - start
+
+    start = time.perf_counter()
+    p_vek = np.asarray(service.embed_documents(passagen), dtype=np.float32)
+    encode_zeit = time.perf_counter() - start
+    q_vek = np.asarray(service.embed_documents(queries), dtype=np.float32)
+
+    treffer = top_k(q_vek, p_vek, k)
+    selbst = sum(i in t for i, t in enumerate(treffer)) / len(treffer)
+    return {
+        "modell": name,
+        "dimension": p_vek.shape[1],
+        "ladezeit": ladezeit,
+        "passagen_pro_s": len(passagen) / encode_zeit if encode_zeit > 0 else 0.0,
+        "treffer_at_k": selbst,
+        "top_k": treffer,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding-Modelle: Durchsatz vs. Qualität")
+    parser.add_argument("--quelle", default="conversations.json")
+    parser.add_argument("--anzahl", type=int, default=500, help="Anzahl Chats/Passagen")
+    parser.add_argument("--modelle", nargs="+", default=["e5-large", "e5-base", "e5-small"],
+                        choices=list(EMBEDDING_MODELLE), help="erstes Modell = Baseline")
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    passagen, queries = lade_korpus(args.quelle, args.anzahl)
+    if not passagen:
+        print("❌ Keine Passagen gefunden.")
+        return
+    print(f"📚 {len(passagen)} Passagen / Queries, k={args.k}\n")
+
+    ergebnisse = [messe_modell(name, passagen, queries, args.k) for name in args.modelle]
+    baseline = ergebnisse[0]
+    print(f"{'Modell':<16}{'Dim':>6}{'Laden s':>9}{'Pass./s':>10}{'Treffer@k':>11}{'Recall@k ggü. ' + baseline['modell']:>26}")
+    for e in ergebnisse:
+        recall = np.mean([len(a & b) / len(b) for a, b in zip(e["top_k"], baseline["top_k"])])
+        print(f"{e['modell']:<16}{e['dimension']:>6}{e['ladezeit']:>9.1f}{e['passagen_pro_s']:>10.1f}"
+              f"{e['treffer_at_k']:>11.3f}{recall:>26.3f}")
+
+
+if __name__ == "__main__":
+    main()
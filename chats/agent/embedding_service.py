@@ -0,0 +1,166 @@
+"""
+Eine Schnittstelle für alle Embedding-Modelle der Chat-Pipeline.
+Import (Chroma), Suche und Web nutzen denselben Service – so passen Index und Query-Embeddings immer zusammen.
+
+Die e5-Präfixe ("query: " / "passage: ") setzen weiterhin die Aufrufer.
+"""
+import json
+import os
+import time
+from abc import abstractmethod
+
+from langchain_core.embeddings import Embeddings
+
+from agent.config import EMBEDDING_MODELL, EMBEDDING_GERAET, CHROMA_PATH, ONNX_MODELL_ORDNER
+
+# name -> Backend + Modell
+EMBEDDING_MODELLE = {
+    "e5-large": {"backend": "sentence_transformers", "modell": "intfloat/e5-large-v2"},
+    "e5-base": {"backend": "sentence_transformers", "modell": "intfloat/e5-base-v2"},
+    "e5-small": {"backend": "sentence_transformers", "modell": "intfloat/e5-small-v2"},
+    # int8-quantisiertes ONNX-Modell; wird beim ersten Laden einmalig unter ONNX_MODELL_ORDNER erzeugt
+    "e5-large-int8": {"backend": "onnx", "modell": "intfloat/e5-large-v2", "quantisierung": "avx512_vnni",
+                      "datei": "onnx/model_qint8_avx512_vnni.onnx"},
+    "ollama-bge-m3": {"backend": "ollama", "modell": "bge-m3"},
+}
+
+INDEX_INFO_DATEI = os.path.join(CHROMA_PATH, "index_info.json")
+
+
+class EmbeddingService(Embeddings):
+    """Basis: embed_documents/embed_query wie bei LangChain, dazu Name und Dimension."""
+
+    name = None
+    batch_groesse = 32
+
+    @abstractmethod
+    def _encode(self, texte):
+        """Liste von Texten -> Liste normalisierter Vektoren."""
+
+    def embed_documents(self, texts):
+        return [list(map(float, v)) for v in self._encode(list(texts))]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    @property
+    def dimension(self):
+        if getattr(self, "_dimension", None) is None:
+            self._dimension = len(self.embed_query("dimension"))
+        return self._dimension
+
+
+def bereite_quantisiertes_modell_vor(name, modell, datei, quantisierung, geraet=EMBEDDING_GERAET,
+                                     ordner=ONNX_MODELL_ORDNER):
+    """
+    Lokaler Modellordner mit der int8-ONNX-Datei. Fehlt sie, wird das Modell einmalig nach ONNX exportiert
+    und dynamisch quantisiert (braucht sentence-transformers[onnx] >= 3.2, also optimum + onnxruntime).
+    """
+    ziel = os.path.join(ordner, name)
+    if os.path.exists(os.path.join(ziel, datei)):
+        return ziel
+    print(f"🛠️ Erzeuge int8-ONNX-Modell für '{name}' in {ziel} (einmalig, dauert einige Minuten) ...")
+    try:
+        from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+        model = SentenceTransformer(modell, device=geraet, backend="onnx")
+        model.save(ziel)
+        export_dynamic_quantized_onnx_model(model, quantisierung, ziel)
+    except ImportError as e:
+        raise RuntimeError(
+            f"Embedding-Modell '{name}' braucht das ONNX-Backend: pip install \"sentence-transformers[onnx]>=3.2\" ({e})"
+        ) from e
+    if not os.path.exists(os.path.join(ziel, datei)):
+        raise RuntimeError(f"int8-ONNX-Modell für '{name}' nicht erzeugt: {os.path.join(ziel, datei)} fehlt.")
+    return ziel
+
+
+class SentenceTransformerService(EmbeddingService):
+    def __init__(self, name, modell, geraet=EMBEDDING_GERAET, backend="torch", datei=None):
+        from sentence_transformers import SentenceTransformer
+
+        self.name = name
+        kwargs = {"device": geraet}
+        if backend != "torch":
+            kwargs["backend"] = backend
+            if datei:
+                kwargs["model_kwargs"] = {"file_name": datei}
+        self.model = SentenceTransformer(modell, **kwargs)
+        self._dimension = self.model.get_sentence_embedding_dimension()
+
+    def _encode(self, texte):
+        return self.model.encode(texte, batch_size=self.batch_groesse, normalize_embeddings=True,
+                                 convert_to_numpy=True, show_progress_bar=False)
+
+
+class OllamaEmbeddingService(EmbeddingService):
+    def __init__(self, name, modell, client=None):
+        from agent.llm_client import hole_client
+
+        self.name = name
+        self.modell = modell
+        self.client = client or hole_client()
+        self._dimension = None
+
+    def _encode(self, texte):
+        vektoren = []
+        for start in range(0, len(texte), self.batch_groesse):
+            vektoren.extend(self.client.embedde(texte[start:start + self.batch_groesse], self.modell))
+        # wie bei den e5-Modellen normalisieren, damit Kosinus = Skalarprodukt
+        ergebnis = []
+        for v in vektoren:
+            laenge = sum(x * x for x in v) ** 0.5 or 1.0
+            ergebnis.append([x / laenge for x in v])
+        return ergebnis
+
+
+_services = {}
+
+def erzeuge_embedding_service(name=EMBEDDING_MODELL):
+    """Liefert (und cached pro Prozess) den Service für ein Modell aus EMBEDDING_MODELLE."""
+    if name in _services:
+        return _services[name]
+    if name not in EMBEDDING_MODELLE:
+        raise ValueError(f"Unbekanntes Embedding-Modell '{name}'. Verfügbar: {', '.join(EMBEDDING_MODELLE)}")
+    spec = EMBEDDING_MODELLE[name]
+    start = time.perf_counter()
+    if spec["backend"] == "ollama":
+        service = OllamaEmbeddingService(name, spec["modell"])
+    else:
+        backend = "torch" if spec["backend"] == "sentence_transformers" else spec["backend"]
+        modell = spec["modell"]
+        if spec.get("quantisierung"):
+            modell = bereite_quantisiertes_modell_vor(name, modell, spec["datei"], spec["quantisierung"])
+        service = SentenceTransformerService(name, modell, backend=backend, datei=spec.get("datei"))
+    print(f"✅ Embedding-Modell '{name}' geladen ({time.perf_counter() - start:.1f}s).")
+    _services[name] = service
+    return service
+
+
+def collection_name(name):
+    # e5-large bleibt in der bisherigen Default-Collection, damit bestehende Indizes weiter passen
+    return "langchain" if name == "e5-large" else f"chats_{name.replace('-', '_')}"
+
+
+def pruefe_index_info(name, dimension, pfad=INDEX_INFO_DATEI):
+    """
+    Merkt sich pro Collection, mit welchem Modell und welcher Dimension sie gebaut wurde,
+    und verweigert das Mischen verschiedener Modelle in einem Index.
+    """
+    info = {}
+    if os.path.exists(pfad):
+        with open(pfad, "r", encoding="utf-8") as f:
+            info = json.load(f)
+    collection = collection_name(name)
+    eintrag = info.get(collection)
+    if eintrag and (eintrag["modell"] != name or eintrag["dimension"] != dimension):
+        raise ValueError(
+            f"Collection '{collection}' wurde mit {eintrag['modell']} ({eintrag['dimension']} Dim.) gebaut, "
+            f"nicht mit {name} ({dimension} Dim.)"
+        )
+    if not eintrag:
+        info[collection] = {"modell": name, "modell_id": EMBEDDING_MODELLE[name]["modell"], "dimension": dimension}
+        os.makedirs(os.path.dirname(pfad) or ".", exist_ok=True)
+        with open(pfad, "w", encoding="utf-8") as f:
+            json.dump(info, f, indent=2)
+    return collection
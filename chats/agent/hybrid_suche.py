@@ -0,0 +1,86 @@
+from agent.chunking import aggregiere_chunk_treffer
+from agent.config import RRF_K
+
+KANDIDATEN_FAKTOR = 4  # pro Chat können mehrere Chunks treffen -> mehr holen und danach pro Chat bündeln
+
+
+def rrf_fusion(ranglisten, rrf_k=RRF_K, gewichte=None):
+    """Reciprocal-Rank-Fusion: ranglisten = [[chat_id, ...], ...] -> {chat_id: score}."""
+    gewichte = gewichte or [1.0] * len(ranglisten)
+    scores = {}
+    for liste, gewicht in zip(ranglisten, gewichte):
+        for rang, chat_id in enumerate(liste, 1):
+            scores[chat_id] = scores.get(chat_id, 0.0) + gewicht / (rrf_k + rang)
+    return scores
+
+
+def vektor_treffer(query, vectordb, k, query_embedding=None, pooling="max"):
+    """Chroma-Treffer pro Chat gebündelt: {chat_id: (doc, embedding_relevanz)} in Rangfolge."""
+    anzahl = k * KANDIDATEN_FAKTOR
+    if query_embedding is not None:
+        roh = vectordb.similarity_search_by_vector_with_relevance_scores(list(map(float, query_embedding)), k=anzahl)
+    else:
+        roh = vectordb.similarity_search_with_score(f"query: {query}", k=anzahl)
+    ergebnis = {}
+    for doc, distanz in aggregiere_chunk_treffer(roh, k=k, modus=pooling):
+        # Chroma liefert die quadrierte L2-Distanz normalisierter Vektoren: cos = 1 - d/2
+        ergebnis[doc.metadata.get("chat_id")] = (doc, round(1 - float(distanz) / 2, 3))
+    return ergebnis
+
+
+def _kosinus(a, b):
+    a, b = list(map(float, a)), list(map(float, b))
+    norm = (sum(x * x for x in a) * sum(y * y for y in b)) ** 0.5
+    return sum(x * y for x, y in zip(a, b)) / norm if norm else 0.0
+
+
+def ergaenze_embedding_relevanz(treffer, vectordb, query_embedding):
+    """
+    Reine BM25-Treffer haben keinen Vektor-Rang und damit embedding_relevanz 0.0 – für sie die echte
+    Kosinus-Ähnlichkeit aus ihren gespeicherten Vektoren nachtragen (bestes Dokument/Chunk, wie pooling="max").
+    """
+    fehlend = [t["chat_id"] for t in treffer if t["vektor_rang"] is None]
+    if not fehlend:
+        return treffer
+    daten = vectordb.get(where={"chat_id": {"$in": fehlend}}, include=["embeddings", "metadatas"])
+    beste = {}
+    for embedding, meta in zip(daten["embeddings"], daten["metadatas"]):
+        chat_id = (meta or {}).get("chat_id")
+        beste[chat_id] = max(beste.get(chat_id, -1.0), _kosinus(query_embedding, embedding))
+    for t in treffer:
+        if t["chat_id"] in beste and t["vektor_rang"] is None:
+            t["embedding_relevanz"] = round(beste[t["chat_id"]], 3)
+    return treffer
+
+
+def suche_hybrid(query, vectordb, bm25, k=20, query_embedding=None, gewicht_vektor=1.0, gewicht_bm25=1.0,
+                 rrf_k=RRF_K, pooling="max"):
+    """
+    Vektor- und BM25-Rangliste per RRF zusammenführen.
+    Liefert [{"chat_id", "titel", "score", "embedding_relevanz", "keyword_relevanz", "vektor_rang", "bm25_rang"}, ...].
+    Mit query_embedding bekommen auch reine BM25-Treffer ihre echte embedding_relevanz.
+    """
+    vektor = vektor_treffer(query, vectordb, k, query_embedding, pooling) if vectordb is not None else {}
+    keyword = bm25.suche(query, k) if bm25 is not None else []
+    max_bm25 = keyword[0][1] if keyword else 0.0
+
+    vektor_rang = {cid: i for i, cid in enumerate(vektor, 1)}
+    bm25_rang = {cid: i for i, (cid, _) in enumerate(keyword, 1)}
+    bm25_score = dict(keyword)
+    scores = rrf_fusion([list(vektor), [cid for cid, _ in keyword]], rrf_k, [gewicht_vektor, gewicht_bm25])
+
+    treffer = []
+    for chat_id, score in sorted(scores.items(), key=lambda x: x[1], reverse=True)[:k]:
+        doc, embedding_relevanz = vektor.get(chat_id, (None, 0.0))
+        treffer.append({
+            "chat_id": chat_id,
+            "titel": doc.metadata.get("title", "") if doc is not None else "",
+            "score": score,
+            "embedding_relevanz": embedding_relevanz,
+            "keyword_relevanz": round(bm25_score.get(chat_id, 0.0) / max_bm25, 3) if max_bm25 else 0.0,
+            "vektor_rang": vektor_rang.get(chat_id),
+            "bm25_rang": bm25_rang.get(chat_id),
+        })
+    if query_embedding is not None and vectordb is not None:
+        ergaenze_embedding_relevanz(treffer, vectordb, query_embedding)
+    return treffer
@@ -0,0 +1,239 @@
+"""
+Import als Dienst: überwacht IMPORT_ORDNER und importiert jeden neuen oder geänderten Export (conversations.json
+oder das ZIP aus ChatGPT). Embedding-Modell, Klassifikator, BM25-/Duplikat-Index und DB-Verbindung bleiben zwischen
+den Exporten warm (ImportSitzung) – ein neuer Export kostet nur seine geänderten Chats.
+
+Fortschritt und Queue-Tiefen stehen laufend in IMPORT_STATUS_DATEI, mit --port zusätzlich unter http://127.0.0.1:<port>/status
+
+    python -m agent.import_dienst --ordner D:/Downloads/chatgpt --port 8765
+"""
+import argparse
+import json
+import os
+import signal
+import threading
+import time
+import zipfile
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from agent.config import (IMPORT_ORDNER, IMPORT_INTERVALL, IMPORT_DIENST_STAND_DATEI, IMPORT_STATUS_DATEI,
+                          IMPORT_MAX_VERSUCHE, IMPORT_MAX_BACKOFF)
+from agent.chat_loader import lade_json_stream
+from agent.task_runner import ImportSitzung
+
+ENDUNGEN = (".json", ".zip")
+
+
+def datei_signatur(pfad):
+    stat = os.stat(pfad)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def lade_stand(pfad=IMPORT_DIENST_STAND_DATEI):
+    if not os.path.exists(pfad):
+        return {}
+    with open(pfad, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def schreibe_json_atomar(pfad, daten):
+    # Erst temporär schreiben und dann ersetzen – Leser sehen nie eine halbe Datei
+    os.makedirs(os.path.dirname(pfad) or ".", exist_ok=True)
+    tmp = f"{pfad}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(daten, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp, pfad)
+
+
+class ImportDienst:
+    def __init__(self, ordner=IMPORT_ORDNER, intervall=IMPORT_INTERVALL, stand_pfad=IMPORT_DIENST_STAND_DATEI,
+                 status_pfad=IMPORT_STATUS_DATEI):
+        self.ordner = ordner
+        self.intervall = intervall
+        self.stand_pfad = stand_pfad
+        self.status_pfad = status_pfad
+        self.erledigt = lade_stand(stand_pfad)    # Dateiname -> {"signatur": [mtime_ns, groesse], ...}
+        self.wartend = []                          # stabile, noch nicht importierte Dateien (älteste zuerst)
+        self.versuche = {}                         # Dateiname -> {"signatur", "anzahl", "naechster_versuch"}
+        self._zuletzt_gesehen = {}                 # Dateiname -> Signatur beim letzten Blick
+        self.aktuell = None
+        self.letzter_fehler = None
+        self.gestartet = datetime.now()
+        self.stopp = threading.Event()
+        self.sitzung = None
+
+    def suche_exporte(self):
+        """Neue/geänderte Exporte in die Warteschlange – erst, wenn sie zwei Blicke lang unverändert sind (Kopie fertig)."""
+        if not os.path.isdir(self.ordner):
+            return
+        gesehen = {}
+        for name in os.listdir(self.ordner):
+            pfad = os.path.join(self.ordner, name)
+            if not name.lower().endswith(ENDUNGEN) or not os.path.isfile(pfad):
+                continue
+            try:
+                signatur = datei_signatur(pfad)
+            except OSError:
+                continue  # gerade gelöscht/umbenannt
+            gesehen[name] = signatur
+            if name in self.versuche and self.versuche[name]["signatur"] != signatur:
+                del self.versuche[name]  # neue Fassung der Datei – Fehlversuche zählen von vorn
+            bekannt = self.erledigt.get(name)
+            if bekannt and bekannt["signatur"] == signatur:
+                continue
+            if self._zuletzt_gesehen.get(name) == signatur and name not in self.wartend:
+                self.wartend.append(name)
+        self._zuletzt_gesehen = gesehen
+        self.wartend = [n for n in self.wartend if n in gesehen]
+        self.wartend.sort(key=lambda n: gesehen[n][0])
+
+    def faellig(self, name):
+        return time.time() >= self.versuche.get(name, {}).get("naechster_versuch", 0)
+
+    def _fehlversuch(self, name, signatur, grund):
+        """
+        Backoff je Datei; nach IMPORT_MAX_VERSUCHE gilt sie als erledigt (mit Fehler), damit ein Chat, der jedes Mal
+        scheitert, nicht alle neueren Exporte blockiert. True = aufgegeben, False = später erneut versuchen.
+        """
+        self.letzter_fehler = f"{name}: {grund}"
+        anzahl = self.versuche.get(name, {}).get("anzahl", 0) + 1
+        if anzahl >= IMPORT_MAX_VERSUCHE:
+            print(f"🛑 {name}: nach {anzahl} Versuchen aufgegeben ({grund}) – erst eine geänderte Datei wird neu importiert.")
+            self.versuche.pop(name, None)
+            self.erledigt[name] = {"signatur": signatur, "fehler": grund, "versuche": anzahl, "aufgegeben": True,
+                                   "am": datetime.now().isoformat()}
+            return True
+        wartezeit = min(self.intervall * 2 ** (anzahl - 1), IMPORT_MAX_BACKOFF)
+        self.versuche[name] = {"signatur": signatur, "anzahl": anzahl, "naechster_versuch": time.time() + wartezeit}
+        print(f"🔁 {name}: Versuch {anzahl}/{IMPORT_MAX_VERSUCHE} fehlgeschlagen, nächster in {wartezeit:.0f}s")
+        return False
+
+    def importiere(self, name):
+        """True, wenn die Datei die Warteschlange verlassen hat (importiert, ungültig oder aufgegeben)."""
+        pfad = os.path.join(self.ordner, name)
+        if not os.path.isfile(pfad):
+            self.wartend.remove(name)
+            return True
+        signatur = datei_signatur(pfad)
+        self.aktuell = name
+        start = time.perf_counter()
+        print(f"📥 Neuer Export: {name}")
+        try:
+            ergebnis = self.sitzung.importiere(lade_json_stream(pfad), name)
+        except (ValueError, zipfile.BadZipFile) as e:
+            # Kaputte Datei: nicht endlos neu versuchen, erst wieder wenn sie sich ändert
+            print(f"❌ {name} ist kein gültiger Export: {e}")
+            self.letzter_fehler = f"{name}: {e}"
+            self.erledigt[name] = {"signatur": signatur, "fehler": str(e), "am": datetime.now().isoformat()}
+        except Exception as e:
+            # z. B. DB nicht erreichbar – Datei bleibt (mit Backoff) in der Warteschlange
+            print(f"❌ Import von {name} fehlgeschlagen: {e}")
+            if not self._fehlversuch(name, signatur, str(e)):
+                return False
+        else:
+            if ergebnis["fehlgeschlagen"]:
+                # z. B. Ollama nicht erreichbar: diese Chats sind ohne Hash gespeichert, der nächste Versuch
+                # holt nur sie nach (alle anderen sind dann unverändert)
+                print(f"⚠️ {name}: {ergebnis['fehlgeschlagen']} Chats fehlgeschlagen")
+                if not self._fehlversuch(name, signatur, f"{ergebnis['fehlgeschlagen']} Chats fehlgeschlagen"):
+                    return False
+                # aufgegeben: die Chats ohne Hash versucht trotzdem jeder spätere Export erneut
+            else:
+                self.versuche.pop(name, None)
+                geaendert = next((s["ausgang"] for s in ergebnis["stufen"] if s["stufe"] == "db"), 0)
+                self.erledigt[name] = {"signatur": signatur, "chats_geaendert": geaendert,
+                                       "am": datetime.now().isoformat(), "sekunden": round(time.perf_counter() - start, 1)}
+                print(f"✅ {name}: {geaendert} neue/geänderte Chats in {time.perf_counter() - start:.1f}s")
+        finally:
+            self.aktuell = None
+        schreibe_json_atomar(self.stand_pfad, self.erledigt)
+        self.wartend.remove(name)
+        return True
+
+    def status(self):
+        return {
+            "zustand": "importiert" if self.aktuell else "wartet",
+            "ordner": self.ordner,
+            "gestartet": self.gestartet,
+            "aktueller_export": self.aktuell,
+            "wartende_exporte": list(self.wartend),
+            "fehlversuche": {name: {"anzahl": v["anzahl"], "naechster_versuch": datetime.fromtimestamp(v["naechster_versuch"])}
+                             for name, v in self.versuche.items()},
+            "erledigte_exporte": len(self.erledigt),
+            "aufgegebene_exporte": sorted(name for name, e in self.erledigt.items() if e.get("aufgegeben")),
+            "letzter_fehler": self.letzter_fehler,
+            "import": self.sitzung.status() if self.sitzung else None,
+        }
+
+    def _schreibe_status_laufend(self):
+        while not self.stopp.wait(2):
+            try:
+                schreibe_json_atomar(self.status_pfad, self.status())
+            except OSError as e:
+                print(f"⚠️ Status-Datei nicht geschrieben: {e}")
+
+    def starte_http(self, port):
+        dienst = self
+
+        class StatusHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/status"):
+                    self.send_error(404)
+                    return
+                daten = json.dumps(dienst.status(), ensure_ascii=False, default=str).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(daten)))
+                self.end_headers()
+                self.wfile.write(daten)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", port), StatusHandler)
+        threading.Thread(target=server.serve_forever, name="status-http", daemon=True).start()
+        print(f"📡 Status unter http://127.0.0.1:{port}/status")
+        return server
+
+    def laufe(self):
+        os.makedirs(self.ordner, exist_ok=True)
+        print(f"👀 Überwache {self.ordner} (alle {self.intervall}s)")
+        # Modelle, Indizes und DB-Verbindung einmal laden und für alle Exporte behalten
+        self.sitzung = ImportSitzung()
+        threading.Thread(target=self._schreibe_status_laufend, name="status-datei", daemon=True).start()
+        try:
+            while not self.stopp.is_set():
+                self.suche_exporte()
+                # Eine scheiternde Datei wartet ihren Backoff ab, die übrigen laufen weiter
+                for name in list(self.wartend):
+                    if self.stopp.is_set():
+                        break
+                    if self.faellig(name):
+                        self.importiere(name)
+                self.stopp.wait(self.intervall)
+        finally:
+            self.stopp.set()
+            self.sitzung.close()
+            schreibe_json_atomar(self.status_pfad, {**self.status(), "zustand": "beendet"})
+            print("👋 Import-Dienst beendet.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ChatGPT-Exporte aus einem Ordner laufend importieren")
+    parser.add_argument("--ordner", default=IMPORT_ORDNER)
+    parser.add_argument("--intervall", type=float, default=IMPORT_INTERVALL, help="Sekunden zwischen zwei Blicken in den Ordner")
+    parser.add_argument("--port", type=int, default=None, help="Status zusätzlich per HTTP (nur localhost)")
+    args = parser.parse_args()
+
+    dienst = ImportDienst(args.ordner, args.intervall)
+    # Strg+C/SIGTERM: laufenden Export noch fertig importieren, dann sauber beenden
+    signal.signal(signal.SIGINT, lambda *_: dienst.stopp.set())
+    signal.signal(signal.SIGTERM, lambda *_: dienst.stopp.set())
+    if args.port:
+        dienst.starte_http(args.port)
+    dienst.laufe()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Schneller lokaler Kategorie-Klassifikator: Chat einmal embedden und mit Kategorie-Prototypen vergleichen.
+Die Prototypen sind gewichtete Zentroiden der bereits kategorisierten Chats (chat_kategorien + Chroma-Embeddings).
+Eingebettet wird dasselbe Dokument, das danach in Chroma landet (vectorstore.dokument_text) – über die
+gecachten Embeddings der Collection, die Embedding-Stufe rechnet den Vektor also nicht noch einmal.
+Nur wenn die Sicherheit unter KLASSIFIKATOR_SCHWELLE liegt, muss das LLM ran.
+"""
+import threading
+
+import numpy as np
+
+from agent.config import KLASSIFIKATOR_SCHWELLE, KLASSIFIKATOR_MIN_BEISPIELE, KLASSIFIKATOR_MIN_RELEVANZ
+from agent.embedding_service import erzeuge_embedding_service
+from agent.vectorstore import hole_chat_embeddings
+
+
+def _normiere(matrix):
+    normen = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(normen == 0, 1, normen)
+
+
+def lade_trainingsdaten(cursor, vectordb):
+    """
+    [(embedding, {kategorie: relevanz 0-100}), ...] für alle Chats mit manuellen/LLM-Kategorien.
+    Eigene Vorschläge (quelle='embedding') bleiben draußen, damit sich der Klassifikator nicht selbst bestätigt.
+    """
+    cursor.execute(
+        "SELECT c.chat_id, k.name, ck.relevanz FROM chat_kategorien ck "
+        "JOIN chats c ON c.id = ck.chat_id JOIN kategorien k ON k.id = ck.kategorie_id "
+        "WHERE ck.quelle IS NULL OR ck.quelle <> 'embedding'"
+    )
+    labels = {}
+    for row in cursor.fetchall():
+        # einheitlich 0-100 (Migration 4 hat die alte Skala 1-5 umgerechnet)
+        relevanz = float(row["relevanz"] or 0)
+        labels.setdefault(row["chat_id"], {})[row["name"].lower()] = relevanz
+
+    if not labels:
+        return []
+    return [(embedding, labels[chat_id]) for chat_id, embedding in hole_chat_embeddings(vectordb).items()
+            if chat_id in labels]
+
+
+class KategorieKlassifikator:
+    def __init__(self, embeddings=None, schwelle=KLASSIFIKATOR_SCHWELLE, min_beispiele=KLASSIFIKATOR_MIN_BEISPIELE,
+                 min_relevanz=KLASSIFIKATOR_MIN_RELEVANZ):
+        self.embeddings = embeddings or erzeuge_embedding_service()
+        self.schwelle = schwelle
+        self.min_beispiele = min_beispiele
+        self.min_relevanz = min_relevanz
+        self.kategorien = []
+        self.zentroiden = None
+        self.typisch = None   # mittlere Ähnlichkeit der eigenen Chats zum Zentroid
+        self.unten = None     # mittlere Ähnlichkeit fremder Chats zum Zentroid
+        self.embedding_treffer = 0
+        self.llm_fallback = 0
+        self._lock = threading.Lock()
+
+    def trainiere(self, beispiele):
+        if not beispiele:
+            return self
+        vektoren = _normiere(np.asarray([e for e, _ in beispiele], dtype=np.float32))
+        zaehler = {}
+        for _, labels in beispiele:
+            for kat in labels:
+                zaehler[kat] = zaehler.get(kat, 0) + 1
+        self.kategorien = sorted(kat for kat, n in zaehler.items() if n >= self.min_beispiele)
+        if not self.kategorien:
+            return self
+
+        # Gewichte: Relevanz/100 je (Chat, Kategorie)
+        gewichte = np.zeros((len(beispiele), len(self.kategorien)), dtype=np.float32)
+        spalte = {kat: j for j, kat in enumerate(self.kategorien)}
+        for i, (_, labels) in enumerate(beispiele):
+            for kat, relevanz in labels.items():
+                if kat in spalte:
+                    gewichte[i, spalte[kat]] = max(relevanz, 1) / 100
+        self.zentroiden = _normiere(gewichte.T @ vektoren)
+
+        # Kalibrierung je Kategorie: Median der Mitglieder -> 100, Median der Nicht-Mitglieder -> 0
+        aehnlichkeit = vektoren @ self.zentroiden.T
+        mitglied = gewichte > 0
+        self.typisch = np.array([np.median(aehnlichkeit[mitglied[:, j], j]) for j in range(len(self.kategorien))])
+        self.unten = np.array([
+            np.median(aehnlichkeit[~mitglied[:, j], j]) if (~mitglied[:, j]).any() else self.typisch[j] - 0.1
+            for j in range(len(self.kategorien))
+        ])
+        self.unten = np.minimum(self.unten, self.typisch - 0.01)
+        print(f"🧭 Kategorie-Prototypen: {len(self.kategorien)} Kategorien aus {len(beispiele)} Chats")
+        return self
+
+    def klassifiziere(self, dokument):
+        """{kategorie: relevanz 0-100} (nur >= min_relevanz) und Sicherheit 0-1 für einen Dokumenttext."""
+        if self.zentroiden is None:
+            return {}, 0.0
+        # embed_documents statt embed_query: nur das läuft durch den Embedding-Cache
+        embedding = np.asarray(self.embeddings.embed_documents([dokument])[0], dtype=np.float32)
+        aehnlichkeit = self.zentroiden @ _normiere(embedding)
+        relevanz = np.clip((aehnlichkeit - self.unten) / (self.typisch - self.unten), 0, 1) * 100
+        kategorien = {kat: int(round(r)) for kat, r in zip(self.kategorien, relevanz) if r >= self.min_relevanz}
+        sicherheit = float(relevanz.max()) / 100 if kategorien else 0.0
+        return kategorien, sicherheit
+
+    def schlage_vor(self, dokument):
+        """Kategorien, wenn der Klassifikator sicher genug ist – sonst None (LLM-Fallback)."""
+        kategorien, sicherheit = self.klassifiziere(dokument)
+        sicher = sicherheit >= self.schwelle
+        with self._lock:
+            if sicher:
+                self.embedding_treffer += 1
+            else:
+                self.llm_fallback += 1
+        return kategorien if sicher else None
+
+    def drucke_statistik(self):
+        gesamt = self.embedding_treffer + self.llm_fallback
+        if not gesamt:
+            return
+        print(f"🧭 Kategorien: {self.embedding_treffer} per Embedding, {self.llm_fallback} per LLM "
+              f"(Fallback-Quote {100 * self.llm_fallback / gesamt:.1f} %)")
+
+
+def erstelle_klassifikator(cursor, vectordb):
+    # Dieselbe (gecachte) Embedding-Funktion wie die Collection
+    return KategorieKlassifikator(vectordb.embeddings).trainiere(lade_trainingsdaten(cursor, vectordb))
@@ -1,19 +1,33 @@
-import subprocess
+import json
 import re
+from agent.llm_client import hole_client, LLMFehler
+
+# Prompt-Versionen für den LLM-Cache
+KATEGORIEVORSCHLAG_VORLAGE = "kategorievorschlag-v1"
+ZUSAMMENFASSUNG_KATEGORIEN_VORLAGE = "zusammenfassung-kategorien-v1"
+KATEGORIEN_VORLAGE = "kategorien-v1"
 
 def braucht_llm_kategorisierung(chat_id, cursor):
     cursor.execute(
-        "SELECT COUNT(*) as anzahl FROM chat_kategorien WHERE chat_id = %s AND quelle IN ('llama3', 'gpt4')",
+        "SELECT COUNT(*) as anzahl FROM chat_kategorien WHERE chat_id = %s AND quelle IN ('llama3', 'gpt4', 'embedding')",
         (chat_id,)
     )
     result = cursor.fetchone()
     return result["anzahl"] == 0
 
+def hole_llm_kategorisierte_chats(cursor):
+    # Vorab in einer Abfrage: welche Chats (Export-ID) haben schon LLM-Kategorien?
+    cursor.execute(
+        "SELECT DISTINCT c.chat_id FROM chat_kategorien ck JOIN chats c ON c.id = ck.chat_id "
+        "WHERE ck.quelle IN ('llama3', 'gpt4', 'embedding')"
+    )
+    return {row["chat_id"] for row in cursor.fetchall()}
+
 def hole_kategorien(cursor):
     cursor.execute("SELECT id, name FROM kategorien")
     return {row["name"].lower(): row["id"] for row in cursor.fetchall()}
 
-def generiere_kategorievorschlag(text, kategorien_liste):
+def generiere_kategorievorschlag(text, kategorien_liste, client=None):
     kategorien_str = ", ".join(kategorien_liste)
     prompt = (
         f"Weise dem folgenden Inhalt eine oder mehrere passende Kategorien zu:\n"
@@ -25,9 +39,11 @@ def generiere_kategorievorschlag(text, kategorien_liste):
         f"\nBeispiel: \n* Bewerbung: 5/5"
         f"\nBitte keine Zeile mit N/A ausgeben"
     )
-    result = subprocess.run(["ollama", "run", "llama3", prompt],
-                            capture_output=True, text=True, timeout=90, encoding="utf-8", errors="ignore")
-    return result.stdout.strip()
+    try:
+        return (client or hole_client()).generiere(prompt, vorlage=KATEGORIEVORSCHLAG_VORLAGE)
+    except LLMFehler as e:
+        print(f"❌ Kategorievorschlag fehlgeschlagen: {e}")
+        return ""
 
 def extrahiere_kategorien_und_relevanz(text, kategorien_liste):
     kategorien_gefunden = {}
@@ -53,3 +69,87 @@ def extrahiere_kategorien_und_relevanz(text, kategorien_liste):
         if relevanz >= 40:
             kategorien_gefunden[katname] = relevanz
     return list(kategorien_gefunden.items())
+
+def generiere_zusammenfassung_und_kategorien(text, kategorien_liste, client=None):
+    """Ein LLM-Aufruf für Zusammenfassung + Kategorien (JSON-Modus), statt den Chat zweimal zu schicken."""
+    kategorien_str = ", ".join(kategorien_liste)
+    prompt = (
+        f"Lies den folgenden Chat und antworte ausschließlich mit einem JSON-Objekt in genau diesem Format:\n"
+        f'{{"zusammenfassung": "<max. 3 Sätze>", "kategorien": {{"<kategorie>": <relevanz 1-5>}}}}\n\n'
+        f"Erlaubte Kategorien (nur diese, exakt so geschrieben): {kategorien_str}\n"
+        f"Nur passende Kategorien aufführen, keine Erklärungen.\n\n"
+        f"Chat:\n{text}"
+    )
+    try:
+        return (client or hole_client()).generiere(prompt, format="json", vorlage=ZUSAMMENFASSUNG_KATEGORIEN_VORLAGE)
+    except LLMFehler as e:
+        print(f"❌ Zusammenfassung/Kategorien fehlgeschlagen: {e}")
+        return ""
+
+def generiere_kategorien(text, kategorien_liste, client=None):
+    """Nur Kategorien (JSON-Modus) – für lange Chats, deren Zusammenfassung schon per Map-Reduce entstanden ist."""
+    kategorien_str = ", ".join(kategorien_liste)
+    prompt = (
+        f"Lies die folgende Zusammenfassung eines Chats und antworte ausschließlich mit einem JSON-Objekt in genau diesem Format:\n"
+        f'{{"kategorien": {{"<kategorie>": <relevanz 1-5>}}}}\n\n'
+        f"Erlaubte Kategorien (nur diese, exakt so geschrieben): {kategorien_str}\n"
+        f"Nur passende Kategorien aufführen, keine Erklärungen.\n\n"
+        f"Chat:\n{text}"
+    )
+    try:
+        return (client or hole_client()).generiere(prompt, format="json", vorlage=KATEGORIEN_VORLAGE)
+    except LLMFehler as e:
+        print(f"❌ Kategorien fehlgeschlagen: {e}")
+        return ""
+
+def _relevanz_in_prozent(wert):
+    # akzeptiert 4, 4.0, "4", "4/5" oder schon 0-100
+    if isinstance(wert, str):
+        match = re.search(r"(\d+(?:\.\d+)?)\s*(?:/\s*(\d+))?", wert)
+        if not match:
+            return None
+        zahl = float(match.group(1))
+        nenner = float(match.group(2)) if match.group(2) else None
+    elif isinstance(wert, (int, float)) and not isinstance(wert, bool):
+        zahl, nenner = float(wert), None
+    else:
+        return None
+    if nenner:
+        return int(zahl / nenner * 100)
+    return int(zahl * 20) if zahl <= 5 else int(min(zahl, 100))
+
+def werte_llm_antwort_aus(raw, kategorien_liste):
+    """
+    Liefert (zusammenfassung, [(kategorie, relevanz 0-100), ...]).
+    Nur Kategorien aus der Tabelle kategorien werden übernommen; ist die Antwort kein JSON,
+    greift der alte Regex-Parser und die Zusammenfassung ist None.
+    """
+    erlaubt = {k.lower() for k in kategorien_liste}
+    try:
+        daten = json.loads(raw)
+        if not isinstance(daten, dict):
+            raise ValueError("kein JSON-Objekt")
+    except ValueError:
+        return None, extrahiere_kategorien_und_relevanz(raw, kategorien_liste)
+
+    zusammenfassung = daten.get("zusammenfassung")
+    if not isinstance(zusammenfassung, str) or not zusammenfassung.strip():
+        zusammenfassung = None
+    else:
+        zusammenfassung = zusammenfassung.strip()
+
+    kategorien = daten.get("kategorien") or {}
+    if isinstance(kategorien, list):
+        # manche Modelle liefern [{"name": ..., "relevanz": ...}]
+        kategorien = {
+            str(k.get("name") or k.get("kategorie") or ""): k.get("relevanz")
+            for k in kategorien if isinstance(k, dict)
+        }
+    gefunden = {}
+    if isinstance(kategorien, dict):
+        for name, wert in kategorien.items():
+            katname = str(name).strip().lower()
+            relevanz = _relevanz_in_prozent(wert)
+            if katname in erlaubt and relevanz is not None and relevanz >= 40:
+                gefunden[katname] = relevanz
+    return zusammenfassung, list(gefunden.items())
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from agent.config import NACHRICHTEN_CACHE_PFAD
+
+IGNORIERTE_ROLLEN = {"system"}
+
+
+def _nachricht_text(message):
+    content = message.get("content") or {}
+    if not isinstance(content, dict):
+        return ""
+    teile = []
+    for teil in content.get("parts") or []:
+        if isinstance(teil, str):
+            teile.append(teil)
+        elif isinstance(teil, dict) and isinstance(teil.get("text"), str):
+            teile.append(teil["text"])
+    # code / execution_output u. ä. haben kein parts-Feld, sondern direkt text
+    if not teile and isinstance(content.get("text"), str):
+        teile.append(content["text"])
+    return "\n".join(t for t in teile if t).strip()
+
+
+def _aktiver_pfad(mapping, current_node):
+    """Knoten-IDs des aktiven Threads von der Wurzel bis current_node (O(n), ohne Zyklen)."""
+    pfad = []
+    gesehen = set()
+    if current_node in mapping:
+        knoten_id = current_node
+        while knoten_id in mapping and knoten_id not in gesehen:
+            gesehen.add(knoten_id)
+            pfad.append(knoten_id)
+            knoten_id = mapping[knoten_id].get("parent")
+        pfad.reverse()
+        return pfad
+
+    # Ohne current_node: von der Wurzel immer dem jüngsten Kind folgen (letzte Regeneration)
+    wurzeln = [k for k, n in mapping.items() if n.get("parent") not in mapping]
+    knoten_id = wurzeln[0] if wurzeln else None
+    while knoten_id in mapping and knoten_id not in gesehen:
+        gesehen.add(knoten_id)
+        pfad.append(knoten_id)
+        kinder = [k for k in mapping[knoten_id].get("children") or [] if k in mapping]
+        knoten_id = kinder[-1] if kinder else None
+    return pfad
+
+
+def linearisiere_mapping(mapping, current_node=None):
+    """
+    Liefert den aktiven Gesprächsverlauf als geordnete Liste:
+    [{"rolle": "user", "text": "...", "erstellt_am": datetime|None, "node_id": "..."}, ...]
+    Verworfene Zweige/Regenerationen, System- und versteckte Nachrichten fallen raus.
+    """
+    nachrichten = []
+    for knoten_id in _aktiver_pfad(mapping or {}, current_node):
+        message = mapping[knoten_id].get("message")
+        if not isinstance(message, dict):
+            continue
+        rolle = (message.get("author") or {}).get("role", "unknown")
+        if rolle in IGNORIERTE_ROLLEN:
+            continue
+        if (message.get("metadata") or {}).get("is_visually_hidden_from_conversation"):
+            continue
+        text = _nachricht_text(message)
+        if not text:
+            continue
+        zeit = message.get("create_time")
+        nachrichten.append({
+            "rolle": rolle,
+            "text": text,
+            "erstellt_am": datetime.fromtimestamp(zeit) if zeit else None,
+            "node_id": knoten_id,
+        })
+    return nachrichten
+
+
+def berechne_inhalts_hash(nachrichten, update_time):
+    """Stabiler Hash über den aktiven Thread + update_time – ändert sich nur, wenn sich der Chat wirklich ändert."""
+    h = hashlib.sha256()
+    h.update(repr(float(update_time or 0)).encode("utf-8"))
+    for n in nachrichten:
+        h.update(b"\x1e")
+        h.update(n["rolle"].encode("utf-8"))
+        h.update(b"\x1f")
+        h.update(n["text"].encode("utf-8"))
+    return h.hexdigest()
+
+
+class NachrichtenCache:
+    """Persistenter Cache der linearisierten Threads, Schlüssel: chat_id + update_time."""
+
+    def __init__(self, pfad=NACHRICHTEN_CACHE_PFAD):
+        os.makedirs(os.path.dirname(pfad) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(pfad, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS nachrichten (chat_id TEXT PRIMARY KEY, update_time REAL, daten TEXT)"
+        )
+
+    def hole(self, chat_id, update_time):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT daten FROM nachrichten WHERE chat_id = ? AND update_time = ?", (chat_id, update_time)
+            ).fetchone()
+        if not row:
+            return None
+        nachrichten = json.loads(row[0])
+        for n in nachrichten:
+            n["erstellt_am"] = datetime.fromtimestamp(n["erstellt_am"]) if n["erstellt_am"] else None
+        return nachrichten
+
+    def speichere(self, chat_id, update_time, nachrichten):
+        daten = json.dumps([
+            {**n, "erstellt_am": n["erstellt_am"].timestamp() if n["erstellt_am"] else None}
+            for n in nachrichten
+        ], ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO nachrichten (chat_id, update_time, daten) VALUES (?, ?, ?)",
+                (chat_id, update_time, daten)
+            )
+            self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+def linearisiere_chat(chat, cache=None):
+    """Aktiver Thread eines Export-Chats; mit cache wird bei unverändertem update_time nicht neu traversiert."""
+    chat_id = chat.get("id")
+    update_time = chat.get("update_time") or 0
+    if cache is not None and chat_id:
+        nachrichten = cache.hole(chat_id, update_time)
+        if nachrichten is not None:
+            return nachrichten
+    nachrichten = linearisiere_mapping(chat.get("mapping") or {}, chat.get("current_node"))
+    if cache is not None and chat_id:
+        cache.speichere(chat_id, update_time, nachrichten)
+    return nachrichten
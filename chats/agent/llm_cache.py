@@ -0,0 +1,120 @@
+"""
+Persistenter Antwort-Cache vor allen LLM-Aufrufen (SQLite).
+Schlüssel = sha256(Modell, Vorlagen-Version, Prompt, Optionen, Format) – unveränderte Chats kosten beim
+Re-Import keine Inferenz mehr. Größenbegrenzt: bei Überlauf fliegen die am längsten ungenutzten Einträge raus.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from agent.config import LLM_CACHE_PFAD, LLM_CACHE_MAX_MB
+
+
+def cache_schluessel(modell, vorlage, prompt, optionen=None, format=None):
+    roh = json.dumps(
+        {"modell": modell, "vorlage": vorlage or "", "prompt": prompt, "optionen": optionen or {}, "format": format or ""},
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha256(roh.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, pfad=LLM_CACHE_PFAD, max_bytes=LLM_CACHE_MAX_MB * 1024 * 1024):
+        self.pfad = pfad
+        self.max_bytes = max_bytes
+        self.treffer = 0
+        self.fehlschlaege = 0
+        self.verdraengt = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(pfad) or ".", exist_ok=True)
+        # Pipeline-Threads teilen sich eine Verbindung; Zugriffe laufen über den Lock
+        self.conn = sqlite3.connect(pfad, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS antworten ("
+            "schluessel TEXT PRIMARY KEY, modell TEXT, vorlage TEXT, antwort TEXT, "
+            "groesse INTEGER, erstellt REAL, benutzt REAL, treffer INTEGER DEFAULT 0)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_antworten_benutzt ON antworten (benutzt)")
+        self.conn.commit()
+        self.groesse = self.conn.execute("SELECT COALESCE(SUM(groesse), 0) FROM antworten").fetchone()[0]
+
+    def hole(self, schluessel):
+        with self._lock:
+            zeile = self.conn.execute("SELECT antwort FROM antworten WHERE schluessel = ?", (schluessel,)).fetchone()
+            if zeile is None:
+                self.fehlschlaege += 1
+                return None
+            self.treffer += 1
+            self.conn.execute(
+                "UPDATE antworten SET benutzt = ?, treffer = treffer + 1 WHERE schluessel = ?", (time.time(), schluessel)
+            )
+            self.conn.commit()
+            return zeile[0]
+
+    def speichere(self, schluessel, antwort, modell=None, vorlage=None):
+        groesse = len(antwort.encode("utf-8")) + len(schluessel)
+        jetzt = time.time()
+        with self._lock:
+            alt = self.conn.execute("SELECT groesse FROM antworten WHERE schluessel = ?", (schluessel,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO antworten (schluessel, modell, vorlage, antwort, groesse, erstellt, benutzt, treffer) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                (schluessel, modell, vorlage, antwort, groesse, jetzt, jetzt),
+            )
+            self.groesse += groesse - (alt[0] if alt else 0)
+            if self.groesse > self.max_bytes:
+                self._verdraenge()
+            self.conn.commit()
+
+    def _verdraenge(self):
+        # Auf 90 % des Limits runter, damit nicht jeder neue Eintrag wieder eine Verdrängung auslöst
+        ziel = self.max_bytes * 0.9
+        for schluessel, groesse in self.conn.execute(
+                "SELECT schluessel, groesse FROM antworten ORDER BY benutzt").fetchall():
+            if self.groesse <= ziel:
+                break
+            self.conn.execute("DELETE FROM antworten WHERE schluessel = ?", (schluessel,))
+            self.groesse -= groesse
+            self.verdraengt += 1
+
+    def leeren(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM antworten")
+            self.conn.commit()
+            self.groesse = 0
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM antworten").fetchone()[0]
+
+    def setze_statistik_zurueck(self):
+        # Der Import-Dienst nutzt einen Cache für viele Läufe – die Statistik soll je Lauf gelten
+        with self._lock:
+            self.treffer = self.fehlschlaege = self.verdraengt = 0
+
+    def statistik(self):
+        anfragen = self.treffer + self.fehlschlaege
+        return {
+            "treffer": self.treffer,
+            "fehlschlaege": self.fehlschlaege,
+            "trefferquote": self.treffer / anfragen if anfragen else 0.0,
+            "eintraege": len(self),
+            "groesse_mb": self.groesse / 1024 / 1024,
+            "verdraengt": self.verdraengt,
+        }
+
+    def drucke_statistik(self):
+        s = self.statistik()
+        if not s["treffer"] and not s["fehlschlaege"]:
+            return
+        print(f"🗄️ LLM-Cache: {s['treffer']} Treffer, {s['fehlschlaege']} neu berechnet "
+              f"({100 * s['trefferquote']:.1f} %), {s['eintraege']} Einträge / {s['groesse_mb']:.1f} MB, "
+              f"{s['verdraengt']} verdrängt")
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
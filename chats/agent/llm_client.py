@@ -0,0 +1,186 @@
+import json
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from agent.config import (OLLAMA_URL, OLLAMA_MODELL, OLLAMA_KEEP_ALIVE, LLM_TIMEOUT_VERBINDUNG,
+                          LLM_TIMEOUT_TOKEN, LLM_TIMEOUT_GESAMT, LLM_MAX_VERSUCHE, LLM_POOL_GROESSE, LLM_CACHE_AKTIV)
+from agent.llm_cache import LLMCache, cache_schluessel
+
+
+class LLMFehler(Exception):
+    """
+    Strukturierter Fehler einer LLM-Anfrage.
+    art: "verbindung" | "timeout" | "http" | "antwort"
+    """
+
+    def __init__(self, art, nachricht, status=None, versuche=1):
+        super().__init__(f"[{art}] {nachricht}")
+        self.art = art
+        self.nachricht = nachricht
+        self.status = status
+        self.versuche = versuche
+
+    @property
+    def wiederholbar(self):
+        return self.art in ("verbindung", "timeout") or (self.art == "http" and (self.status or 0) >= 500)
+
+
+class OllamaClient:
+    """
+    Dauerhafter Client für die lokale Ollama-HTTP-API.
+    Eine Session mit Keep-Alive-Pool für alle Chats – kein Prozessstart und kein Modell-Neuladen pro Prompt.
+    """
+
+    def __init__(self, basis_url=OLLAMA_URL, modell=OLLAMA_MODELL, timeout_verbindung=LLM_TIMEOUT_VERBINDUNG,
+                 timeout_token=LLM_TIMEOUT_TOKEN, timeout_gesamt=LLM_TIMEOUT_GESAMT,
+                 max_versuche=LLM_MAX_VERSUCHE, pool_groesse=LLM_POOL_GROESSE, keep_alive=OLLAMA_KEEP_ALIVE,
+                 cache=None):
+        self.basis_url = basis_url.rstrip("/")
+        self.cache = cache
+        self.modell = modell
+        self.timeout = (timeout_verbindung, timeout_token)
+        self.timeout_gesamt = timeout_gesamt
+        self.max_versuche = max_versuche
+        self.keep_alive = keep_alive
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_groesse)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _post(self, pfad, payload, stream=False):
+        try:
+            resp = self.session.post(f"{self.basis_url}{pfad}", json=payload, stream=stream, timeout=self.timeout)
+        except requests.Timeout as e:
+            raise LLMFehler("timeout", str(e))
+        except requests.ConnectionError as e:
+            raise LLMFehler("verbindung", str(e))
+        if resp.status_code != 200:
+            try:
+                text = resp.json().get("error", resp.text)
+            except ValueError:
+                text = resp.text
+            resp.close()
+            raise LLMFehler("http", text[:500], status=resp.status_code)
+        return resp
+
+    def _mit_wiederholung(self, funktion):
+        versuch = 0
+        while True:
+            versuch += 1
+            try:
+                return funktion()
+            except LLMFehler as e:
+                e.versuche = versuch
+                if not e.wiederholbar or versuch >= self.max_versuche:
+                    raise
+                wartezeit = 0.5 * 2 ** (versuch - 1)
+                print(f"⚠️ LLM-Anfrage fehlgeschlagen ({e.art}), neuer Versuch in {wartezeit:.1f}s ...")
+                time.sleep(wartezeit)
+
+    def _generate_payload(self, prompt, modell, optionen, format):
+        payload = {
+            "model": modell or self.modell,
+            "prompt": prompt,
+            "stream": True,
+            "keep_alive": self.keep_alive,
+        }
+        if optionen:
+            payload["options"] = optionen
+        if format:
+            payload["format"] = format
+        return payload
+
+    def _lies_stream(self, resp):
+        start = time.monotonic()
+        try:
+            for zeile in resp.iter_lines():
+                if not zeile:
+                    continue
+                try:
+                    teil = json.loads(zeile)
+                except ValueError:
+                    raise LLMFehler("antwort", f"Ungültige Stream-Zeile: {zeile[:200]!r}")
+                if teil.get("error"):
+                    raise LLMFehler("antwort", teil["error"])
+                if teil.get("response"):
+                    yield teil["response"]
+                if teil.get("done"):
+                    return
+                if time.monotonic() - start > self.timeout_gesamt:
+                    raise LLMFehler("timeout", f"Gesamt-Timeout von {self.timeout_gesamt}s überschritten")
+        except requests.Timeout as e:
+            raise LLMFehler("timeout", str(e))
+        except requests.ConnectionError as e:
+            raise LLMFehler("verbindung", str(e))
+        finally:
+            resp.close()
+        raise LLMFehler("antwort", "Stream ohne done=true beendet")
+
+    def stream(self, prompt, modell=None, optionen=None, format=None):
+        """Liefert die Antwort Token für Token. Wiederholt wird nur der Verbindungsaufbau."""
+        payload = self._generate_payload(prompt, modell, optionen, format)
+        resp = self._mit_wiederholung(lambda: self._post("/api/generate", payload, stream=True))
+        yield from self._lies_stream(resp)
+
+    def generiere(self, prompt, modell=None, optionen=None, format=None, bei_token=None, vorlage=None, cache=True):
+        """
+        Komplette Antwort als String; bei_token(token) wird für jeden gestreamten Block aufgerufen.
+        vorlage: Name/Version der Prompt-Vorlage – eine neue Version erzwingt frische Antworten trotz Cache.
+        """
+        payload = self._generate_payload(prompt, modell, optionen, format)
+        schluessel = None
+        if self.cache is not None and cache:
+            schluessel = cache_schluessel(payload["model"], vorlage, prompt, optionen, format)
+            antwort = self.cache.hole(schluessel)
+            if antwort is not None:
+                if bei_token:
+                    bei_token(antwort)
+                return antwort
+
+        def einmal():
+            teile = []
+            for token in self._lies_stream(self._post("/api/generate", payload, stream=True)):
+                teile.append(token)
+                if bei_token:
+                    bei_token(token)
+            return "".join(teile).strip()
+
+        # Auch mitten im Stream abgebrochene Antworten (Timeout/Verbindung) komplett neu anfordern
+        antwort = self._mit_wiederholung(einmal)
+        if schluessel and antwort:
+            self.cache.speichere(schluessel, antwort, payload["model"], vorlage)
+        return antwort
+
+    def embedde(self, texte, modell):
+        payload = {"model": modell, "input": list(texte), "keep_alive": self.keep_alive}
+        resp = self._mit_wiederholung(lambda: self._post("/api/embed", payload))
+        try:
+            return resp.json()["embeddings"]
+        except (ValueError, KeyError) as e:
+            raise LLMFehler("antwort", f"Ungültige Embedding-Antwort: {e}")
+
+    def ist_erreichbar(self):
+        try:
+            return self.session.get(f"{self.basis_url}/api/tags", timeout=self.timeout).status_code == 200
+        except requests.RequestException:
+            return False
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def hole_client():
+    """Gemeinsamer Client für den ganzen Prozess (Session/Pool wird wiederverwendet)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OllamaClient(cache=LLMCache() if LLM_CACHE_AKTIV else None)
+        return _client
@@ -0,0 +1,251 @@
+"""
+Versionierte Schema-Migrationen für gptchats (MySQL, mit CHAT_DB_BACKEND=sqlite auch die SQLite-Datei).
+Angewendete Versionen stehen in schema_version; jede Migration läuft genau einmal und ist idempotent geschrieben,
+damit auch Datenbanken, die die bisherigen stelle_*_sicher-Helfer schon nachgerüstet haben, sauber durchlaufen.
+
+Außerdem: EXPLAIN-Prüfung der heißen Abfragen (Import + Suche) – schlägt fehl, sobald eine davon
+die Tabelle komplett scannt.
+
+    python -m agent.migrationen            # ausstehende Migrationen anwenden
+    python -m agent.migrationen --status
+    python -m agent.migrationen --pruefe   # Exit-Code 1 bei Full Table Scan
+"""
+import argparse
+import re
+import sys
+from datetime import datetime
+
+from agent.db_writer import (stelle_hash_spalte_sicher, stelle_duplikat_spalte_sicher, stelle_detail_tabelle_sicher,
+                             stelle_nachbar_tabelle_sicher, stelle_cluster_tabellen_sicher)
+from agent.speicher_sqlite import ist_sqlite
+
+LLM_QUELLEN = "('llama3', 'gpt4', 'embedding')"
+
+
+def _index_spalten(cursor, tabelle):
+    """{index_name: ([spalte, ...], eindeutig)} in Index-Reihenfolge."""
+    if ist_sqlite(cursor):
+        cursor.execute(f"PRAGMA index_list({tabelle})")
+        eindeutig = {row["name"]: bool(row["unique"]) for row in cursor.fetchall()}
+        indizes = {}
+        for name in eindeutig:
+            cursor.execute(f"PRAGMA index_info({name})")
+            spalten = [row["name"] for row in sorted(cursor.fetchall(), key=lambda r: r["seqno"])]
+            indizes[name] = (spalten, eindeutig[name])
+        return indizes
+    cursor.execute(
+        # Aliase: MySQL 8 liefert die information_schema-Spalten sonst in Großbuchstaben
+        "SELECT index_name AS index_name, column_name AS column_name, non_unique AS non_unique "
+        "FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = %s ORDER BY index_name, seq_in_index",
+        (tabelle,)
+    )
+    indizes = {}
+    for row in cursor.fetchall():
+        spalten, _ = indizes.setdefault(row["index_name"], ([], not row["non_unique"]))
+        spalten.append(row["column_name"])
+    return indizes
+
+
+def stelle_index_sicher(cursor, tabelle, name, spalten, unique=False):
+    """
+    Legt den Index an, außer es gibt schon einen mit denselben führenden Spalten (auch PK/UNIQUE).
+    Mit unique=True zählt nur ein eindeutiger Index über genau diese Spalten.
+    """
+    for vorhanden, eindeutig in _index_spalten(cursor, tabelle).values():
+        if unique and eindeutig and vorhanden == spalten:
+            return False
+        if not unique and vorhanden[:len(spalten)] == spalten:
+            return False
+    print(f"🛠️ Lege Index {tabelle}.{name} ({', '.join(spalten)}) an ...")
+    art = "UNIQUE INDEX" if unique else "INDEX"
+    if ist_sqlite(cursor):
+        cursor.execute(f"CREATE {art} IF NOT EXISTS {name} ON {tabelle} ({', '.join(spalten)})")
+    else:
+        cursor.execute(f"ALTER TABLE {tabelle} ADD {art} {name} ({', '.join(spalten)})")
+    return True
+
+
+def _m1_spalten(cursor):
+    # Inhalts-Hash für den inkrementellen Import, Verweis auf den kanonischen Chat bei Duplikaten
+    stelle_hash_spalte_sicher(cursor)
+    stelle_duplikat_spalte_sicher(cursor)
+
+
+def _m2_abgeleitete_tabellen(cursor):
+    stelle_detail_tabelle_sicher(cursor)
+    stelle_nachbar_tabelle_sicher(cursor)
+    stelle_cluster_tabellen_sicher(cursor)
+
+
+def _m3_indizes(cursor):
+    # chat_id -> id bei jedem importierten Chat; eindeutig, damit ON DUPLICATE KEY greift. Ohne diesen Index
+    # legt jeder Re-Import neue Zeilen an – daher abbrechen (Version 3 bleibt offen), statt still weiterzumachen.
+    cursor.execute("SELECT chat_id, COUNT(*) AS anzahl FROM chats GROUP BY chat_id HAVING COUNT(*) > 1")
+    doppelt = cursor.fetchall()
+    if doppelt:
+        beispiele = ", ".join(f"{row['chat_id']} ({row['anzahl']}x)" for row in doppelt[:5])
+        raise RuntimeError(
+            f"{len(doppelt)} chat_ids kommen in chats mehrfach vor (z. B. {beispiele}) – eindeutiger Index auf "
+            f"chats.chat_id nicht möglich. Doppelte Zeilen bereinigen und python -m agent.migrationen erneut ausführen."
+        )
+    stelle_index_sicher(cursor, "chats", "uq_chats_chat_id", ["chat_id"], unique=True)
+    # Kategorien eines Chats je Quelle: Zählen/Löschen der LLM-Kategorien, Detailansicht, Suche
+    stelle_index_sicher(cursor, "chat_kategorien", "idx_chat_kategorien_chat_quelle", ["chat_id", "quelle"])
+    # "Welche Chats haben schon LLM-Kategorien?" beim Import-Start
+    stelle_index_sicher(cursor, "chat_kategorien", "idx_chat_kategorien_quelle_chat", ["quelle", "chat_id"])
+    stelle_index_sicher(cursor, "chat_kategorien", "idx_chat_kategorien_kategorie", ["kategorie_id"])
+    # Nachrichten eines Chats in Reihenfolge (Detailansicht, Re-Import)
+    stelle_index_sicher(cursor, "chat_messages", "idx_chat_messages_chat_position", ["chat_id", "position"])
+    # Duplikat-Auflösung: chats d JOIN chats k ON k.chat_id = d.duplikat_von
+    stelle_index_sicher(cursor, "chats", "idx_chats_duplikat_von", ["duplikat_von"])
+    stelle_index_sicher(cursor, "chat_nachbarn", "idx_chat_nachbarn_nachbar", ["nachbar_id"])
+
+
+def _m4_relevanz_skala(cursor):
+    # Alte Zuordnungen (z. B. import_chat_infos_pymysql) stehen noch auf der Skala 1-5 – einmal auf 0-100 umrechnen,
+    # danach filtern alle Abfragen nur noch mit relevanz >= 40. Neue Werte sind 0 oder >= 40, nie 1-5.
+    cursor.execute("UPDATE chat_kategorien SET relevanz = relevanz * 20 WHERE relevanz BETWEEN 1 AND 5")
+    if cursor.rowcount:
+        print(f"   {cursor.rowcount} Kategorie-Zuordnungen von 1-5 auf 0-100 umgerechnet")
+
+
+MIGRATIONEN = [
+    (1, "Spalten inhalts_hash und duplikat_von", _m1_spalten),
+    (2, "Tabellen chat_details, chat_nachbarn, themen, chat_themen", _m2_abgeleitete_tabellen),
+    (3, "Indizes für die heißen Abfragen", _m3_indizes),
+    (4, "Relevanz der Kategorie-Zuordnungen einheitlich 0-100", _m4_relevanz_skala),
+]
+
+
+def _stelle_versionstabelle_sicher(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            angewendet_am DATETIME NOT NULL
+        )
+    """)
+
+
+def angewendete_versionen(cursor):
+    _stelle_versionstabelle_sicher(cursor)
+    cursor.execute("SELECT version FROM schema_version")
+    return {row["version"] for row in cursor.fetchall()}
+
+
+def migriere(cursor, conn=None):
+    """Wendet alle ausstehenden Migrationen in Versionsreihenfolge an; liefert die Anzahl."""
+    angewendet = angewendete_versionen(cursor)
+    neu = 0
+    for version, name, funktion in sorted(MIGRATIONEN, key=lambda m: m[0]):
+        if version in angewendet:
+            continue
+        print(f"🛠️ Migration {version}: {name}")
+        funktion(cursor)
+        cursor.execute("INSERT INTO schema_version (version, name, angewendet_am) VALUES (%s, %s, %s)",
+                       (version, name, datetime.now().replace(microsecond=0)))
+        # Nach jeder Version committen – MySQL-DDL committet ohnehin implizit
+        if conn is not None:
+            conn.commit()
+        neu += 1
+    return neu
+
+
+# --- EXPLAIN-Prüfung ---------------------------------------------------------------
+
+# (Name, SQL, Parameter aus dem Beispiel-Chat) – Abfragen, die pro Chat bzw. pro Suche laufen
+HEISSE_ABFRAGEN = [
+    ("Chat-ID -> DB-ID", "SELECT id FROM chats WHERE chat_id = %s", lambda b: (b["chat_id"],)),
+    ("LLM-Kategorien zählen",
+     f"SELECT COUNT(*) AS anzahl FROM chat_kategorien WHERE chat_id = %s AND quelle IN {LLM_QUELLEN}",
+     lambda b: (b["id"],)),
+    ("LLM-Kategorien löschen",
+     f"DELETE FROM chat_kategorien WHERE chat_id = %s AND quelle IN {LLM_QUELLEN}", lambda b: (b["id"],)),
+    ("Kategorien eines Chats",
+     "SELECT k.name, ck.relevanz, ck.quelle FROM chat_kategorien ck JOIN kategorien k ON k.id = ck.kategorie_id "
+     "WHERE ck.chat_id = %s ORDER BY ck.relevanz DESC", lambda b: (b["id"],)),
+    ("LLM-kategorisierte Chats",
+     f"SELECT DISTINCT c.chat_id FROM chat_kategorien ck JOIN chats c ON c.id = ck.chat_id WHERE ck.quelle IN {LLM_QUELLEN}",
+     lambda b: ()),
+    ("Nachrichten eines Chats",
+     "SELECT rolle, text, erstellt_am FROM chat_messages WHERE chat_id = %s ORDER BY position", lambda b: (b["id"],)),
+    ("Detailansicht", "SELECT daten, etag, aktualisiert_am FROM chat_details WHERE chat_id = %s", lambda b: (b["id"],)),
+    ("Ähnliche Chats",
+     "SELECT n.nachbar_id AS id, c.titel, n.aehnlichkeit FROM chat_nachbarn n JOIN chats c ON c.id = n.nachbar_id "
+     "WHERE n.chat_id = %s ORDER BY n.rang", lambda b: (b["id"],)),
+    ("Suchtreffer laden",
+     "SELECT id, chat_id, titel, zusammenfassung FROM chats WHERE chat_id IN (%s, %s) AND duplikat_von IS NULL",
+     lambda b: (b["chat_id"], b["chat_id"])),
+]
+
+
+def _beispiel_chat(cursor):
+    # Echte Werte, sonst meldet MySQL bei eindeutigen Schlüsseln nur "no matching row in const table"
+    cursor.execute("SELECT id, chat_id FROM chats ORDER BY id LIMIT 1")
+    return cursor.fetchone() or {"id": 0, "chat_id": "-"}
+
+
+def _full_scans(cursor, sql, params):
+    """Tabellen, die der Plan komplett liest."""
+    if ist_sqlite(cursor):
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        scans = []
+        for row in cursor.fetchall():
+            # "SCAN chats" bzw. älter "SCAN TABLE chats AS c"; "SCAN ... USING (COVERING) INDEX" ist kein Tabellenscan
+            treffer = re.match(r"SCAN (?:TABLE )?(\w+)", row["detail"])
+            if treffer and "USING" not in row["detail"] and treffer.group(1) != "CONSTANT":
+                scans.append(treffer.group(1))
+        return scans
+    cursor.execute(f"EXPLAIN {sql}", params)
+    return [row["table"] for row in cursor.fetchall() if row.get("type") == "ALL"]
+
+
+def pruefe_abfragen(cursor, abfragen=HEISSE_ABFRAGEN):
+    """EXPLAIN jeder heißen Abfrage; liefert [(name, [gescannte Tabellen]), ...] der Abfragen mit Full Table Scan."""
+    beispiel = _beispiel_chat(cursor)
+    probleme = []
+    for name, sql, parameter in abfragen:
+        scans = _full_scans(cursor, sql, parameter(beispiel))
+        print(f"   {'❌' if scans else '✅'} {name}" + (f": Full Table Scan auf {', '.join(scans)}" if scans else ""))
+        if scans:
+            probleme.append((name, scans))
+    return probleme
+
+
+def main():
+    from agent.db_writer import verbinde_mit_datenbank
+
+    parser = argparse.ArgumentParser(description="Schema-Migrationen für gptchats")
+    parser.add_argument("--status", action="store_true", help="angewendete und ausstehende Versionen anzeigen")
+    parser.add_argument("--pruefe", action="store_true", help="EXPLAIN der heißen Abfragen, Exit-Code 1 bei Full Table Scan")
+    args = parser.parse_args()
+
+    conn = verbinde_mit_datenbank()
+    cursor = conn.cursor()
+    try:
+        if args.status:
+            angewendet = angewendete_versionen(cursor)
+            for version, name, _ in MIGRATIONEN:
+                print(f"   {'✅' if version in angewendet else '⏳'} {version}: {name}")
+            return 0
+        if args.pruefe:
+            print("🔍 Prüfe die Ausführungspläne der heißen Abfragen ...")
+            probleme = pruefe_abfragen(cursor)
+            conn.rollback()
+            if probleme:
+                print(f"❌ {len(probleme)} Abfragen ohne passenden Index – python -m agent.migrationen ausführen?")
+                return 1
+            print("✅ Alle heißen Abfragen nutzen einen Index.")
+            return 0
+        neu = migriere(cursor, conn)
+        conn.commit()
+        print(f"✅ Schema aktuell ({neu} Migrationen angewendet).")
+        return 0
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
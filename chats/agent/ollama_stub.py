@@ -0,0 +1,172 @@
+"""
+Minimaler Ollama-Ersatz für Tests und Trockenläufe ohne GPU/Modell.
+Spricht /api/generate (Stream + ohne Stream), /api/embed und /api/tags.
+
+    with OllamaStub(antwort=lambda prompt: "Zusammenfassung ...") as stub:
+        client = OllamaClient(basis_url=stub.url)
+
+Direkt starten (lauscht dann auf dem Ollama-Standardport):
+    python -m agent.ollama_stub
+"""
+import hashlib
+import inspect
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _standard_antwort(prompt):
+    return f"Stub-Antwort auf {len(prompt)} Zeichen."
+
+
+def _pseudo_embedding(text, dimension):
+    # deterministisch aus dem Text abgeleitet, damit gleiche Texte gleiche Vektoren bekommen
+    werte = []
+    zaehler = 0
+    while len(werte) < dimension:
+        digest = hashlib.sha256(f"{zaehler}:{text}".encode("utf-8")).digest()
+        werte.extend((b - 127.5) / 127.5 for b in digest)
+        zaehler += 1
+    return werte[:dimension]
+
+
+def _nimmt_payload(funktion):
+    """Ob der Antwort-Callback (prompt, payload) statt nur (prompt) annimmt – einmal beim Anlegen geprüft."""
+    try:
+        parameter = list(inspect.signature(funktion).parameters.values())
+    except (TypeError, ValueError):
+        return False  # ohne lesbare Signatur (z. B. eingebaute Funktionen): nur prompt
+    positionell = [p for p in parameter if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)]
+    return len(positionell) >= 2 or any(p.kind == p.VAR_POSITIONAL for p in parameter)
+
+
+class OllamaStub:
+    def __init__(self, antwort=_standard_antwort, host="127.0.0.1", port=0, verzoegerung=0.0,
+                 fehler_status=(), embedding_dimension=16):
+        """
+        antwort:        prompt -> Antworttext (oder prompt, payload -> Antworttext)
+        verzoegerung:   Sekunden Pause zwischen zwei gestreamten Tokens
+        fehler_status:  HTTP-Statuscodes, die nacheinander vor der ersten echten Antwort geliefert werden
+        """
+        self.antwort = antwort
+        self._mit_payload = _nimmt_payload(antwort)
+        self.verzoegerung = verzoegerung
+        self.fehler_status = list(fehler_status)
+        self.embedding_dimension = embedding_dimension
+        self.anfragen = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_klasse())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _naechster_fehler(self):
+        with self._lock:
+            return self.fehler_status.pop(0) if self.fehler_status else None
+
+    def _erzeuge_antwort(self, payload):
+        # Fehler im Callback nicht abfangen – ein kaputter Test soll scheitern, nicht die Standardantwort bekommen
+        if self._mit_payload:
+            return self.antwort(payload.get("prompt", ""), payload)
+        return self.antwort(payload.get("prompt", ""))
+
+    def _handler_klasse(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _sende_json(self, status, daten):
+                body = json.dumps(daten).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._sende_json(200, {"models": [{"name": "llama3:latest"}]})
+                else:
+                    self._sende_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                laenge = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(laenge) or b"{}")
+                with stub._lock:
+                    stub.anfragen.append((self.path, payload))
+
+                status = stub._naechster_fehler()
+                if status:
+                    self._sende_json(status, {"error": f"stub-fehler {status}"})
+                    return
+
+                if self.path == "/api/embed":
+                    texte = payload.get("input", [])
+                    if isinstance(texte, str):
+                        texte = [texte]
+                    self._sende_json(200, {
+                        "model": payload.get("model"),
+                        "embeddings": [_pseudo_embedding(t, stub.embedding_dimension) for t in texte],
+                    })
+                    return
+                if self.path != "/api/generate":
+                    self._sende_json(404, {"error": "not found"})
+                    return
+
+                text = stub._erzeuge_antwort(payload)
+                if not payload.get("stream", True):
+                    self._sende_json(200, {"model": payload.get("model"), "response": text, "done": True})
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                tokens = text.split(" ")
+                for i, token in enumerate(tokens):
+                    if stub.verzoegerung:
+                        time.sleep(stub.verzoegerung)
+                    teil = token if i == len(tokens) - 1 else token + " "
+                    self._sende_chunk({"model": payload.get("model"), "response": teil, "done": False})
+                self._sende_chunk({"model": payload.get("model"), "response": "", "done": True})
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _sende_chunk(self, daten):
+                zeile = (json.dumps(daten) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(zeile):X}\r\n".encode("ascii") + zeile + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    stub = OllamaStub(port=11434)
+    print(f"🧪 Ollama-Stub läuft auf {stub.url} (Strg+C beendet)")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,161 @@
+import queue
+import threading
+import time
+
+_ENDE = object()
+
+
+class StufenStatistik:
+    def __init__(self, name):
+        self.name = name
+        self.eingang = 0
+        self.ausgang = 0
+        self.fehler = 0
+        self.aktiv_sekunden = 0.0
+        self._lock = threading.Lock()
+
+    def buche(self, eingang, ausgang, dauer, fehler=0):
+        with self._lock:
+            self.eingang += eingang
+            self.ausgang += ausgang
+            self.fehler += fehler
+            self.aktiv_sekunden += dauer
+
+    def als_dict(self, laufzeit):
+        return {
+            "stufe": self.name,
+            "eingang": self.eingang,
+            "ausgang": self.ausgang,
+            "fehler": self.fehler,
+            "aktiv_sekunden": round(self.aktiv_sekunden, 2),
+            "pro_sekunde": round(self.ausgang / laufzeit, 2) if laufzeit > 0 else 0.0,
+        }
+
+
+class Stufe:
+    def __init__(self, name, funktion, worker=1, batch_groesse=1, batch_wartezeit=0.5):
+        """
+        funktion(element) -> element oder None (None = verwerfen)
+        bei batch_groesse > 1: funktion(liste) -> liste; fehlende Elemente zählen als Fehler
+        """
+        self.name = name
+        self.funktion = funktion
+        self.worker = worker
+        self.batch_groesse = batch_groesse
+        self.batch_wartezeit = batch_wartezeit
+        self.statistik = StufenStatistik(name)
+        self.eingang = None
+        self.ausgang = None
+
+
+class Pipeline:
+    """
+    Mehrstufige Verarbeitung mit begrenzten Queues zwischen den Stufen.
+    Ist eine Stufe langsamer, füllt sich ihre Eingangs-Queue und bremst die vorherige (Backpressure),
+    insgesamt läuft alles parallel – die Laufzeit nähert sich der langsamsten Stufe statt der Summe.
+    """
+
+    def __init__(self, queue_groesse=32):
+        self.queue_groesse = queue_groesse
+        self.stufen = []
+        self._start = None
+        self._ende = None
+        self.quelle_gelesen = 0
+
+    def stufe(self, name, funktion, worker=1, batch_groesse=1, batch_wartezeit=0.5):
+        self.stufen.append(Stufe(name, funktion, worker, batch_groesse, batch_wartezeit))
+        return self
+
+    def _hole_batch(self, stufe):
+        element = stufe.eingang.get()
+        if element is _ENDE:
+            return None, True
+        batch = [element]
+        if stufe.batch_groesse <= 1:
+            return batch, False
+        frist = time.monotonic() + stufe.batch_wartezeit
+        while len(batch) < stufe.batch_groesse:
+            rest = frist - time.monotonic()
+            try:
+                element = stufe.eingang.get(timeout=max(rest, 0.001)) if rest > 0 else stufe.eingang.get_nowait()
+            except queue.Empty:
+                break
+            if element is _ENDE:
+                return batch, True
+            batch.append(element)
+        return batch, False
+
+    def _worker(self, stufe):
+        while True:
+            batch, ende = self._hole_batch(stufe)
+            if batch:
+                start = time.perf_counter()
+                fehler = 0
+                try:
+                    if stufe.batch_groesse > 1:
+                        ergebnisse = stufe.funktion(batch) or []
+                        fehler = len(batch) - len(ergebnisse)
+                    else:
+                        ergebnis = stufe.funktion(batch[0])
+                        ergebnisse = [] if ergebnis is None else [ergebnis]
+                except Exception as e:
+                    print(f"❌ Stufe '{stufe.name}' fehlgeschlagen: {e}")
+                    ergebnisse = []
+                    fehler = len(batch)
+                stufe.statistik.buche(len(batch), len(ergebnisse), time.perf_counter() - start, fehler)
+                if stufe.ausgang is not None:
+                    for ergebnis in ergebnisse:
+                        stufe.ausgang.put(ergebnis)
+            if ende:
+                # Ende-Marke an die anderen Worker derselben Stufe weiterreichen
+                stufe.eingang.put(_ENDE)
+                return
+
+    def lauf(self, quelle):
+        """Verarbeitet alle Elemente aus quelle (Iterator) und liefert die Statistik je Stufe."""
+        self._start = time.monotonic()
+        queues = [queue.Queue(maxsize=self.queue_groesse) for _ in self.stufen]
+        for i, stufe in enumerate(self.stufen):
+            stufe.eingang = queues[i]
+            stufe.ausgang = queues[i + 1] if i + 1 < len(queues) else None
+
+        threads_je_stufe = []
+        for stufe in self.stufen:
+            threads = [threading.Thread(target=self._worker, args=(stufe,), name=f"{stufe.name}-{n}", daemon=True)
+                       for n in range(stufe.worker)]
+            for t in threads:
+                t.start()
+            threads_je_stufe.append(threads)
+
+        try:
+            for element in quelle:
+                self.quelle_gelesen += 1
+                queues[0].put(element)
+        finally:
+            queues[0].put(_ENDE)
+            # Stufe für Stufe herunterfahren, damit keine Elemente zwischen den Queues verloren gehen
+            for i, threads in enumerate(threads_je_stufe):
+                for t in threads:
+                    t.join()
+                if i + 1 < len(queues):
+                    queues[i + 1].put(_ENDE)
+            self._ende = time.monotonic()
+        return self.statistik()
+
+    def laufzeit(self):
+        if self._start is None:
+            return 0.0
+        return (self._ende or time.monotonic()) - self._start
+
+    def queue_tiefen(self):
+        return {stufe.name: stufe.eingang.qsize() if stufe.eingang else 0 for stufe in self.stufen}
+
+    def statistik(self):
+        laufzeit = self.laufzeit()
+        return [stufe.statistik.als_dict(laufzeit) for stufe in self.stufen]
+
+    def drucke_statistik(self):
+        print(f"📊 Pipeline-Laufzeit: {self.laufzeit():.1f}s, gelesen: {self.quelle_gelesen}")
+        for s in self.statistik():
+            print(f"   {s['stufe']:<10} rein {s['eingang']:>6}  raus {s['ausgang']:>6}  Fehler {s['fehler']:>4}  "
+                  f"aktiv {s['aktiv_sekunden']:>8.1f}s  {s['pro_sekunde']:>7.2f}/s")
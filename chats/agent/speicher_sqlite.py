@@ -0,0 +1,287 @@
+"""
+Eingebettetes SQLite-Backend (WAL) als Alternative zum MySQL-Server – für Einzelplatz, CI und Benchmarks.
+Die Verbindung verhält sich wie pymysql mit DictCursor (%s-Platzhalter, Zeilen als dict), daher laufen
+db_writer & Co. unverändert; die wenigen MySQL-Eigenheiten (Upserts, UPDATE ... JOIN) unterscheidet db_writer.
+
+FTS5-Indizes über Titel, Zusammenfassung und Nachrichten werden per Trigger mitgepflegt;
+VolltextIndex bietet damit dieselbe Suche wie BM25Index – nur direkt in der Datenbank.
+
+Aktivieren: CHAT_DB_BACKEND=sqlite (Datei: SQLITE_DB_PFAD)
+"""
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+from agent.config import SQLITE_DB_PFAD, TITEL_WEIGHT
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chats (
+    id INTEGER PRIMARY KEY,
+    chat_id VARCHAR(64) NOT NULL UNIQUE,
+    titel TEXT,
+    erstellt_am DATETIME,
+    letzte_aenderung DATETIME,
+    message_count INTEGER,
+    chat_link TEXT,
+    status TEXT,
+    zusammenfassung TEXT,
+    inhalts_hash CHAR(64),
+    duplikat_von VARCHAR(64)
+);
+CREATE TABLE IF NOT EXISTS chat_messages (
+    id INTEGER PRIMARY KEY,
+    chat_id INTEGER NOT NULL,
+    rolle TEXT,
+    text TEXT,
+    erstellt_am DATETIME,
+    position INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_chat ON chat_messages (chat_id, position);
+CREATE TABLE IF NOT EXISTS kategorien (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE COLLATE NOCASE
+);
+CREATE TABLE IF NOT EXISTS chat_kategorien (
+    chat_id INTEGER NOT NULL,
+    kategorie_id INTEGER NOT NULL,
+    relevanz INTEGER,
+    quelle TEXT,
+    PRIMARY KEY (chat_id, kategorie_id)
+);
+CREATE INDEX IF NOT EXISTS idx_chat_kategorien_kategorie ON chat_kategorien (kategorie_id);
+CREATE TABLE IF NOT EXISTS chat_details (
+    chat_id INTEGER PRIMARY KEY,
+    daten TEXT NOT NULL,
+    etag CHAR(64) NOT NULL,
+    aktualisiert_am DATETIME NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chat_nachbarn (
+    chat_id INTEGER NOT NULL,
+    rang INTEGER NOT NULL,
+    nachbar_id INTEGER NOT NULL,
+    aehnlichkeit REAL NOT NULL,
+    aktualisiert_am DATETIME NOT NULL,
+    PRIMARY KEY (chat_id, rang)
+);
+CREATE TABLE IF NOT EXISTS themen (
+    id INTEGER PRIMARY KEY,
+    schluesselwoerter TEXT NOT NULL,
+    groesse INTEGER NOT NULL,
+    top_kategorie TEXT,
+    abdeckung REAL NOT NULL,
+    vorschlag INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS chat_themen (
+    chat_id INTEGER PRIMARY KEY,
+    thema_id INTEGER NOT NULL,
+    aehnlichkeit REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chat_themen_thema ON chat_themen (thema_id);
+
+-- Volltext: External-Content-Tabellen, der Text liegt nur einmal in chats/chat_messages
+CREATE VIRTUAL TABLE IF NOT EXISTS chats_fts USING fts5(
+    titel, zusammenfassung, content='chats', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS nachrichten_fts USING fts5(
+    text, content='chat_messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS chats_fts_neu AFTER INSERT ON chats BEGIN
+    INSERT INTO chats_fts (rowid, titel, zusammenfassung) VALUES (new.id, new.titel, new.zusammenfassung);
+END;
+CREATE TRIGGER IF NOT EXISTS chats_fts_weg AFTER DELETE ON chats BEGIN
+    INSERT INTO chats_fts (chats_fts, rowid, titel, zusammenfassung) VALUES ('delete', old.id, old.titel, old.zusammenfassung);
+END;
+CREATE TRIGGER IF NOT EXISTS chats_fts_geaendert AFTER UPDATE OF titel, zusammenfassung ON chats BEGIN
+    INSERT INTO chats_fts (chats_fts, rowid, titel, zusammenfassung) VALUES ('delete', old.id, old.titel, old.zusammenfassung);
+    INSERT INTO chats_fts (rowid, titel, zusammenfassung) VALUES (new.id, new.titel, new.zusammenfassung);
+END;
+CREATE TRIGGER IF NOT EXISTS nachrichten_fts_neu AFTER INSERT ON chat_messages BEGIN
+    INSERT INTO nachrichten_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS nachrichten_fts_weg AFTER DELETE ON chat_messages BEGIN
+    INSERT INTO nachrichten_fts (nachrichten_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS nachrichten_fts_geaendert AFTER UPDATE OF text ON chat_messages BEGIN
+    INSERT INTO nachrichten_fts (nachrichten_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    INSERT INTO nachrichten_fts (rowid, text) VALUES (new.id, new.text);
+END;
+"""
+
+
+def _lies_datum(wert):
+    text = wert.decode("utf-8")
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+
+_schema_angelegt = set()
+_schema_lock = threading.Lock()
+
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(" "))
+sqlite3.register_converter("DATETIME", _lies_datum)
+
+
+def _platzhalter(sql):
+    # pymysql-Stil -> sqlite3 (wie pymysql wird %% nur mit Parametern zu %)
+    return sql.replace("%%", "\0").replace("%s", "?").replace("\0", "%")
+
+
+class SQLiteCursor:
+    """Die Teile der pymysql-DictCursor-Schnittstelle, die der Code nutzt."""
+    dialekt = "sqlite"
+
+    def __init__(self, conn):
+        self._cursor = conn.cursor()
+
+    def execute(self, sql, params=None):
+        if params is None:
+            self._cursor.execute(sql)
+        else:
+            self._cursor.execute(_platzhalter(sql), tuple(params))
+        return self._cursor.rowcount
+
+    def executemany(self, sql, zeilen):
+        self._cursor.executemany(_platzhalter(sql), [tuple(z) for z in zeilen])
+        return self._cursor.rowcount
+
+    def fetchone(self):
+        zeile = self._cursor.fetchone()
+        return dict(zeile) if zeile is not None else None
+
+    def fetchall(self):
+        return [dict(zeile) for zeile in self._cursor.fetchall()]
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class SQLiteVerbindung:
+    dialekt = "sqlite"
+
+    def __init__(self, pfad=SQLITE_DB_PFAD):
+        if pfad != ":memory:":
+            os.makedirs(os.path.dirname(pfad) or ".", exist_ok=True)
+        # Die Import-Pipeline schreibt aus dem DB-Thread, angelegt wird die Verbindung im Haupt-Thread
+        self.conn = sqlite3.connect(pfad, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        # WAL: Web-App liest, während der Import schreibt
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        # Schema nur einmal pro Prozess und Datei prüfen – die Web-App öffnet pro Anfrage eine Verbindung
+        with _schema_lock:
+            if pfad == ":memory:" or pfad not in _schema_angelegt:
+                self.conn.executescript(SCHEMA)
+                _schema_angelegt.add(pfad)
+
+    def cursor(self, *args):
+        # pymysql erlaubt cursor(DictCursor) – hier sind Zeilen ohnehin dicts
+        return SQLiteCursor(self.conn)
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def ping(self, reconnect=True):
+        pass  # eingebettet – keine Verbindung, die abreißen könnte
+
+    def close(self):
+        self.conn.close()
+
+    # wie pymysql: "with verbindung:" schließt die Verbindung am Ende
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def verbinde_sqlite(pfad=SQLITE_DB_PFAD):
+    return SQLiteVerbindung(pfad)
+
+
+def ist_sqlite(cursor):
+    return getattr(cursor, "dialekt", "mysql") == "sqlite"
+
+
+def fts_query(text):
+    # Freitext -> FTS5-Ausdruck: jedes Wort als Phrase, ODER-verknüpft (Ranking wie BM25Index)
+    woerter = re.findall(r"\w+", (text or "").lower())
+    return " OR ".join(f'"{w}"' for w in dict.fromkeys(woerter))
+
+
+class VolltextIndex:
+    """
+    Keyword-Suche über FTS5 mit der Schnittstelle von BM25Index (suche/aktualisiere/entferne/speichere).
+    Die Indizes pflegen die Trigger – aktualisiere/entferne/speichere sind daher leer.
+    """
+
+    def __init__(self, pfad=SQLITE_DB_PFAD, titel_gewicht=TITEL_WEIGHT, verbindung=None):
+        # eigene Verbindung: Leser stören den schreibenden Import dank WAL nicht
+        self._eigene_verbindung = verbindung is None
+        self.verbindung = verbindung or SQLiteVerbindung(pfad)
+        self.titel_gewicht = titel_gewicht
+        self._lock = threading.Lock()
+
+    def aktualisiere(self, chat_id, titel=None, zusammenfassung=None, text=None):
+        pass
+
+    def entferne(self, chat_id):
+        pass
+
+    def speichere(self):
+        pass
+
+    def __len__(self):
+        with self._lock:
+            return self.verbindung.conn.execute("SELECT COUNT(*) FROM chats_fts").fetchone()[0]
+
+    def suche(self, query, k=20):
+        """[(chat_id, score), ...] absteigend; Score = Titel/Zusammenfassung + bester Nachrichtentreffer (bm25 von FTS5)."""
+        ausdruck = fts_query(query)
+        if not ausdruck:
+            return []
+        # bm25() darf nicht in Aggregaten stehen – je Tabelle eine Abfrage, zusammengeführt wird hier
+        scores = {}
+        with self._lock:
+            conn = self.verbindung.conn
+            for zeile in conn.execute(
+                    "SELECT c.chat_id, -bm25(chats_fts, ?, 1.0) AS score FROM chats_fts "
+                    "JOIN chats c ON c.id = chats_fts.rowid WHERE chats_fts MATCH ? AND c.duplikat_von IS NULL",
+                    (self.titel_gewicht, ausdruck)):
+                scores[zeile["chat_id"]] = zeile["score"]
+            beste_nachricht = {}
+            for zeile in conn.execute(
+                    "SELECT c.chat_id, -bm25(nachrichten_fts) AS score FROM nachrichten_fts "
+                    "JOIN chat_messages m ON m.id = nachrichten_fts.rowid JOIN chats c ON c.id = m.chat_id "
+                    "WHERE nachrichten_fts MATCH ? AND c.duplikat_von IS NULL",
+                    (ausdruck,)):
+                beste_nachricht[zeile["chat_id"]] = max(beste_nachricht.get(zeile["chat_id"], 0.0), zeile["score"])
+        for chat_id, score in beste_nachricht.items():
+            scores[chat_id] = scores.get(chat_id, 0.0) + score
+        # bm25() ist negativ (kleiner = besser) – umgedreht, damit wie bei BM25Index höher besser ist
+        return sorted(((chat_id, float(score)) for chat_id, score in scores.items()), key=lambda x: -x[1])[:k]
+
+    def close(self):
+        if self._eigene_verbindung:
+            self.verbindung.close()
@@ -0,0 +1,130 @@
+"""
+Aho-Corasick-Automat für Stichwörter und Kategorienamen.
+Alle Muster werden einmal kompiliert; ein Text wird in einem Durchlauf nach allen Mustern durchsucht,
+die Kosten pro Text hängen also nicht mehr von der Anzahl der Regeln ab.
+"""
+import threading
+from collections import deque, namedtuple
+
+Treffer = namedtuple("Treffer", "start ende muster wert")
+
+
+def _ist_wortzeichen(zeichen):
+    return zeichen.isalnum() or zeichen == "_"
+
+
+def _klein(text):
+    # str.lower() kann die Länge ändern (z. B. "İ") – dann zeichenweise, damit die Positionen stimmen
+    klein = text.lower()
+    if len(klein) == len(text):
+        return klein
+    return "".join(z.lower() if len(z.lower()) == 1 else z for z in text)
+
+
+class StichwortMatcher:
+    """
+    Groß-/Kleinschreibung wird ignoriert. Mit wortgrenzen=True zählt ein Treffer nur,
+    wenn davor und danach kein Buchstabe/Ziffer steht (wie \\b...\\b im Regex).
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._eigene = [[]]    # Muster, die genau in diesem Knoten enden
+        self._fail = [0]
+        self._ausgaben = [[]]  # eigene + die der Fehler-Kette; baut _kompiliere jedes Mal neu auf
+        self._muster = []      # (muster, wert, wortgrenzen)
+        self._kompiliert = True
+        self._lock = threading.Lock()
+
+    def fuege_hinzu(self, muster, wert=None, wortgrenzen=True):
+        muster = _klein(str(muster).strip())
+        if not muster:
+            return self
+        knoten = 0
+        for zeichen in muster:
+            naechster = self._goto[knoten].get(zeichen)
+            if naechster is None:
+                naechster = len(self._goto)
+                self._goto[knoten][zeichen] = naechster
+                self._goto.append({})
+                self._eigene.append([])
+            knoten = naechster
+        self._eigene[knoten].append(len(self._muster))
+        self._muster.append((muster, muster if wert is None else wert, wortgrenzen))
+        self._kompiliert = False
+        return self
+
+    @classmethod
+    def aus_mapping(cls, mapping, wortgrenzen=True):
+        """{muster: wert}, z. B. Stichwort -> Kategorie aus chat_infos.xlsx."""
+        matcher = cls()
+        for muster, wert in mapping.items():
+            matcher.fuege_hinzu(muster, wert, wortgrenzen)
+        return matcher.kompiliere()
+
+    def kompiliere(self):
+        """Fehler-Links und Ausgaben (neu) berechnen; finde() macht das bei Bedarf selbst."""
+        with self._lock:
+            if not self._kompiliert:
+                self._kompiliere()
+        return self
+
+    def _kompiliere(self):
+        # Fehler-Links per Breitensuche – jeder Knoten erbt die Ausgaben seines (flacheren) Fehler-Knotens.
+        # Immer von den eigenen Ausgaben aus neu aufbauen, sonst verdoppelt jedes erneute Kompilieren die Treffer
+        fail = [0] * len(self._goto)
+        ausgaben = [list(eigene) for eigene in self._eigene]
+        warteschlange = deque(self._goto[0].values())
+        while warteschlange:
+            knoten = warteschlange.popleft()
+            for zeichen, kind in self._goto[knoten].items():
+                warteschlange.append(kind)
+                f = fail[knoten]
+                while f and zeichen not in self._goto[f]:
+                    f = fail[f]
+                ziel = self._goto[f].get(zeichen, 0)
+                fail[kind] = ziel if ziel != kind else 0
+                ausgaben[kind] = self._eigene[kind] + ausgaben[fail[kind]]
+        # erst fertig berechnet austauschen: parallele finde()-Aufrufe sehen nie einen halben Automaten
+        self._fail, self._ausgaben = fail, ausgaben
+        self._kompiliert = True
+
+    def finde(self, text):
+        """Alle (auch überlappenden) Treffer in einem Durchlauf."""
+        if not self._kompiliert:
+            self.kompiliere()
+        if not text or not self._muster:
+            return []
+        klein = _klein(text)
+        goto, fail, ausgaben = self._goto, self._fail, self._ausgaben
+        treffer = []
+        knoten = 0
+        for pos, zeichen in enumerate(klein):
+            while knoten and zeichen not in goto[knoten]:
+                knoten = fail[knoten]
+            knoten = goto[knoten].get(zeichen, 0)
+            for index in ausgaben[knoten]:
+                muster, wert, wortgrenzen = self._muster[index]
+                start = pos - len(muster) + 1
+                if wortgrenzen and (
+                    (start > 0 and _ist_wortzeichen(klein[start - 1]))
+                    or (pos + 1 < len(klein) and _ist_wortzeichen(klein[pos + 1]))
+                ):
+                    continue
+                treffer.append(Treffer(start, pos + 1, muster, wert))
+        return treffer
+
+    def werte(self, text):
+        """Menge der Werte (z. B. Kategorien) aller Treffer."""
+        return {t.wert for t in self.finde(text)}
+
+    def __len__(self):
+        return len(self._muster)
+
+
+def kategorie_matcher(kategorien, wortgrenzen=True):
+    """
+    Alle Kategorienamen in einem Automaten, fertig kompiliert (die Web-App teilt ihn zwischen Threads).
+    kategorien: {name: id}; Wert eines Treffers ist die Kategorie-ID. Genutzt für den Kategorie-Bonus der Web-Suche.
+    """
+    return StichwortMatcher.aus_mapping(kategorien, wortgrenzen)
@@ -0,0 +1,269 @@
+"""
+Offline-Evaluation der Chat-Suche: Recall@k, nDCG@k, Latenz (p50/p95) und Speicher je Retrieval-Konfiguration.
+
+Synthetischer Korpus (läuft ohne DB/Modell, mit --ohne-embeddings auch ohne Embedding-Modell):
+    python -m agent.such_evaluation --synthetisch 2000 --ohne-embeddings
+
+Export + gelabelte Queries (JSONL: {"query": "...", "relevant": {"<chat_id>": 2, "<chat_id>": 1}}):
+    python -m agent.such_evaluation --quelle conversations.json --queries queries.jsonl --json ergebnis.json
+
+Ohne --queries werden die Chat-Titel als Queries genutzt (Ziel: der eigene Chat, Titel nicht im Index).
+"""
+import argparse
+import json
+import math
+import random
+import statistics
+import time
+import tracemalloc
+
+from agent.bm25_index import BM25Index
+from agent.hybrid_suche import suche_hybrid
+
+# Gewichte wie in chat_agent_web/search_logic.py bzw. search_test_03.py (Kategorien bleiben offline außen vor)
+WEB_GEWICHTE = {"embedding": 0.7, "keyword": 0.1, "threshold": 0.36}
+TEST03_GEWICHTE = {"embedding": 0.6, "keyword": 0.4, "keyword_max": 0.3, "threshold": 0.36}
+
+
+# --- Korpus ---------------------------------------------------------------------
+
+def _pseudowort(rng, silben=("ka", "lo", "mi", "ter", "sch", "an", "ro", "ber", "tu", "ne", "gra", "vi", "du", "pe")):
+    return "".join(rng.choice(silben) for _ in range(rng.randint(2, 4)))
+
+
+def erzeuge_synthetischen_korpus(anzahl_chats, anzahl_themen=40, seed=42):
+    """
+    Chats zu Themen mit eigenem Vokabular plus seltene "Signaturwörter" je Chat.
+    Query je Chat: ein Themenwort + zwei seltene Wörter; Relevanz 2 = der Chat selbst, 1 = gleiches Thema.
+    """
+    rng = random.Random(seed)
+    allgemein = [_pseudowort(rng) for _ in range(300)]
+    themen = [[_pseudowort(rng) for _ in range(40)] for _ in range(anzahl_themen)]
+    selten = list({_pseudowort(rng) + str(i) for i in range(anzahl_chats * 6)})
+
+    korpus, queries, thema_von = [], [], {}
+    for i in range(anzahl_chats):
+        chat_id = f"syn-{i:05d}"
+        thema = rng.randrange(anzahl_themen)
+        thema_von[chat_id] = thema
+        signatur = rng.sample(selten, 4)
+        woerter = [rng.choice(themen[thema]) if rng.random() < 0.5 else rng.choice(allgemein)
+                   for _ in range(rng.randint(60, 400))]
+        for w in signatur:
+            woerter.insert(rng.randrange(len(woerter)), w)
+        titel = " ".join(rng.sample(themen[thema], 3))
+        zusammenfassung = " ".join(rng.sample(themen[thema], 5) + signatur[:1])
+        korpus.append({"chat_id": chat_id, "titel": titel, "zusammenfassung": zusammenfassung, "text": " ".join(woerter)})
+        queries.append({"query": " ".join([rng.choice(themen[thema])] + signatur[1:3]), "ziel": chat_id, "thema": thema})
+
+    themen_chats = {}
+    for chat_id, thema in thema_von.items():
+        themen_chats.setdefault(thema, []).append(chat_id)
+    gelabelt = []
+    for q in queries[: min(len(queries), 300)]:
+        relevant = {cid: 1 for cid in themen_chats[q["thema"]][:20]}
+        relevant[q["ziel"]] = 2
+        gelabelt.append({"query": q["query"], "relevant": relevant})
+    return korpus, gelabelt
+
+
+def lade_export_korpus(pfad, queries_pfad=None, limit=None):
+    from agent.chat_loader import lade_json_stream
+    from agent.konversation import linearisiere_chat
+    from agent.zusammenfassen import get_chat_text
+
+    korpus, titel_queries = [], []
+    for chat in lade_json_stream(pfad):
+        titel = (chat.get("title") or "").strip()
+        text = get_chat_text(linearisiere_chat(chat), max_zeichen=None)
+        # Ohne gelabelte Queries dient der Titel als Query -> dann nicht mitindexieren
+        korpus.append({"chat_id": chat.get("id"), "titel": titel if queries_pfad else "", "zusammenfassung": "", "text": text})
+        if titel:
+            titel_queries.append({"query": titel, "relevant": {chat.get("id"): 2}})
+        if limit and len(korpus) >= limit:
+            break
+    if queries_pfad:
+        with open(queries_pfad, "r", encoding="utf-8") as f:
+            queries = [json.loads(z) for z in f if z.strip()]
+    else:
+        queries = titel_queries[:500]
+    return korpus, queries
+
+
+# --- In-Memory-Vektorindex (gleiche Schnittstelle wie Chroma für suche_hybrid) ----------
+
+class _Doc:
+    def __init__(self, chat_id, titel):
+        self.metadata = {"chat_id": chat_id, "title": titel}
+
+
+class SpeicherVektorIndex:
+    def __init__(self, service, korpus, batch_groesse=64):
+        import numpy as np
+
+        self.np = np
+        self.service = service
+        self.docs = [_Doc(c["chat_id"], c["titel"]) for c in korpus]
+        texte = [f"passage: Titel: {c['titel']}\nZusammenfassung: {c['zusammenfassung']}\nInhalt: {c['text'][:2000]}"
+                 for c in korpus]
+        vektoren = []
+        for start in range(0, len(texte), batch_groesse):
+            vektoren.extend(service.embed_documents(texte[start:start + batch_groesse]))
+        self.matrix = np.asarray(vektoren, dtype=np.float32)
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4):
+        np = self.np
+        scores = self.matrix @ np.asarray(embedding, dtype=np.float32)
+        k = min(k, len(scores))
+        idx = np.argpartition(-scores, k - 1)[:k]
+        idx = idx[np.argsort(-scores[idx])]
+        # wie Chroma: quadrierte L2-Distanz normalisierter Vektoren
+        return [(self.docs[i], float(2 - 2 * scores[i])) for i in idx]
+
+    def similarity_search_with_score(self, query, k=4):
+        return self.similarity_search_by_vector_with_relevance_scores(self.service.embed_query(query), k)
+
+
+# --- Konfigurationen ---------------------------------------------------------------
+
+def _linear(treffer, gewichte):
+    bewertet = []
+    for t in treffer:
+        keyword = t["keyword_relevanz"] * gewichte.get("keyword_max", 1.0)
+        score = gewichte["embedding"] * t["embedding_relevanz"] + gewichte["keyword"] * keyword
+        if score >= gewichte["threshold"]:
+            bewertet.append((score, t["chat_id"]))
+    return [cid for _, cid in sorted(bewertet, reverse=True)]
+
+
+def baue_konfigurationen(bm25, vektorindex, k):
+    konfigurationen = {"bm25": lambda q: [cid for cid, _ in bm25.suche(q, k)]}
+    if vektorindex is not None:
+        konfigurationen.update({
+            "vektor": lambda q: [t["chat_id"] for t in suche_hybrid(q, vektorindex, None, k=k)],
+            "hybrid-rrf": lambda q: [t["chat_id"] for t in suche_hybrid(q, vektorindex, bm25, k=k)],
+            "linear-web": lambda q: _linear(suche_hybrid(q, vektorindex, bm25, k=k), WEB_GEWICHTE),
+            "linear-test03": lambda q: _linear(suche_hybrid(q, vektorindex, bm25, k=k), TEST03_GEWICHTE),
+        })
+    return konfigurationen
+
+
+# --- Metriken ----------------------------------------------------------------------
+
+def recall_at_k(rangliste, relevant, k):
+    ziele = {cid for cid, grad in relevant.items() if grad >= max(relevant.values())}
+    return len(ziele & set(rangliste[:k])) / len(ziele) if ziele else 0.0
+
+
+def ndcg_at_k(rangliste, relevant, k):
+    dcg = sum((2 ** relevant.get(cid, 0) - 1) / math.log2(i + 2) for i, cid in enumerate(rangliste[:k]))
+    ideal = sorted(relevant.values(), reverse=True)[:k]
+    idcg = sum((2 ** g - 1) / math.log2(i + 2) for i, g in enumerate(ideal))
+    return dcg / idcg if idcg else 0.0
+
+
+def perzentil(werte, p):
+    werte = sorted(werte)
+    if not werte:
+        return 0.0
+    pos = (len(werte) - 1) * p
+    unten, oben = math.floor(pos), math.ceil(pos)
+    return werte[unten] + (werte[oben] - werte[unten]) * (pos - unten)
+
+
+def speicher_spitze(funktion):
+    """Spitze der Python-Allokationen während funktion() in Bytes – tracemalloc bremst, also nie beim Zeitmessen."""
+    tracemalloc.start()
+    try:
+        funktion()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def evaluiere(name, suchfunktion, queries, k):
+    recalls, ndcgs, latenzen = [], [], []
+    for q in queries:
+        start = time.perf_counter()
+        rangliste = suchfunktion(q["query"])
+        latenzen.append((time.perf_counter() - start) * 1000)
+        recalls.append(recall_at_k(rangliste, q["relevant"], k))
+        ndcgs.append(ndcg_at_k(rangliste, q["relevant"], k))
+    # Speicher in einem eigenen Durchlauf, damit die Latenzen ohne Tracing-Overhead gemessen sind
+    spitze = speicher_spitze(lambda: [suchfunktion(q["query"]) for q in queries])
+    return {
+        "konfiguration": name,
+        "recall_at_k": statistics.fmean(recalls),
+        "ndcg_at_k": statistics.fmean(ndcgs),
+        "p50_ms": perzentil(latenzen, 0.5),
+        "p95_ms": perzentil(latenzen, 0.95),
+        "speicher_spitze_mb": spitze / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluation + Latenz-Benchmark der Chat-Suche")
+    parser.add_argument("--synthetisch", type=int, metavar="N", help="synthetischen Korpus mit N Chats erzeugen")
+    parser.add_argument("--quelle", help="conversations.json")
+    parser.add_argument("--queries", help="gelabelte Queries (JSONL)")
+    parser.add_argument("--limit", type=int, help="max. Chats aus der Quelle")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--modell", default=None, help="Embedding-Modell (Standard: EMBEDDING_MODELL)")
+    parser.add_argument("--ohne-embeddings", action="store_true", help="nur BM25 (kein Modell nötig)")
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON speichern")
+    args = parser.parse_args()
+
+    if args.synthetisch:
+        korpus, queries = erzeuge_synthetischen_korpus(args.synthetisch)
+    elif args.quelle:
+        korpus, queries = lade_export_korpus(args.quelle, args.queries, args.limit)
+    else:
+        parser.error("--synthetisch oder --quelle angeben")
+    print(f"📚 {len(korpus)} Chats, {len(queries)} Queries, k={args.k}")
+
+    def baue_bm25():
+        index = BM25Index(pfad=None)
+        for c in korpus:
+            index.aktualisiere(c["chat_id"], c["titel"], c["zusammenfassung"], c["text"])
+        return index
+
+    start = time.perf_counter()
+    bm25 = baue_bm25()
+    bm25_zeit = time.perf_counter() - start
+    # Größe getrennt messen: ein zweiter Aufbau unter tracemalloc, der gehaltene Index bleibt ungebremst gebaut
+    tracemalloc.start()
+    try:
+        zweiter = baue_bm25()
+        bm25_speicher = tracemalloc.get_traced_memory()[0] / 1e6
+    finally:
+        tracemalloc.stop()
+    del zweiter
+    print(f"🗂️ BM25-Index: {bm25_zeit:.2f}s, ~{bm25_speicher:.1f} MB")
+
+    vektorindex = None
+    if not args.ohne_embeddings:
+        from agent.embedding_service import erzeuge_embedding_service
+        from agent.config import EMBEDDING_MODELL
+
+        service = erzeuge_embedding_service(args.modell or EMBEDDING_MODELL)
+        start = time.perf_counter()
+        vektorindex = SpeicherVektorIndex(service, korpus)
+        print(f"🧮 Vektorindex ({service.name}): {time.perf_counter() - start:.1f}s, "
+              f"{vektorindex.matrix.nbytes / 1e6:.1f} MB")
+
+    ergebnisse = [evaluiere(name, funktion, queries, args.k)
+                  for name, funktion in baue_konfigurationen(bm25, vektorindex, args.k).items()]
+
+    print(f"\n{'Konfiguration':<16}{'Recall@k':>10}{'nDCG@k':>9}{'p50 ms':>9}{'p95 ms':>9}{'Spitze MB':>11}")
+    for e in ergebnisse:
+        print(f"{e['konfiguration']:<16}{e['recall_at_k']:>10.3f}{e['ndcg_at_k']:>9.3f}"
+              f"{e['p50_ms']:>9.2f}{e['p95_ms']:>9.2f}{e['speicher_spitze_mb']:>11.2f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"k": args.k, "chats": len(korpus), "queries": len(queries), "ergebnisse": ergebnisse}, f, indent=2)
+        print(f"💾 Ergebnisse in {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,91 +1,410 @@
-from agent.chat_loader import lade_json, lade_excel_chat_infos
-from agent.vectorstore import init_chroma, speichere_embedding
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
-from agent.kategorisieren import generiere_kategorievorschlag, extrahiere_kategorien_und_relevanz, hole_kategorien, braucht_llm_kategorisierung
-from agent.zusammenfassen import generiere_zusammenfassung, get_chat_text
-from agent.db_writer import verbinde_mit_datenbank, insert_kategorien, insert_update_chats, speichere_chat_nachrichten
+from dataclasses import dataclass, field
+from agent.chat_loader import lade_json_stream, lade_excel_chat_infos
+from agent.vectorstore import init_chroma, EmbeddingSchreiber, dokument_text, entferne_chat_dokumente
+from agent.kategorisieren import generiere_zusammenfassung_und_kategorien, generiere_kategorien, werte_llm_antwort_aus, hole_kategorien, hole_llm_kategorisierte_chats
+from agent.zusammenfassen import generiere_zusammenfassung, get_chat_text, fasse_chat_zusammen, ist_langer_chat, extrahiere_zusammenfassung, ZUSAMMENFASSUNG_FEHLGESCHLAGEN
+from agent.konversation import linearisiere_chat, berechne_inhalts_hash, NachrichtenCache
+from agent.db_writer import verbinde_mit_datenbank, insert_kategorien, insert_update_chats, speichere_chat_nachrichten, markiere_import_stand, hole_inhalts_hashes, speichere_chat_detail, baue_fehlende_chat_details, uebernehme_duplikat_ergebnisse, verwerfe_hashes_offener_duplikate
+from agent.pipeline import Pipeline
+from agent.migrationen import migriere
+from agent.stichwort_matcher import StichwortMatcher
+from agent.kategorie_klassifikator import erstelle_klassifikator
+from agent.llm_client import hole_client
+from agent.aehnliche_chats import aktualisiere_nachbarn
+from agent.themen_cluster import ordne_neue_chats_zu
+from agent.duplikate import DuplikatIndex, baue_aus_datenbank as baue_duplikat_index
+from agent.bm25_index import BM25Index, baue_aus_datenbank
+from agent.speicher_sqlite import VolltextIndex
 from datetime import datetime
 from agent.nutzerfreigabe import frage_benutzer
+from agent.config import COMMIT_ALLE_N_CHATS, LLM_PARALLEL, EMBED_BATCH_GROESSE, PIPELINE_QUEUE_GROESSE, KLASSIFIKATOR_AKTIV, DB_BACKEND
 
 CHROMA_PATH = r"D:\Users\doman\Documents\OneDrive\Dokumente\Programmierung\Projekte\AiAgents\chats"
-SKIP_UNVERÄNDERTE_CHATS = False
+SKIP_UNVERÄNDERTE_CHATS = True
 
 vectordb = None
 
+
+@dataclass
+class ChatArbeit:
+    """Alles, was ein Chat auf dem Weg durch die Import-Pipeline mitnimmt."""
+    chat_id: str
+    titel: str
+    erstellt_am: datetime
+    letzte_aenderung: datetime
+    chat_link: str
+    nachrichten: list
+    inhalts_hash: str
+    inhalt: str
+    llm_noetig: bool
+    kategorien_manuell: dict = field(default_factory=dict)
+    kategorien_llm: dict = field(default_factory=dict)
+    zusammenfassung: str = "[Noch keine LLM-Zusammenfassung]"
+    kategorien_quelle: str = "llama3"
+    duplikat_von: str = None
+    # Ollama nicht erreichbar/kaputte Antwort: ohne Hash speichern, damit der nächste Lauf den Chat erneut versucht
+    llm_fehlgeschlagen: bool = False
+
+
+def bereite_chat_vor(chat, stichwort_matcher, bekannte_hashes, llm_kategorisiert, nachrichten_cache):
+    """Stufe 1 (parse): linearisieren, Hash prüfen, manuelle Stichwörter – ohne DB-Zugriff."""
+    chat_id = chat.get("id")
+    titel = chat.get("title", "")[:255].strip()
+    nachrichten = linearisiere_chat(chat, nachrichten_cache)
+
+    inhalts_hash = berechne_inhalts_hash(nachrichten, chat.get("update_time"))
+    alter_hash = bekannte_hashes.get(chat_id)
+    if SKIP_UNVERÄNDERTE_CHATS and alter_hash == inhalts_hash:
+        return None
+
+    kategorien_manuell = {}
+    for manuelle_kategorie in stichwort_matcher.werte(titel):
+        kategorien_manuell[manuelle_kategorie] = 100
+        print(f"🔎 Manuelle Kategorie erkannt: {manuelle_kategorie}")
+
+    # Geänderter Chat (Hash bekannt, aber anders) -> neu kategorisieren; sonst nur, wenn noch keine LLM-Kategorien da sind
+    llm_noetig = (alter_hash is not None and alter_hash != inhalts_hash) or chat_id not in llm_kategorisiert
+
+    return ChatArbeit(
+        chat_id=chat_id,
+        titel=titel,
+        erstellt_am=datetime.fromtimestamp(chat.get("create_time", 0)),
+        letzte_aenderung=datetime.fromtimestamp(chat.get("update_time", 0)),
+        chat_link=f"https://chat.openai.com/c/{chat_id}",
+        nachrichten=nachrichten,
+        inhalts_hash=inhalts_hash,
+        inhalt=f"{titel}\n\n{get_chat_text(nachrichten)}",
+        llm_noetig=llm_noetig,
+        kategorien_manuell=kategorien_manuell,
+    )
+
+
+def dedup_schritt(arbeit, duplikate):
+    """Stufe 2 (dedup): fast identische Chats übernehmen später die Ergebnisse ihres kanonischen Chats."""
+    kanonisch = duplikate.finde_oder_registriere(arbeit.chat_id, get_chat_text(arbeit.nachrichten, max_zeichen=None))
+    if kanonisch:
+        arbeit.duplikat_von = kanonisch
+        arbeit.llm_noetig = False
+        print(f"♊ '{arbeit.titel[:60]}' ist ein Duplikat von {kanonisch} – kein LLM/Embedding")
+    return arbeit
+
+
+def _llm_fehlgeschlagen(arbeit):
+    arbeit.llm_fehlgeschlagen = True
+    arbeit.kategorien_llm = {}
+    print(f"⚠️ LLM für '{arbeit.titel[:60]}' fehlgeschlagen – wird beim nächsten Import erneut versucht.")
+    return arbeit
+
+
+def llm_schritt(arbeit, db_kategorien, klassifikator=None):
+    """Stufe 3 (LLM): läuft mit LLM_PARALLEL Threads gegen Ollama."""
+    if arbeit.duplikat_von:
+        return arbeit
+    if not arbeit.llm_noetig:
+        print(f"⏭️ Chat '{arbeit.titel}' wurde bereits LLM-kategorisiert – LLM-Skip.")
+        return arbeit
+
+    # Erst der Embedding-Klassifikator (mit einer Zusammenfassung aus dem Chat selbst); ist er sicher genug,
+    # entfällt der Kategorien-Prompt – die Zusammenfassung kommt aber weiterhin vom LLM
+    if klassifikator:
+        auszug = extrahiere_zusammenfassung(arbeit.nachrichten)
+        vorschlag = klassifikator.schlage_vor(dokument_text(arbeit.titel, auszug, arbeit.inhalt))
+    else:
+        vorschlag = None
+    if vorschlag is not None:
+        for kat, rel in vorschlag.items():
+            if kat in db_kategorien and kat not in arbeit.kategorien_manuell:
+                arbeit.kategorien_llm[kat] = rel
+        arbeit.kategorien_quelle = "embedding"
+        # Nur-Zusammenfassungs-Aufruf (bei unverändertem Chat aus dem LLM-Cache); lange Chats per Map-Reduce
+        arbeit.zusammenfassung = fasse_chat_zusammen(arbeit.nachrichten)
+        if arbeit.zusammenfassung == ZUSAMMENFASSUNG_FEHLGESCHLAGEN:
+            return _llm_fehlgeschlagen(arbeit)
+        print(f"📝 {arbeit.titel[:60]}: {arbeit.zusammenfassung}\n🧭 Kategorien (Embedding): {arbeit.kategorien_llm}")
+        return arbeit
+
+    if ist_langer_chat(arbeit.nachrichten):
+        # arbeit.inhalt ist nur der Anfang des Chats – erst Map-Reduce über den ganzen Thread,
+        # dann die Kategorien aus dieser Zusammenfassung (nur Kategorien, keine zweite Zusammenfassung)
+        arbeit.zusammenfassung = fasse_chat_zusammen(arbeit.nachrichten)
+        if arbeit.zusammenfassung == ZUSAMMENFASSUNG_FEHLGESCHLAGEN:
+            return _llm_fehlgeschlagen(arbeit)
+        raw_vorschlag = generiere_kategorien(f"{arbeit.titel}\n\n{arbeit.zusammenfassung}", list(db_kategorien.keys()))
+        if not raw_vorschlag:
+            return _llm_fehlgeschlagen(arbeit)
+        _, vorschlaege = werte_llm_antwort_aus(raw_vorschlag, db_kategorien.keys())
+    else:
+        # Ein Aufruf liefert Zusammenfassung + Kategorien als JSON – über den ganzen Chat, nicht nur die ersten
+        # 3000 Zeichen aus arbeit.inhalt; kurz genug ist er hier per Definition (ist_langer_chat)
+        text = f"{arbeit.titel}\n\n{get_chat_text(arbeit.nachrichten, max_zeichen=None)}"
+        raw_vorschlag = generiere_zusammenfassung_und_kategorien(text, list(db_kategorien.keys()))
+        if not raw_vorschlag:
+            return _llm_fehlgeschlagen(arbeit)
+        llm_zusammenfassung, vorschlaege = werte_llm_antwort_aus(raw_vorschlag, db_kategorien.keys())
+        # Nur wenn die JSON-Antwort unbrauchbar war, separat zusammenfassen
+        arbeit.zusammenfassung = llm_zusammenfassung or generiere_zusammenfassung(text, max_zeichen=None)
+        if arbeit.zusammenfassung == ZUSAMMENFASSUNG_FEHLGESCHLAGEN:
+            return _llm_fehlgeschlagen(arbeit)
+
+    for kat, rel in vorschlaege:
+        if kat not in arbeit.kategorien_manuell:
+            arbeit.kategorien_llm[kat] = rel
+    print(f"📝 {arbeit.titel[:60]}: {arbeit.zusammenfassung}\n📦 Kategorien: {arbeit.kategorien_llm}")
+    return arbeit
+
+
+def embedding_schritt(arbeiten, schreiber, eingebettet):
+    """Stufe 4 (Embedding): ein Encoder-Batch + Upsert für mehrere Chats."""
+    for a in arbeiten:
+        if a.llm_noetig and not a.llm_fehlgeschlagen:
+            schreiber.hinzufuegen(a.chat_id, a.titel, a.zusammenfassung, a.inhalt, a.nachrichten)
+            eingebettet.add(a.chat_id)
+    # vor dem DB-Commit schreiben, sonst würde ein Absturz den Chat als "unverändert" ohne Embedding hinterlassen
+    schreiber.flush()
+    return arbeiten
+
+
+def schreibe_chat(arbeit, db_kategorien, cursor, bm25):
+    """Ein Chat samt Nachrichten, Kategorien und Detailansicht; False, wenn seine DB-ID nicht zu finden war."""
+    # Fehlgeschlagenes LLM: Hash NULL, sonst gälte der Chat beim nächsten Lauf als unverändert
+    insert_update_chats(arbeit.chat_id, arbeit.titel, arbeit.erstellt_am, arbeit.letzte_aenderung,
+                        len(arbeit.nachrichten), arbeit.chat_link, arbeit.zusammenfassung, cursor,
+                        None if arbeit.llm_fehlgeschlagen else arbeit.inhalts_hash, arbeit.duplikat_von)
+    cursor.execute("SELECT id FROM chats WHERE chat_id=%s", (arbeit.chat_id,))
+    result = cursor.fetchone()
+    if not result:
+        print(f"❌ Fehler beim Abrufen der Chat-ID für '{arbeit.titel}'")
+        return False
+
+    chat_db_id = result["id"]
+    speichere_chat_nachrichten(chat_db_id, arbeit.nachrichten, cursor)
+    if arbeit.llm_noetig:
+        # Zusammenfassung aktualisieren (Platzhalter eines fehlgeschlagenen Aufrufs nicht)
+        if not arbeit.llm_fehlgeschlagen:
+            cursor.execute("UPDATE chats SET zusammenfassung = %s WHERE id = %s", (arbeit.zusammenfassung, chat_db_id))
+
+        # Nur LLM-Kategorien löschen – bei Fehlschlag auch, damit der Chat wieder als "noch nicht kategorisiert" gilt
+        cursor.execute("DELETE FROM chat_kategorien WHERE chat_id = %s AND quelle IN ('llama3', 'gpt4', 'embedding')", (chat_db_id,))
+
+    # Alle Kategorien kombinieren und eintragen: also die manuellen und die vom llm
+    # db_kategorien: die aus der Datenbank
+    alle_kategorien = arbeit.kategorien_manuell.copy()
+    alle_kategorien.update(arbeit.kategorien_llm)
+    insert_kategorien(alle_kategorien, db_kategorien, arbeit.kategorien_llm, chat_db_id, cursor,
+                      quelle_llm=arbeit.kategorien_quelle)
+
+    # Detailansicht für die Web-App gleich mit materialisieren
+    speichere_chat_detail(chat_db_id, cursor, arbeit.nachrichten)
+
+    # Keyword-Index inkrementell nachziehen (ohne neue LLM-Zusammenfassung bleibt die alte im Index);
+    # Duplikate nicht indexieren, die Suche zeigt den kanonischen Chat
+    if arbeit.duplikat_von:
+        bm25.entferne(arbeit.chat_id)
+        return True
+    bm25.aktualisiere(arbeit.chat_id, arbeit.titel,
+                      arbeit.zusammenfassung if arbeit.llm_noetig and not arbeit.llm_fehlgeschlagen else None,
+                      get_chat_text(arbeit.nachrichten, max_zeichen=None))
+    return True
+
+
+def db_schritt(arbeiten, db_kategorien, conn, cursor, bm25, duplikate, bekannte_hashes=None, llm_kategorisiert=None):
+    """
+    Stufe 5 (DB): schreibt einen Block Chats und committet danach.
+    Scheitert der Block, wird er zurückgerollt und Chat für Chat wiederholt – ein kaputter Chat kostet nicht die
+    übrigen, und halbe Statements landen nicht im Commit des nächsten Blocks. Geliefert werden nur die gespeicherten.
+    bekannte_hashes/llm_kategorisiert werden nachgezogen, damit der nächste Lauf derselben Sitzung die Chats überspringt.
+    """
+    try:
+        gespeichert = [arbeit for arbeit in arbeiten if schreibe_chat(arbeit, db_kategorien, cursor, bm25)]
+        # Pro Block committen, damit ein Abbruch nicht die ganze LLM-Arbeit kostet
+        bm25.speichere()
+        duplikate.speichere()
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"⚠️ DB-Block mit {len(arbeiten)} Chats fehlgeschlagen ({e}) – speichere einzeln.")
+        gespeichert = []
+        for arbeit in arbeiten:
+            try:
+                if schreibe_chat(arbeit, db_kategorien, cursor, bm25):
+                    conn.commit()
+                    gespeichert.append(arbeit)
+            except Exception as e:
+                conn.rollback()
+                print(f"❌ Chat '{arbeit.titel[:60]}' nicht gespeichert: {e}")
+        bm25.speichere()
+        duplikate.speichere()
+    markiere_import_stand()
+    for arbeit in gespeichert:
+        if arbeit.llm_fehlgeschlagen:
+            # wie in der DB: kein Hash, keine LLM-Kategorien -> der nächste Lauf fasst den Chat wieder an
+            if bekannte_hashes is not None:
+                bekannte_hashes[arbeit.chat_id] = None
+            if llm_kategorisiert is not None:
+                llm_kategorisiert.discard(arbeit.chat_id)
+            continue
+        if bekannte_hashes is not None:
+            bekannte_hashes[arbeit.chat_id] = arbeit.inhalts_hash
+        if llm_kategorisiert is not None and arbeit.kategorien_llm:
+            llm_kategorisiert.add(arbeit.chat_id)
+    return gespeichert
+
+
+def uebernehme_duplikate(cursor, duplikate, bm25, vectordb=None, bekannte_hashes=None):
+    """
+    Duplikate dieses Laufs bekommen Zusammenfassung + Kategorien ihres kanonischen Chats.
+    Ihre eigenen Vektoren fliegen aus Chroma – Vektor-Suche, Nachbarn und Themen sehen nur den kanonischen Chat.
+    Ist der kanonische Chat selbst gescheitert, verliert das Duplikat seinen Hash und kommt beim nächsten Lauf wieder dran.
+    """
+    for chat_db_id, chat_id, zusammenfassung in uebernehme_duplikat_ergebnisse(duplikate.neue_duplikate, cursor):
+        speichere_chat_detail(chat_db_id, cursor)
+        bm25.entferne(chat_id)
+    offen = verwerfe_hashes_offener_duplikate(list(duplikate.neue_duplikate), cursor)
+    if offen:
+        print(f"♊ {len(offen)} Duplikate warten auf ihren gescheiterten kanonischen Chat – nächster Lauf übernimmt erneut.")
+    if bekannte_hashes is not None:
+        for chat_id in offen:
+            bekannte_hashes[chat_id] = None
+    bm25.speichere()
+    if vectordb is not None:
+        entferne_chat_dokumente(vectordb, list(duplikate.neue_duplikate))
+
+
+class ImportSitzung:
+    """
+    Alles, was ein Import warm braucht: DB-Verbindung, Chroma/Embedding-Modell, Klassifikator, BM25- und Duplikat-Index.
+    fuehre_tasks_aus() nutzt sie für genau einen Lauf, der Import-Dienst (agent/import_dienst.py) hält sie offen.
+    """
+
+    def __init__(self, chat_infos_pfad="chat_infos.xlsx"):
+        # Alle Stichwörter einmal kompilieren; wie bisher Teilwort-Treffer im Titel (ohne Wortgrenzen)
+        self.stichwort_matcher = StichwortMatcher.aus_mapping(lade_excel_chat_infos(chat_infos_pfad), wortgrenzen=False)
+        self.conn = verbinde_mit_datenbank()
+        self.cursor = self.conn.cursor()
+        # Schema inkl. Indizes auf den aktuellen Stand bringen (agent/migrationen.py)
+        migriere(self.cursor, self.conn)
+        self.bekannte_hashes = hole_inhalts_hashes(self.cursor)
+        self.llm_kategorisiert = hole_llm_kategorisierte_chats(self.cursor)
+        self.vectordb = init_chroma()
+        self.schreiber = EmbeddingSchreiber(self.vectordb)
+        self.klassifikator = erstelle_klassifikator(self.cursor, self.vectordb) if KLASSIFIKATOR_AKTIV else None
+        self.nachrichten_cache = NachrichtenCache()
+        # SQLite: FTS5 in der Datenbank statt eigener BM25-Datei (pflegt sich per Trigger selbst)
+        self.bm25 = VolltextIndex() if DB_BACKEND == "sqlite" else BM25Index()
+        if len(self.bm25) == 0 and self.bekannte_hashes:
+            # Bestehende Chats einmalig übernehmen – unveränderte Chats laufen sonst nie durch die DB-Stufe
+            baue_aus_datenbank(self.cursor, self.bm25)
+        self.duplikate = DuplikatIndex()
+        if len(self.duplikate) == 0 and self.bekannte_hashes:
+            baue_duplikat_index(self.cursor, self.duplikate)
+        self.conn.commit()
+        self.pipeline = None
+        self.quelle = None
+        self.laeufe = 0
+        self.llm_fehlgeschlagen = 0
+
+    def importiere(self, daten, quelle=None):
+        """
+        Ein Lauf über die Chats aus daten (Iterator).
+        Liefert {"stufen": Pipeline-Statistik, "fehlgeschlagen": Chats, die der nächste Lauf erneut versuchen muss}.
+        """
+        # Lange Pausen im Dienst: MySQL kappt untätige Verbindungen (wait_timeout)
+        self.conn.ping(reconnect=True)
+        db_kategorien = hole_kategorien(self.cursor)
+        # neue_duplikate NICHT leeren: beim ersten Lauf stehen hier die Duplikate aus baue_duplikat_index
+        self.duplikate.duplikate_gefunden = 0
+        self.llm_fehlgeschlagen = 0
+        if self.klassifikator:
+            # Fallback-Quote je Lauf, nicht über alle Exporte des Dienstes
+            self.klassifikator.embedding_treffer = self.klassifikator.llm_fallback = 0
+        if hole_client().cache is not None:
+            hole_client().cache.setze_statistik_zurueck()
+        self.quelle = quelle
+
+        eingebettet = set()
+        self.pipeline = (
+            Pipeline(queue_groesse=PIPELINE_QUEUE_GROESSE)
+            .stufe("parse", lambda chat: bereite_chat_vor(chat, self.stichwort_matcher, self.bekannte_hashes,
+                                                          self.llm_kategorisiert, self.nachrichten_cache))
+            .stufe("dedup", lambda arbeit: dedup_schritt(arbeit, self.duplikate))
+            .stufe("llm", lambda arbeit: llm_schritt(arbeit, db_kategorien, self.klassifikator), worker=LLM_PARALLEL)
+            .stufe("embed", lambda arbeiten: embedding_schritt(arbeiten, self.schreiber, eingebettet),
+                   batch_groesse=EMBED_BATCH_GROESSE)
+            .stufe("db", lambda arbeiten: self._db_stufe(arbeiten, db_kategorien), batch_groesse=COMMIT_ALLE_N_CHATS)
+        )
+        try:
+            statistik = self.pipeline.lauf(daten)
+            # Erst jetzt sind alle kanonischen Chats (auch die aus diesem Lauf) in der DB
+            uebernehme_duplikate(self.cursor, self.duplikate, self.bm25, self.vectordb, self.bekannte_hashes)
+            # erst nach dem Übernehmen leeren – scheitert der Lauf vorher, holt der nächste sie nach
+            self.duplikate.neue_duplikate.clear()
+            aktualisiere_nachbarn(self.cursor, self.vectordb, eingebettet)
+            ordne_neue_chats_zu(self.cursor, self.vectordb, eingebettet)
+            baue_fehlende_chat_details(self.cursor)
+        finally:
+            self.conn.commit()
+            markiere_import_stand()
+            self.laeufe += 1
+        self.drucke_statistik()
+        return {"stufen": statistik, "fehlgeschlagen": self.fehlgeschlagen()}
+
+    def _db_stufe(self, arbeiten, db_kategorien):
+        gespeichert = db_schritt(arbeiten, db_kategorien, self.conn, self.cursor, self.bm25, self.duplikate,
+                                 self.bekannte_hashes, self.llm_kategorisiert)
+        # ohne Hash gespeichert (Ollama nicht erreichbar o. ä.) – zählen als fehlgeschlagen
+        self.llm_fehlgeschlagen += sum(1 for arbeit in gespeichert if arbeit.llm_fehlgeschlagen)
+        return gespeichert
+
+    def fehlgeschlagen(self):
+        """Chats des laufenden bzw. letzten Laufs ohne Ergebnis: LLM fehlgeschlagen oder in einer Stufe verloren."""
+        if self.pipeline is None:
+            return 0
+        return self.llm_fehlgeschlagen + sum(s["fehler"] for s in self.pipeline.statistik())
+
+    def status(self):
+        """Fortschritt des laufenden bzw. letzten Laufs (für Status-Datei/HTTP des Import-Dienstes)."""
+        if self.pipeline is None:
+            return {"quelle": self.quelle, "laeufe": self.laeufe, "gelesen": 0, "queue_tiefen": {}, "stufen": []}
+        return {
+            "quelle": self.quelle,
+            "laeufe": self.laeufe,
+            "gelesen": self.pipeline.quelle_gelesen,
+            "laufzeit": round(self.pipeline.laufzeit(), 1),
+            "queue_tiefen": self.pipeline.queue_tiefen(),
+            "stufen": self.pipeline.statistik(),
+            "fehlgeschlagen": self.fehlgeschlagen(),
+        }
+
+    def drucke_statistik(self):
+        parse = self.pipeline.stufen[0].statistik
+        uebersprungen = parse.eingang - parse.ausgang - parse.fehler
+        if uebersprungen:
+            print(f"⏩ {uebersprungen} unveränderte Chats übersprungen.")
+        self.pipeline.drucke_statistik()
+        if self.fehlgeschlagen():
+            print(f"⚠️ {self.fehlgeschlagen()} Chats fehlgeschlagen – sie werden beim nächsten Import erneut versucht.")
+        if self.duplikate.duplikate_gefunden:
+            print(f"♊ {self.duplikate.duplikate_gefunden} Duplikate erkannt "
+                  f"({100 * self.duplikate.duplikate_gefunden / max(parse.ausgang, 1):.1f} % "
+                  f"der verarbeiteten Chats) – LLM und Embedding übersprungen.")
+        if self.klassifikator:
+            self.klassifikator.drucke_statistik()
+        if hole_client().cache is not None:
+            hole_client().cache.drucke_statistik()
+
+    def close(self):
+        self.nachrichten_cache.close()
+        if isinstance(self.bm25, VolltextIndex):
+            self.bm25.close()
+        self.cursor.close()
+        self.conn.close()
+
+
 def fuehre_tasks_aus():
     print("🔄 Starte Agentenaufgaben...")
-    daten = lade_json("conversations.json")
-    stichwort_mapping = lade_excel_chat_infos("chat_infos.xlsx")
-    conn = verbinde_mit_datenbank()
-    cursor = conn.cursor()
-    db_kategorien = hole_kategorien(cursor)
-    vectordb = init_chroma()
-    for i, chat in enumerate(daten):
-        chat_id = chat.get("id")
-        titel = chat.get("title", "")[:255].strip()
-        messages = list(chat.get("mapping", {}).values())
-        erstellt_am = datetime.fromtimestamp(chat.get("create_time", 0))
-        message_count = len(messages)
-        letzte_aenderung = datetime.fromtimestamp(chat.get("update_time", 0))
-        chat_link = f"https://chat.openai.com/c/{chat_id}"
-
-        if SKIP_UNVERÄNDERTE_CHATS:
-            cursor.execute("SELECT message_count FROM chats WHERE chat_id = %s", (chat_id,))
-            result = cursor.fetchone()
-            if result and result["message_count"] == message_count:
-                print(f"⏩ Chat '{titel}' wurde nicht verändert – übersprungen.")
-                return
-
-        chat_text = get_chat_text(messages)
-
-        inhalt = f"{titel}\n\n{chat_text}"
-        kategorien_manuell = {}
-
-        for suchwort, manuelle_kategorie in stichwort_mapping.items():
-            if suchwort.lower() in titel.lower():
-                kategorien_manuell[manuelle_kategorie] = 100
-                print(f"🔎 Manuelle Kategorie erkannt: {manuelle_kategorie}")
-
-        zusammenfassung = "[Noch keine LLM-Zusammenfassung]"
-        chat_db_id = insert_update_chats(chat_id, titel, erstellt_am, letzte_aenderung, message_count, chat_link, zusammenfassung, cursor)
-        speichere_chat_nachrichten(chat_db_id, messages, cursor)
-        cursor.execute("SELECT id FROM chats WHERE chat_id=%s", (chat_id,))
-        result = cursor.fetchone()
-        if not result:
-            print(f"❌ Fehler beim Abrufen der Chat-ID für '{titel}'")
-            return
-
-        chat_db_id = result["id"]
-        kategorien_llm = {}
-        if braucht_llm_kategorisierung(chat_db_id, cursor):
-            raw_vorschlag = generiere_kategorievorschlag(inhalt, list(db_kategorien.keys()))
-            print(f"📥 LLM-Rohvorschlag: {raw_vorschlag}")
-            for kat, rel in extrahiere_kategorien_und_relevanz(raw_vorschlag, db_kategorien.keys()):
-                if kat not in kategorien_manuell:
-                    kategorien_llm[kat] = rel
-
-            zusammenfassung = generiere_zusammenfassung(inhalt)
-           
-            print(f"📝 Zusammenfassung: {zusammenfassung}\n📦 Kategorien: {raw_vorschlag}")           
-            speichere_embedding(chat_id, titel, zusammenfassung, inhalt, vectordb)
-
-            # Zusammenfassung aktualisieren
-            cursor.execute("UPDATE chats SET zusammenfassung = %s WHERE id = %s", (zusammenfassung, chat_db_id))
-
-            # Nur LLM-Kategorien löschen
-            cursor.execute("DELETE FROM chat_kategorien WHERE chat_id = %s AND quelle IN ('llama3', 'gpt4')", (chat_db_id,))
-        else:
-            print(f"⏭️ Chat '{titel}' wurde bereits LLM-kategorisiert – LLM-Skip.")
-        
-        # Alle Kategorien kombinieren und eintragen: also die manuellen und die vom llm
-        # db_kategorien: die aus der Datenbank
-        alle_kategorien = kategorien_manuell.copy()
-        alle_kategorien.update(kategorien_llm)
-        insert_kategorien(alle_kategorien, db_kategorien, kategorien_llm, chat_db_id, cursor)
-        
-
-    conn.commit()
-    cursor.close()
-    conn.close()
-    print("✅ LLM-Kategorisierung (V5.0 mit manuell/llm-Merge) abgeschlossen.")
\ No newline at end of file
+    sitzung = ImportSitzung()
+    try:
+        sitzung.importiere(lade_json_stream("conversations.json"), "conversations.json")
+    finally:
+        sitzung.close()
+    print("✅ LLM-Kategorisierung (V5.0 mit manuell/llm-Merge) abgeschlossen.")
@@ -0,0 +1,208 @@
+"""
+Themen-Clustering über die Chat-Embeddings (Mini-Batch-k-Means, Kosinus) mit Schlüsselwörtern je Cluster.
+Cluster, die keine bestehende Kategorie abdeckt, werden als neue Kategorien vorgeschlagen.
+Neue Chats werden beim Import nur noch dem nächsten Zentroid zugeordnet.
+
+Komplett neu clustern und Vorschläge ausgeben:
+    python -m agent.themen_cluster --k 40
+"""
+import argparse
+import math
+import os
+import time
+from collections import Counter
+
+import numpy as np
+
+from agent.config import (CLUSTER_MODELL_PFAD, CLUSTER_ANZAHL, CLUSTER_BATCH_GROESSE, CLUSTER_ITERATIONEN,
+                          CLUSTER_MIN_GROESSE, CLUSTER_ABDECKUNG, CLUSTER_SCHLUESSELWOERTER)
+from agent.bm25_index import tokenisiere
+from agent.db_writer import in_bloecken, upsert_sql
+from agent.vectorstore import hole_chat_embeddings
+
+
+def _normiere(matrix):
+    normen = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(normen == 0, 1, normen)
+
+
+def mini_batch_kmeans(matrix, k, batch_groesse=CLUSTER_BATCH_GROESSE, iterationen=CLUSTER_ITERATIONEN, seed=42):
+    """Sphärisches Mini-Batch-k-Means (Sculley 2010) auf normierten Vektoren; liefert die Zentroiden."""
+    rng = np.random.default_rng(seed)
+    n = len(matrix)
+    k = min(k, n)
+
+    # k-means++-Start auf einer Stichprobe
+    stichprobe = matrix[rng.choice(n, size=min(n, 20 * k), replace=False)]
+    zentroiden = [stichprobe[rng.integers(len(stichprobe))]]
+    abstand = 1 - stichprobe @ zentroiden[0]
+    for _ in range(1, k):
+        gewichte = np.clip(abstand, 0, None) ** 2
+        summe = gewichte.sum()
+        idx = rng.choice(len(stichprobe), p=gewichte / summe) if summe > 0 else rng.integers(len(stichprobe))
+        zentroiden.append(stichprobe[idx])
+        abstand = np.minimum(abstand, 1 - stichprobe @ stichprobe[idx])
+    zentroiden = np.array(zentroiden, dtype=np.float32)
+
+    zaehler = np.zeros(k)
+    for _ in range(iterationen):
+        batch = matrix[rng.choice(n, size=min(batch_groesse, n), replace=False)]
+        zuordnung = np.argmax(batch @ zentroiden.T, axis=1)
+        for c in np.unique(zuordnung):
+            punkte = batch[zuordnung == c]
+            zaehler[c] += len(punkte)
+            lernrate = len(punkte) / zaehler[c]
+            zentroiden[c] = (1 - lernrate) * zentroiden[c] + lernrate * punkte.mean(axis=0)
+        zentroiden = _normiere(zentroiden)
+    return zentroiden
+
+
+def ordne_zu(matrix, zentroiden):
+    """(Cluster-Index, Ähnlichkeit) je Zeile."""
+    scores = matrix @ zentroiden.T
+    cluster = np.argmax(scores, axis=1)
+    return cluster, scores[np.arange(len(matrix)), cluster]
+
+
+def schluesselwoerter(texte_je_cluster, anzahl=CLUSTER_SCHLUESSELWOERTER):
+    """c-TF-IDF: Wörter, die in einem Cluster häufig und in anderen Clustern selten sind."""
+    zaehler = {c: Counter(w for text in texte for w in tokenisiere(text)) for c, texte in texte_je_cluster.items()}
+    df = Counter(w for z in zaehler.values() for w in z)
+    anzahl_cluster = len(zaehler)
+    ergebnis = {}
+    for c, z in zaehler.items():
+        gesamt = sum(z.values()) or 1
+        scores = {w: (n / gesamt) * math.log(1 + anzahl_cluster / df[w]) for w, n in z.items() if not w.isdigit()}
+        ergebnis[c] = [w for w, _ in sorted(scores.items(), key=lambda x: -x[1])[:anzahl]]
+    return ergebnis
+
+
+def _lade_chats(cursor, vectordb, nur_export_ids=None):
+    embeddings = hole_chat_embeddings(vectordb)
+    cursor.execute("SELECT id, chat_id, titel, zusammenfassung FROM chats WHERE duplikat_von IS NULL")
+    chats = [row for row in cursor.fetchall() if row["chat_id"] in embeddings
+             and (nur_export_ids is None or row["chat_id"] in nur_export_ids)]
+    if not chats:
+        return [], np.zeros((0, 0), dtype=np.float32)
+    return chats, _normiere(np.asarray([embeddings[c["chat_id"]] for c in chats], dtype=np.float32))
+
+
+def _schreibe_zuordnung(cursor, chats, cluster, aehnlichkeit):
+    zeilen = [(c["id"], int(t), float(a)) for c, t, a in zip(chats, cluster, aehnlichkeit)]
+    sql = upsert_sql(cursor, "chat_themen", ["chat_id", "thema_id", "aehnlichkeit"], ["chat_id"], ["thema_id", "aehnlichkeit"])
+    for block in in_bloecken(zeilen):
+        cursor.executemany(sql, block)
+
+
+def clustere(cursor, vectordb, k=None, pfad=CLUSTER_MODELL_PFAD):
+    """Kompletter Lauf: clustern, Schlüsselwörter, Abdeckung durch Kategorien, Vorschläge. Liefert die Themen."""
+    start = time.perf_counter()
+    chats, matrix = _lade_chats(cursor, vectordb)
+    if not chats:
+        print("⚠️ Keine Chat-Embeddings zum Clustern gefunden.")
+        return []
+    k = k or CLUSTER_ANZAHL or max(2, int(math.sqrt(len(chats) / 2)))
+    zentroiden = mini_batch_kmeans(matrix, k)
+    cluster, aehnlichkeit = ordne_zu(matrix, zentroiden)
+
+    # Kategorien je Chat (alle Quellen, nur ab Relevanz 40; die alte Skala 1-5 hat Migration 4 umgerechnet)
+    cursor.execute(
+        "SELECT ck.chat_id, k.name FROM chat_kategorien ck JOIN kategorien k ON k.id = ck.kategorie_id "
+        "WHERE ck.relevanz >= 40"
+    )
+    kategorien_je_chat = {}
+    for row in cursor.fetchall():
+        kategorien_je_chat.setdefault(row["chat_id"], set()).add(row["name"].lower())
+
+    texte, mitglieder = {}, {}
+    for chat, c in zip(chats, cluster):
+        texte.setdefault(int(c), []).append(f"{chat['titel'] or ''} {chat['zusammenfassung'] or ''}")
+        mitglieder.setdefault(int(c), []).append(chat["id"])
+    woerter = schluesselwoerter(texte)
+
+    themen = []
+    for c, ids in sorted(mitglieder.items()):
+        verteilung = Counter(kat for chat_db_id in ids for kat in kategorien_je_chat.get(chat_db_id, ()))
+        top_kategorie, treffer = verteilung.most_common(1)[0] if verteilung else (None, 0)
+        abdeckung = treffer / len(ids)
+        themen.append({
+            "id": c,
+            "schluesselwoerter": woerter.get(c, []),
+            "groesse": len(ids),
+            "top_kategorie": top_kategorie,
+            "abdeckung": abdeckung,
+            # Vorschlag: genügend Chats, aber keine Kategorie deckt das Thema nennenswert ab
+            "vorschlag": len(ids) >= CLUSTER_MIN_GROESSE and abdeckung < CLUSTER_ABDECKUNG,
+        })
+
+    cursor.execute("DELETE FROM themen")
+    cursor.execute("DELETE FROM chat_themen")
+    cursor.executemany(
+        "INSERT INTO themen (id, schluesselwoerter, groesse, top_kategorie, abdeckung, vorschlag) "
+        "VALUES (%s, %s, %s, %s, %s, %s)",
+        [(t["id"], ", ".join(t["schluesselwoerter"])[:255], t["groesse"], t["top_kategorie"], t["abdeckung"],
+          int(t["vorschlag"])) for t in themen]
+    )
+    _schreibe_zuordnung(cursor, chats, cluster, aehnlichkeit)
+
+    os.makedirs(os.path.dirname(pfad) or ".", exist_ok=True)
+    np.save(pfad, zentroiden)
+    print(f"🧩 {len(chats)} Chats in {len(themen)} Themen geclustert ({time.perf_counter() - start:.1f}s)")
+    return themen
+
+
+def ordne_neue_chats_zu(cursor, vectordb, chat_ids, pfad=CLUSTER_MODELL_PFAD):
+    """
+    Inkrementell beim Import: neue/geänderte Chats dem nächsten bestehenden Thema zuordnen.
+    Gelöschte Chats und neue Duplikate verlieren ihre Zuordnung, damit groesse nur echte Chats zählt.
+    """
+    if not os.path.exists(pfad):
+        return 0
+    cursor.execute("DELETE FROM chat_themen WHERE chat_id NOT IN (SELECT id FROM chats WHERE duplikat_von IS NULL)")
+    entfernt = cursor.rowcount
+    chats = []
+    if chat_ids:
+        chats, matrix = _lade_chats(cursor, vectordb, set(chat_ids))
+    if chats:
+        cluster, aehnlichkeit = ordne_zu(matrix, np.load(pfad))
+        _schreibe_zuordnung(cursor, chats, cluster, aehnlichkeit)
+    if chats or entfernt:
+        cursor.execute(
+            "UPDATE themen AS t SET groesse = (SELECT COUNT(*) FROM chat_themen ct WHERE ct.thema_id = t.id)"
+        )
+        print(f"🧩 {len(chats)} Chats bestehenden Themen zugeordnet, {max(entfernt, 0)} Zuordnungen entfernt.")
+    return len(chats)
+
+
+def drucke_vorschlaege(themen):
+    vorschlaege = [t for t in themen if t["vorschlag"]]
+    if not vorschlaege:
+        print("✅ Alle größeren Themen sind durch bestehende Kategorien abgedeckt.")
+        return
+    print(f"\n💡 {len(vorschlaege)} Themen ohne passende Kategorie:")
+    for t in sorted(vorschlaege, key=lambda t: -t["groesse"]):
+        abdeckung = f"{t['top_kategorie']} {100 * t['abdeckung']:.0f} %" if t["top_kategorie"] else "keine"
+        print(f"   #{t['id']:<3} {t['groesse']:>5} Chats | {', '.join(t['schluesselwoerter'])} | Abdeckung: {abdeckung}")
+
+
+def main():
+    from agent.db_writer import verbinde_mit_datenbank
+    from agent.migrationen import migriere
+    from agent.vectorstore import init_chroma
+
+    parser = argparse.ArgumentParser(description="Chats nach Themen clustern und neue Kategorien vorschlagen")
+    parser.add_argument("--k", type=int, default=None, help="Anzahl Cluster (Standard: CLUSTER_ANZAHL bzw. sqrt(n/2))")
+    args = parser.parse_args()
+
+    conn = verbinde_mit_datenbank()
+    cursor = conn.cursor()
+    migriere(cursor, conn)  # legt u. a. themen/chat_themen an
+    themen = clustere(cursor, init_chroma(), args.k)
+    conn.commit()
+    drucke_vorschlaege(themen)
+    cursor.close()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
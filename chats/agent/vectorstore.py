@@ -1,27 +1,110 @@
 from langchain_chroma import Chroma
-from langchain.embeddings import HuggingFaceEmbeddings
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain.storage import LocalFileStore
 from langchain_core.documents import Document
-from agent.config import CHROMA_PATH
+from agent.config import CHROMA_PATH, EMBED_BATCH_GROESSE, EMBEDDING_CACHE_PFAD, EMBEDDING_MODELL
+from agent.chunking import erzeuge_chunks, chunk_hash
+from agent.embedding_service import erzeuge_embedding_service, pruefe_index_info
 
-def init_chroma():
-    embeddings = HuggingFaceEmbeddings(
-        model_name='intfloat/e5-large-v2',
-        model_kwargs={'device': 'cpu'},
-        encode_kwargs={'normalize_embeddings': True}
+def init_chroma(modell=EMBEDDING_MODELL):
+    service = erzeuge_embedding_service(modell)
+    collection = pruefe_index_info(service.name, service.dimension)
+    # Embeddings nach Text-Hash cachen: beim Re-Import werden nur neue/geänderte Chunks gerechnet
+    cached = CacheBackedEmbeddings.from_bytes_store(
+        service, LocalFileStore(EMBEDDING_CACHE_PFAD), namespace=service.name
     )
-    return Chroma(persist_directory=CHROMA_PATH, embedding_function=embeddings)
+    return Chroma(collection_name=collection, persist_directory=CHROMA_PATH, embedding_function=cached)
 
-def speichere_embedding(chat_id, title, summary, content, vectordb, overwrite=True):
-    text = f"passage: Titel: {title}\nZusammenfassung: {summary}\nInhalt: {content}"
-    metadata = {"chat_id": chat_id, "title": title}
+def dokument_text(title, summary, content):
+    # auch der Kategorie-Klassifikator bettet genau diesen Text ein (gleicher Vektor, kommt aus dem Embedding-Cache)
+    return f"passage: Titel: {title}\nZusammenfassung: {summary}\nInhalt: {content}"
+
+def erzeuge_dokument(chat_id, title, summary, content):
+    text = dokument_text(title, summary, content)
+    return Document(page_content=text, metadata={"chat_id": chat_id, "title": title, "art": "zusammenfassung"})
+
+def erzeuge_chunk_dokumente(chat_id, title, nachrichten):
+    docs = {}
+    for i, chunk in enumerate(erzeuge_chunks(nachrichten)):
+        text = f"passage: Titel: {title}\n{chunk}"
+        docs[f"{chat_id}#{i}"] = Document(
+            page_content=text,
+            metadata={"chat_id": chat_id, "title": title, "art": "chunk", "chunk": i, "hash": chunk_hash(text)}
+        )
+    return docs
+
+def entferne_veraltete_dokumente(vectordb, chat_ids, behalten):
+    # Alles zu diesen Chats löschen, was nicht neu geschrieben wird: alte Duplikate mit Zufalls-IDs
+    # und Chunks, die es nach einer Änderung nicht mehr gibt
+    alt = vectordb.get(where={"chat_id": {"$in": list(chat_ids)}}, include=[])
+    veraltet = [i for i in alt.get("ids", []) if i not in behalten]
+    if veraltet:
+        vectordb.delete(ids=veraltet)
+        print(f"🧹 {len(veraltet)} veraltete Embeddings entfernt.")
+
+def entferne_chat_dokumente(vectordb, chat_ids):
+    """Alle Dokumente (Zusammenfassung + Chunks) dieser Chats löschen, z. B. wenn sie zu Duplikaten geworden sind."""
+    if not chat_ids:
+        return 0
+    ids = vectordb.get(where={"chat_id": {"$in": list(chat_ids)}}, include=[]).get("ids", [])
+    if ids:
+        vectordb.delete(ids=ids)
+        print(f"🧹 {len(ids)} Embeddings von {len(chat_ids)} Duplikaten entfernt.")
+    return len(ids)
+
+def hole_chat_embeddings(vectordb):
+    """{chat_id: embedding} der Zusammenfassungs-Dokumente (ein Vektor pro Chat, ohne Chunks)."""
+    daten = vectordb.get(include=["embeddings", "metadatas"])
+    ergebnis = {}
+    for embedding, meta in zip(daten["embeddings"], daten["metadatas"]):
+        meta = meta or {}
+        # ältere Dokumente haben noch kein "art"-Feld – das sind ebenfalls Zusammenfassungen
+        if meta.get("art") == "chunk" or not meta.get("chat_id"):
+            continue
+        ergebnis[meta["chat_id"]] = embedding
+    return ergebnis
+
+class EmbeddingSchreiber:
+    """
+    Sammelt Dokumente und schreibt sie blockweise nach Chroma:
+    ein Encoder-Forward-Pass pro Block und Upsert über feste IDs
+    (chat_id für die Zusammenfassung, chat_id#n für die Chunks).
+    """
+
+    def __init__(self, vectordb, batch_groesse=EMBED_BATCH_GROESSE):
+        self.vectordb = vectordb
+        self.batch_groesse = batch_groesse
+        self._puffer = {}
+
+    def hinzufuegen(self, chat_id, title, summary, content, nachrichten=None):
+        # Gleiche chat_id im selben Block: der letzte Stand gewinnt
+        docs = {chat_id: erzeuge_dokument(chat_id, title, summary, content)}
+        if nachrichten:
+            docs.update(erzeuge_chunk_dokumente(chat_id, title, nachrichten))
+        self._puffer[chat_id] = docs
+        if sum(len(d) for d in self._puffer.values()) >= self.batch_groesse:
+            self.flush()
+
+    def flush(self):
+        if not self._puffer:
+            return 0
+        alle = {}
+        for docs in self._puffer.values():
+            alle.update(docs)
+        chat_ids = set(self._puffer.keys())
+        self._puffer = {}
+        entferne_veraltete_dokumente(self.vectordb, chat_ids, set(alle.keys()))
+        # langchain_chroma macht bei übergebenen IDs ein Upsert
+        self.vectordb.add_documents(list(alle.values()), ids=list(alle.keys()))
+        print(f"💾 {len(alle)} Embeddings für {len(chat_ids)} Chats gespeichert.")
+        return len(alle)
+
+def speichere_embedding(chat_id, title, summary, content, vectordb, overwrite=True, nachrichten=None):
     print(f"🔄 Speichere Embedding für Chat {chat_id}...")
+    if not overwrite and vectordb.get(ids=[chat_id], include=[]).get("ids"):
+        print(f"⏭️ Chat {chat_id} bereits vorhanden – wird übersprungen.")
+        return
+    schreiber = EmbeddingSchreiber(vectordb)
+    schreiber.hinzufuegen(chat_id, title, summary, content, nachrichten)
+    schreiber.flush()
     print(f"✅ Eingefügt in Chroma: {chat_id} – {title[:50]}...")
-    if not overwrite:
-        result = vectordb.similarity_search(text, k=3)
-        for doc in result:
-            if doc.metadata.get("chat_id") == chat_id:
-                print(f"⏭️ Chat {chat_id} bereits vorhanden – wird übersprungen.")
-                return
-    vectordb.add_documents([Document(page_content=text, metadata=metadata)])
-  #  vectordb.persist()
-    print(f"💾 Chat {chat_id} gespeichert.")
@@ -1,20 +1,109 @@
-import subprocess
-
-def generiere_zusammenfassung(text):
-    prompt = f"Fasse den folgenden Chat knapp zusammen (max. 3 Sätze):\n\n{text[:2000]}"
-    result = subprocess.run(["ollama", "run", "llama3", prompt],
-                            capture_output=True, text=True, timeout=90, encoding="utf-8", errors="ignore")
-    return result.stdout.strip()
-
-def get_chat_text(messages):
-        return "\n\n".join(
-            str(m["message"]["content"]["parts"][0])
-            for m in messages
-            if (
-                "message" in m and isinstance(m["message"], dict) and
-                "content" in m["message"] and isinstance(m["message"]["content"], dict) and
-                "parts" in m["message"]["content"] and
-                isinstance(m["message"]["content"]["parts"], list) and
-                m["message"]["content"]["parts"]
-            )
-        )[:3000]
\ No newline at end of file
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from agent.llm_client import hole_client, LLMFehler
+from agent.chunking import erzeuge_chunks, zaehle_tokens
+from agent.config import ZUSAMMENFASSUNG_CHUNK_TOKENS, ZUSAMMENFASSUNG_PARALLEL
+
+# Version hochzählen, wenn sich der Prompt inhaltlich ändert und alte Cache-Antworten nicht mehr passen
+ZUSAMMENFASSUNG_VORLAGE = "zusammenfassung-v1"
+ABSCHNITT_VORLAGE = "abschnitt-v1"
+REDUKTION_VORLAGE = "reduktion-v1"
+MAX_REDUKTIONS_RUNDEN = 4
+# Platzhalter, wenn Ollama nicht geantwortet hat – der Import erkennt daran, dass der Chat neu versucht werden muss
+ZUSAMMENFASSUNG_FEHLGESCHLAGEN = "[Zusammenfassung fehlgeschlagen]"
+
+def generiere_zusammenfassung(text, client=None, max_zeichen=2000):
+    if max_zeichen:
+        text = text[:max_zeichen]
+    prompt = f"Fasse den folgenden Chat knapp zusammen (max. 3 Sätze):\n\n{text}"
+    try:
+        return (client or hole_client()).generiere(prompt, vorlage=ZUSAMMENFASSUNG_VORLAGE)
+    except LLMFehler as e:
+        print(f"❌ Zusammenfassung fehlgeschlagen: {e}")
+        return ZUSAMMENFASSUNG_FEHLGESCHLAGEN
+
+def extrahiere_zusammenfassung(nachrichten, max_saetze=2, max_zeichen=300):
+    """Zusammenfassung ohne LLM: die ersten Sätze der ersten Nutzerfrage – womit der Chat angefangen hat."""
+    for n in nachrichten:
+        text = " ".join(n["text"].split())
+        if n["rolle"] != "user" or not text:
+            continue
+        auszug = " ".join(re.split(r"(?<=[.!?])\s+", text)[:max_saetze])
+        if len(auszug) > max_zeichen:
+            auszug = auszug[:max_zeichen].rsplit(" ", 1)[0] + " …"
+        return auszug
+    return "[Noch keine LLM-Zusammenfassung]"
+
+def get_chat_text(nachrichten, max_zeichen=3000):
+    # nachrichten = linearisierter Thread aus agent.konversation (Reihenfolge + Rolle bereits korrekt)
+    text = "\n\n".join(f"{n['rolle']}: {n['text']}" for n in nachrichten)
+    return text[:max_zeichen] if max_zeichen else text
+
+def ist_langer_chat(nachrichten, max_tokens=ZUSAMMENFASSUNG_CHUNK_TOKENS):
+    return zaehle_tokens(get_chat_text(nachrichten, max_zeichen=None)) > max_tokens
+
+def _fasse_abschnitt_zusammen(abschnitt, client):
+    # Keine Teilnummer im Prompt: sonst ändert jeder neue Abschnitt die Prompts (und Cache-Schlüssel) aller alten
+    prompt = (
+        "Fasse diesen Abschnitt eines längeren Chats in 2-3 Sätzen zusammen. "
+        "Nur Inhalt, keine Einleitung:\n\n" + abschnitt
+    )
+    try:
+        return client.generiere(prompt, vorlage=ABSCHNITT_VORLAGE)
+    except LLMFehler as e:
+        print(f"⚠️ Abschnitt nicht zusammengefasst: {e}")
+        return None
+
+# Ein Pool für die Abschnitts-Anfragen aller Chats: die LLM-Stufe läuft schon mit LLM_PARALLEL Threads,
+# ein eigener Pool pro Chat würde Ollama mit LLM_PARALLEL x ZUSAMMENFASSUNG_PARALLEL Anfragen überbuchen
+_abschnitt_pool = ThreadPoolExecutor(max_workers=ZUSAMMENFASSUNG_PARALLEL, thread_name_prefix="abschnitt")
+
+def _verdichte(teile, client, max_tokens, pool, abschliessend):
+    liste = "\n".join(f"- {t}" for t in teile)
+    if abschliessend:
+        prompt = ("Hier sind Zusammenfassungen der Abschnitte eines Chats in Reihenfolge. "
+                  "Fasse den gesamten Chat knapp zusammen (max. 3 Sätze):\n\n" + liste)
+        try:
+            return client.generiere(prompt, vorlage=REDUKTION_VORLAGE)
+        except LLMFehler as e:
+            print(f"❌ Zusammenfassung fehlgeschlagen: {e}")
+            return ZUSAMMENFASSUNG_FEHLGESCHLAGEN
+
+    # Zu viele Teil-Zusammenfassungen für einen Prompt -> gruppenweise vorverdichten
+    gruppen, gruppe, tokens = [], [], 0
+    for teil in teile:
+        n = zaehle_tokens(teil)
+        if gruppe and tokens + n > max_tokens:
+            gruppen.append(gruppe)
+            gruppe, tokens = [], 0
+        gruppe.append(teil)
+        tokens += n
+    if gruppe:
+        gruppen.append(gruppe)
+    ergebnisse = pool.map(lambda g: _fasse_abschnitt_zusammen("\n".join(f"- {t}" for t in g), client), gruppen)
+    return [e for e in ergebnisse if e]
+
+def fasse_chat_zusammen(nachrichten, client=None, max_tokens=ZUSAMMENFASSUNG_CHUNK_TOKENS, pool=None):
+    """
+    Map-Reduce über den ganzen Thread: Abschnitte mit max_tokens parallel zusammenfassen, dann verdichten.
+    Die Abschnitte laufen immer vom Anfang los – wächst ein Chat, sind die vorderen Prompts identisch
+    und kommen aus dem LLM-Cache; nur die neuen Abschnitte am Ende kosten Inferenz.
+    """
+    client = client or hole_client()
+    pool = pool or _abschnitt_pool
+    abschnitte = erzeuge_chunks(nachrichten, max_tokens=max_tokens, overlap_tokens=0)
+    if not abschnitte:
+        return "[Noch keine LLM-Zusammenfassung]"
+    if len(abschnitte) == 1:
+        return generiere_zusammenfassung(abschnitte[0], client, max_zeichen=None)
+
+    teile = [t for t in pool.map(lambda a: _fasse_abschnitt_zusammen(a, client), abschnitte) if t]
+    if not teile:
+        return ZUSAMMENFASSUNG_FEHLGESCHLAGEN
+
+    for _ in range(MAX_REDUKTIONS_RUNDEN):
+        if len(teile) <= 1 or zaehle_tokens("\n".join(teile)) <= max_tokens:
+            break
+        teile = _verdichte(teile, client, max_tokens, pool, abschliessend=False) or teile[:1]
+    return _verdichte(teile, client, max_tokens, pool, abschliessend=True)
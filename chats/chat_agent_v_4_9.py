@@ -2,17 +2,18 @@
 # Weiterentwickelte Version basierend auf V4.7 mit intelligenterer Behandlung von manuellen und LLM-Kategorien
 
 import json
-import subprocess
 import pymysql
 from datetime import datetime
 import pandas as pd
 import re
 from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import OllamaEmbeddings
-from sentence_transformers import SentenceTransformer
-from langchain.embeddings import HuggingFaceEmbeddings
 from langchain_core.documents import Document
 import os
+from agent.chat_loader import lade_json_stream
+from agent.konversation import linearisiere_chat
+from agent.zusammenfassen import get_chat_text
+from agent.llm_client import hole_client
+from agent.embedding_service import erzeuge_embedding_service, pruefe_index_info
 
 CHROMA_PATH = r"D:\Users\doman\Documents\OneDrive\Dokumente\Programmierung\Projekte\AiAgents\chats"
 SKIP_UNVERÄNDERTE_CHATS = False
@@ -21,19 +22,13 @@ vectordb = None
 
 
 def init_chroma():
-    model_name = "intfloat/e5-large-v2"
-    embeddings = HuggingFaceEmbeddings(
-    model_name=model_name,
-    model_kwargs={"device": "cpu"},  # oder "cuda" bei GPU
-    encode_kwargs={"normalize_embeddings": True}
-)
-    vectordb = Chroma(persist_directory=CHROMA_PATH, embedding_function=embeddings)
+    # Modell kommt aus agent/config.py (EMBEDDING_MODELL), Standard ist weiterhin e5-large-v2;
+    # Collection und Modellprüfung wie in agent/vectorstore.py, sonst landet ein anderes Modell in "langchain"
+    embeddings = erzeuge_embedding_service()
+    collection = pruefe_index_info(embeddings.name, embeddings.dimension)
+    vectordb = Chroma(collection_name=collection, persist_directory=CHROMA_PATH, embedding_function=embeddings)
     return vectordb
 
-def lade_json(pfad):
-    with open(pfad, "r", encoding="utf-8") as f:
-        return json.load(f)
-
 def lade_excel_chat_infos(pfad):
     df = pd.read_excel(pfad)
     return {str(row.iloc[0]).strip().lower(): str(row.iloc[1]).strip().lower()
@@ -92,30 +87,14 @@ def generiere_kategorievorschlag(text, kategorien_liste):
         f"\nBitte keine Zeile mit N/A ausgeben"
     )
     try:
-        result = subprocess.run(
-            ["ollama", "run", "llama3", prompt],
-            capture_output=True,
-            text=True,
-            timeout=30,
-            encoding="utf-8",
-            errors="ignore"
-        )
-        return result.stdout.strip()
+        return hole_client().generiere(prompt)
     except Exception as e:
         return f"[Fehlgeschlagen: {e}]"
 
 def generiere_zusammenfassung(text):
     prompt = f"Fasse den folgenden Chat knapp zusammen (max. 3 Sätze):\n\n{text[:2000]}"
     try:
-        result = subprocess.run(
-            ["ollama", "run", "llama3", prompt],
-            capture_output=True,
-            text=True,
-            timeout=30,
-            encoding="utf-8",
-            errors="ignore"
-        )
-        return result.stdout.strip()
+        return hole_client().generiere(prompt)
     except Exception as e:
         return "[Zusammenfassung fehlgeschlagen]"
 
@@ -130,9 +109,9 @@ def braucht_llm_kategorisierung(chat_id, cursor):
 def verarbeite_chat(chat, kategorien, stichwort_mapping, cursor):
     chat_id = chat.get("id")
     titel = chat.get("title", "")[:255].strip()
-    messages = list(chat.get("mapping", {}).values())
+    nachrichten = linearisiere_chat(chat)
     erstellt_am = datetime.fromtimestamp(chat.get("create_time", 0))
-    message_count = len(messages)
+    message_count = len(nachrichten)
     letzte_aenderung = datetime.fromtimestamp(chat.get("update_time", 0))
     chat_link = f"https://chat.openai.com/c/{chat_id}"
 
@@ -143,17 +122,7 @@ def verarbeite_chat(chat, kategorien, stichwort_mapping, cursor):
             print(f"⏩ Chat '{titel}' wurde nicht verändert – übersprungen.")
             return
 
-    chat_text = "\n\n".join(
-        str(m["message"]["content"]["parts"][0])
-        for m in messages
-        if (
-            "message" in m and isinstance(m["message"], dict) and
-            "content" in m["message"] and isinstance(m["message"]["content"], dict) and
-            "parts" in m["message"]["content"] and
-            isinstance(m["message"]["content"]["parts"], list) and
-            m["message"]["content"]["parts"]
-        )
-    )[:3000]
+    chat_text = get_chat_text(nachrichten)
 
     inhalt = f"{titel}\n\n{chat_text}"
     kategorien_manuell = {}
@@ -244,19 +213,16 @@ def speichere_embedding(chat_id, title, summary, content, overwrite=True):
 
 
 def main():
-    embeddings = OllamaEmbeddings(model="bge-m3")
-    embedding = embeddings.embed_query("test")
-    print("✅ Modell geladen und einsatzbereit.")
     global vectordb
     vectordb = init_chroma()
-    daten = lade_json("conversations.json")
+    daten = lade_json_stream("conversations.json")
     stichwort_mapping = lade_excel_chat_infos("chat_infos.xlsx")
     conn = verbinde_mit_datenbank()
     cursor = conn.cursor()
     kategorien = hole_kategorien(cursor)
 
     for i, chat in enumerate(daten):
-        print(f"\n\n🔄 Verarbeite Chat {i+1}/{len(daten)}: {chat.get('title', '')}")
+        print(f"\n\n🔄 Verarbeite Chat {i+1}: {chat.get('title', '')}")
         verarbeite_chat(chat, kategorien, stichwort_mapping, cursor)
 
     conn.commit()
@@ -0,0 +1,46 @@
+import config  # setzt den Pfad zu chats/agent
+from datenbank import erzeuge_db_verbindung
+from agent.db_writer import speichere_chat_detail
+import hashlib
+import json
+
+# Detailansicht /chat/<id> – bewusst ohne Embedding-/Chroma-Abhängigkeiten (nur Datenbank)
+
+def lade_aehnliche_chats(chat_id, cursor):
+    # Vorberechneter k-NN-Graph (agent/aehnliche_chats.py) – hier nur ein Lesezugriff;
+    # die Tabelle legt die Migration des Imports an (agent/migrationen.py)
+    cursor.execute(
+        "SELECT n.nachbar_id AS id, c.titel, n.aehnlichkeit, n.aktualisiert_am FROM chat_nachbarn n "
+        "JOIN chats c ON c.id = n.nachbar_id WHERE n.chat_id = %s ORDER BY n.rang",
+        (chat_id,)
+    )
+    return cursor.fetchall()
+
+def lade_chat_detail(chat_id):
+    """Materialisierter Detail-Datensatz aus chat_details + ähnliche Chats: {'chat', 'etag', 'geaendert'} oder None."""
+    connection = erzeuge_db_verbindung()
+
+    with connection:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT daten, etag, aktualisiert_am FROM chat_details WHERE chat_id = %s", (chat_id,))
+            row = cursor.fetchone()
+            if row:
+                chat, etag, geaendert = json.loads(row["daten"]), row["etag"], row["aktualisiert_am"]
+            else:
+                # Noch nicht materialisiert (Chat vor dem ersten Import mit Detail-Tabelle) – einmalig nachholen;
+                # die Tabelle selbst legt die Migration des Imports an (agent/migrationen.py)
+                detail = speichere_chat_detail(chat_id, cursor)
+                if detail is None:
+                    return None
+                connection.commit()
+                chat, etag, geaendert = detail
+            aehnliche = lade_aehnliche_chats(chat_id, cursor)
+
+    chat["aehnliche"] = [
+        {"id": a["id"], "titel": a["titel"], "aehnlichkeit": round(float(a["aehnlichkeit"]), 3)} for a in aehnliche
+    ]
+    # ETag/Last-Modified müssen auch neue Nachbarn abdecken
+    if aehnliche:
+        etag = hashlib.sha256((etag + json.dumps(chat["aehnliche"])).encode("utf-8")).hexdigest()
+        geaendert = max([geaendert] + [a["aktualisiert_am"] for a in aehnliche])
+    return {"chat": chat, "etag": etag, "geaendert": geaendert}
@@ -0,0 +1,19 @@
+import os
+import sys
+
+# Die Web-App nutzt Module aus chats/agent (Embedding-Service usw.) – übergeordneten Ordner in den Pfad
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+CHROMA_PATH = r"D:/Users/doman/Documents/OneDrive/Dokumente/Programmierung/Projekte/AiAgents/chats"
+
+# Muss auf dieselbe Datei zeigen wie agent/config.py – der Import schreibt sie nach jedem Lauf neu
+IMPORT_STAND_DATEI = os.path.join(CHROMA_PATH, "import_stand.txt")
+
+# Such-Cache (Query-Embeddings + Trefferlisten)
+SUCH_CACHE_GROESSE = 256
+SUCH_CACHE_TTL_SEKUNDEN = 15 * 60
+DETAIL_CACHE_GROESSE = 512
+
+# Pagination der Suche (HTML und JSON-API)
+SEITEN_GROESSE = 20
+MAX_SEITEN_GROESSE = 100
@@ -1,6 +1,15 @@
-import pymysql
+import config  # setzt den Pfad zu chats/agent
+from agent.config import DB_BACKEND
+from agent.speicher_sqlite import verbinde_sqlite
 
 def erzeuge_db_verbindung():
+    # Gleiches Backend wie der Import (CHAT_DB_BACKEND)
+    if DB_BACKEND == "sqlite":
+        return verbinde_sqlite()
+    # erst hier: im SQLite-Betrieb muss pymysql nicht installiert sein
+    import pymysql
+    import pymysql.cursors
+
     return pymysql.connect(
         host="127.0.0.1",
         user="chatuser",
@@ -1,11 +1,18 @@
-from sentence_transformers import SentenceTransformer, util
+import numpy as np
+import config  # setzt den Pfad zu chats/agent
+from agent.embedding_service import erzeuge_embedding_service
 
-# Modell laden (achte darauf, dass du das gleiche Modell verwendest wie beim Speichern!)
-model = SentenceTransformer('intfloat/e5-large-v2')
+# Gleicher Service wie beim Import (agent/config.py: EMBEDDING_MODELL), damit die Vektoren vergleichbar sind
+service = erzeuge_embedding_service()
 
-# Embedding-Relevanz berechnen
-def ermittle_embedding_relevanz(query, text):
-    query_embedding = model.encode(query, convert_to_tensor=True)
-    text_embedding = model.encode(text, convert_to_tensor=True)
-    score = util.cos_sim(query_embedding, text_embedding).item()
+def erzeuge_query_embedding(query):
+    return np.asarray(service.embed_query(query))
+
+# Embedding-Relevanz berechnen (Query-Embedding kann vorab berechnet/gecacht übergeben werden)
+def ermittle_embedding_relevanz(query, text, query_embedding=None):
+    if query_embedding is None:
+        query_embedding = erzeuge_query_embedding(query)
+    text_embedding = np.asarray(service.embed_query(text))
+    # beide Vektoren sind normalisiert -> Skalarprodukt = Kosinus-Ähnlichkeit
+    score = float(np.dot(query_embedding, text_embedding))
     return round(score, 3)
@@ -0,0 +1,18 @@
+# Produktivbetrieb (Linux):
+#   gunicorn -c gunicorn.conf.py webapp:app
+# Gleichzeitige Anfragen = WEB_WORKER Prozesse x WEB_THREADS Threads; die Views sind synchron,
+# Modell-, Chroma- und DB-Aufrufe blockieren nur ihren eigenen Thread.
+# Unter Windows gibt es kein fork – dort ein Prozess mit Threads:
+#   waitress-serve --threads=8 --port=8000 webapp:app
+import multiprocessing
+import os
+
+bind = os.environ.get("WEB_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_WORKER", min(4, multiprocessing.cpu_count())))
+threads = int(os.environ.get("WEB_THREADS", 4))
+worker_class = "gthread"
+timeout = 120
+
+# App (und damit das Embedding-Modell) einmal im Master laden; die Worker teilen den Speicher per fork.
+# Chroma und BM25 öffnet jeder Worker selbst (search_logic.hole_vectordb / hole_bm25).
+preload_app = True
@@ -1,19 +1,34 @@
+import config  # setzt den Pfad zu chats/agent
+from agent.stichwort_matcher import kategorie_matcher
+from suchcache import lese_import_stand
+
+# Alle Kategorienamen in einem Automaten; neu bauen, sobald ein Import (ggf. mit neuen Kategorien) committet hat
+_matcher = None
+_matcher_stand = None
+
+def hole_kategorie_matcher(cursor):
+    global _matcher, _matcher_stand
+    stand = lese_import_stand()
+    if _matcher is None or stand != _matcher_stand:
+        cursor.execute("SELECT id, name FROM kategorien")
+        # wie bisher Teilwort-Treffer (name in query), ohne Wortgrenzen
+        _matcher = kategorie_matcher({row['name'].lower(): row['id'] for row in cursor.fetchall()}, wortgrenzen=False)
+        _matcher_stand = stand
+    return _matcher
+
 def ermittle_kategorien_relevanz(chat_id, query, cursor):
+    # Welche Kategorien nennt die Query? Ohne Treffer braucht es die Pivot-Tabelle gar nicht
+    gesuchte = hole_kategorie_matcher(cursor).werte(query)
+    if not gesuchte:
+        return 0.0
+
     # Hole die Kategorien und Relevanzwerte aus der Pivot-Tabelle
-    sql = '''
-        SELECT k.name, ck.relevanz
-        FROM chat_kategorien ck
-        JOIN kategorien k ON ck.kategorie_id = k.id
-        WHERE ck.chat_id = %s
-    '''
-    cursor.execute(sql, (chat_id,))
-    kategorien = cursor.fetchall()
+    cursor.execute("SELECT kategorie_id, relevanz FROM chat_kategorien WHERE chat_id = %s", (chat_id,))
 
     # Bonuspunkte je nach Relevanz und Query-Keyword-Übereinstimmung
     bonus = 0.0
-    for eintrag in kategorien:
-        name = eintrag['name'].lower()
-        if name in query.lower():
-            bonus += float(eintrag['relevanz']) * 0.2  # Gewichtung ggf. anpassen
+    for eintrag in cursor.fetchall():
+        if eintrag['kategorie_id'] in gesuchte:
+            bonus += float(eintrag['relevanz']) / 100 * 0.2  # Relevanz 0-100 -> 0-1, Gewichtung ggf. anpassen
 
     return round(bonus, 3)
@@ -1,21 +1,93 @@
-from embeddings import ermittle_embedding_relevanz
+import config  # setzt den Pfad zu chats/agent
+from embeddings import erzeuge_query_embedding
 from kategorien_logik import ermittle_kategorien_relevanz
 from datenbank import erzeuge_db_verbindung
-import pymysql
+from suchcache import normalisiere_query, query_embedding_cache, ergebnis_cache, lese_import_stand
+from agent.vectorstore import init_chroma
+from agent.bm25_index import BM25Index
+from agent.speicher_sqlite import VolltextIndex
+from agent.config import DB_BACKEND
+from agent.hybrid_suche import suche_hybrid
+from config import SEITEN_GROESSE
+import math
+import os
+import threading
+
+MAX_KANDIDATEN = 50
+
+# Das Embedding-Modell wird beim Import geladen (mit gunicorn --preload einmal für alle Worker).
+# Chroma (SQLite) erst im jeweiligen Prozess öffnen – Verbindungen überleben keinen fork.
+_vectordb = None
+_vectordb_pid = None
+_vectordb_lock = threading.Lock()
+_bm25 = None
+_bm25_stand = None
+
+def hole_vectordb():
+    global _vectordb, _vectordb_pid
+    with _vectordb_lock:
+        if _vectordb is None or _vectordb_pid != os.getpid():
+            _vectordb = init_chroma()
+            _vectordb_pid = os.getpid()
+        return _vectordb
+
+def hole_bm25():
+    global _bm25, _bm25_stand
+    if DB_BACKEND == "sqlite":
+        # FTS5 liest immer den aktuellen Stand der Datenbank – kein Neuladen nach Importen nötig
+        if _bm25 is None:
+            _bm25 = VolltextIndex()
+        return _bm25
+    stand = lese_import_stand()
+    if _bm25 is None or stand != _bm25_stand:
+        _bm25 = BM25Index()
+        _bm25_stand = stand
+    return _bm25
+
+def hole_query_embedding(suchtext):
+    schluessel = normalisiere_query(suchtext)
+    query_embedding = query_embedding_cache.hole(schluessel)
+    if query_embedding is None:
+        query_embedding = erzeuge_query_embedding(f"query: {schluessel}")
+        query_embedding_cache.speichere(schluessel, query_embedding)
+    return query_embedding
 
 def suche_chats(suchtext):
+    # Wiederholte Suchen direkt aus dem Cache beantworten (wird nach jedem Import verworfen)
+    schluessel = normalisiere_query(suchtext)
+    gecacht = ergebnis_cache.hole(schluessel)
+    if gecacht is not None:
+        return gecacht
+
+    suchtext = schluessel
+    query_embedding = hole_query_embedding(suchtext)
+
+    # Kandidaten aus Vektor-Index + BM25 (RRF), statt jede Zusammenfassung pro Suche neu zu encoden
+    kandidaten = suche_hybrid(suchtext, hole_vectordb(), hole_bm25(), k=MAX_KANDIDATEN, query_embedding=query_embedding)
+    if not kandidaten:
+        ergebnis_cache.speichere(schluessel, [])
+        return []
+
     connection = erzeuge_db_verbindung()
-    cursor = connection.cursor(pymysql.cursors.DictCursor)
+    cursor = connection.cursor()  # DictCursor ist bei beiden Backends voreingestellt
 
-    cursor.execute("SELECT * FROM chats")
-    chats = cursor.fetchall()
+    platzhalter = ", ".join(["%s"] * len(kandidaten))
+    # Duplikate nie anzeigen, auch falls ihr Vektor noch aus einem älteren Import in Chroma liegt
+    cursor.execute(f"SELECT id, chat_id, titel, zusammenfassung FROM chats WHERE chat_id IN ({platzhalter}) "
+                   f"AND duplikat_von IS NULL", [k['chat_id'] for k in kandidaten])
+    chats = {row['chat_id']: row for row in cursor.fetchall()}
 
     relevanz_treffer = []
-    for chat in chats:
-        embedding_relevanz = ermittle_embedding_relevanz(suchtext, chat['zusammenfassung'])
-        kategorien_relevanz = ermittle_kategorien_relevanz(suchtext, chat['id'], cursor)
-        keyword_bonus = ermittle_keyword_bonus(suchtext, chat['zusammenfassung'], chat['titel'])
+    for kandidat in kandidaten:
+        chat = chats.get(kandidat['chat_id'])
+        if not chat:
+            continue
+        # embedding_relevanz ist auch für reine BM25-Treffer die echte Kosinus-Ähnlichkeit (suche_hybrid)
+        embedding_relevanz = kandidat['embedding_relevanz']
+        kategorien_relevanz = ermittle_kategorien_relevanz(chat['id'], suchtext, cursor)
+        keyword_bonus = kandidat['keyword_relevanz']
 
+        # Die Mindestrelevanz filtert nur aus, die Reihenfolge kommt aus der RRF-Fusion
         gesamt_relevanz = 0.7 * embedding_relevanz + 0.2 * kategorien_relevanz + 0.1 * keyword_bonus
 
         if gesamt_relevanz >= 0.36:
@@ -23,47 +95,29 @@ def suche_chats(suchtext):
                 'id': chat['id'],
                 'titel': chat['titel'],
                 'zusammenfassung': chat['zusammenfassung'],
-                'gesamt_relevanz': round(gesamt_relevanz, 3)
+                'score': kandidat['score'],
+                'gesamt_relevanz': round(gesamt_relevanz, 3),
+                'embedding_relevanz': embedding_relevanz,
+                'keyword_bonus': keyword_bonus,
             })
 
-    relevanz_treffer.sort(key=lambda x: x['gesamt_relevanz'], reverse=True)
+    relevanz_treffer.sort(key=lambda x: (x['score'], x['gesamt_relevanz']), reverse=True)
+    cursor.close()
+    connection.close()
+    ergebnis_cache.speichere(schluessel, relevanz_treffer)
     return relevanz_treffer
 
-def ermittle_keyword_bonus(suchtext, *texte):
-    bonus = 0
-    for text in texte:
-        if suchtext.lower() in text.lower():
-            bonus += 0.1
-    return min(bonus, 1.0)
-
-
-
-def lade_chat_detail(chat_id):
-    connection = erzeuge_db_verbindung()
-
-    with connection:
-        with connection.cursor() as cursor:
-            # Lade Chat-Grunddaten
-            cursor.execute("SELECT id, titel, zusammenfassung, inhalt FROM chats WHERE id = %s", (chat_id,))
-            chat = cursor.fetchone()
-
-            if not chat:
-                return {
-                    "id": chat_id,
-                    "titel": "Nicht gefunden",
-                    "zusammenfassung": "",
-                    "inhalt": "Dieser Chat konnte nicht gefunden werden.",
-                    "kategorien": []
-                }
-
-            # Lade zugehörige Kategorien
-            cursor.execute("""
-                SELECT k.titel FROM kategorien k
-                JOIN chat_kategorien ck ON k.id = ck.kategorie_id
-                WHERE ck.chat_id = %s
-            """, (chat_id,))
-            kategorien = [row["titel"] for row in cursor.fetchall()]
-            chat["kategorien"] = kategorien
-
-    return chat
 
+def hole_seite(suchtext, seite=1, seiten_groesse=SEITEN_GROESSE):
+    # Die komplette Trefferliste liegt im Ergebnis-Cache – weitere Seiten kosten keine neue Suche
+    treffer = suche_chats(suchtext)
+    seiten = max(1, math.ceil(len(treffer) / seiten_groesse))
+    start = (seite - 1) * seiten_groesse
+    return {
+        'query': normalisiere_query(suchtext),
+        'seite': seite,
+        'seiten': seiten,
+        'seiten_groesse': seiten_groesse,
+        'gesamt': len(treffer),
+        'treffer': treffer[start:start + seiten_groesse],
+    }
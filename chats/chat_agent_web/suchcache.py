@@ -0,0 +1,83 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from config import IMPORT_STAND_DATEI, SUCH_CACHE_GROESSE, SUCH_CACHE_TTL_SEKUNDEN, DETAIL_CACHE_GROESSE
+
+
+def normalisiere_query(query):
+    """Kleinschreibung + zusammengefasste Leerzeichen, damit 'Roboter  Akku' und 'roboter akku' denselben Eintrag treffen."""
+    return re.sub(r"\s+", " ", (query or "").strip().lower())
+
+
+def lese_import_stand(pfad=IMPORT_STAND_DATEI):
+    """Ändert sich, sobald der Import neue Chats/Kategorien committet hat."""
+    if not pfad:
+        return None
+    try:
+        st = os.stat(pfad)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+class LRUCache:
+    """
+    Einfacher thread-sicherer LRU-Cache mit Größenlimit und TTL.
+    Ändert sich die Import-Stand-Datei (neue Chats/Kategorien), wird der Cache komplett verworfen.
+    """
+
+    def __init__(self, max_eintraege=SUCH_CACHE_GROESSE, ttl_sekunden=SUCH_CACHE_TTL_SEKUNDEN,
+                 stand_datei=IMPORT_STAND_DATEI):
+        self.max_eintraege = max_eintraege
+        self.ttl_sekunden = ttl_sekunden
+        self.stand_datei = stand_datei
+        self._daten = OrderedDict()
+        self._lock = threading.Lock()
+        self._stand = self._lese_stand()
+
+    def _lese_stand(self):
+        return lese_import_stand(self.stand_datei)
+
+    def _pruefe_stand(self):
+        stand = self._lese_stand()
+        if stand != self._stand:
+            self._daten.clear()
+            self._stand = stand
+
+    def hole(self, schluessel):
+        with self._lock:
+            self._pruefe_stand()
+            eintrag = self._daten.get(schluessel)
+            if eintrag is None:
+                return None
+            zeitpunkt, wert = eintrag
+            if time.monotonic() - zeitpunkt > self.ttl_sekunden:
+                del self._daten[schluessel]
+                return None
+            self._daten.move_to_end(schluessel)
+            return wert
+
+    def speichere(self, schluessel, wert):
+        with self._lock:
+            self._pruefe_stand()
+            self._daten[schluessel] = (time.monotonic(), wert)
+            self._daten.move_to_end(schluessel)
+            while len(self._daten) > self.max_eintraege:
+                self._daten.popitem(last=False)
+
+    def leeren(self):
+        with self._lock:
+            self._daten.clear()
+
+    def __len__(self):
+        return len(self._daten)
+
+
+# Gemeinsame Instanzen für die Web-Suche
+query_embedding_cache = LRUCache()
+ergebnis_cache = LRUCache()
+# Fertig gerenderte Detailseiten (HTML + ETag + Last-Modified)
+detail_cache = LRUCache(max_eintraege=DETAIL_CACHE_GROESSE)
@@ -1,23 +1,56 @@
-from flask import Flask, render_template, request
-from search_logic import suche_chats
+from flask import Flask, jsonify, make_response, render_template, request
+from config import SEITEN_GROESSE, MAX_SEITEN_GROESSE
+from search_logic import hole_seite
+from chat_detail import lade_chat_detail
+from suchcache import detail_cache
 
+# Normale (synchrone) Views: parallele Anfragen kommen von den Worker-Threads des Servers
+# (gunicorn gthread bzw. waitress, siehe gunicorn.conf.py), nicht von einem eigenen Pool
 app = Flask(__name__)
 
+def lies_seite():
+    seite = request.args.get('page', 1, type=int) or 1
+    seiten_groesse = request.args.get('page_size', SEITEN_GROESSE, type=int) or SEITEN_GROESSE
+    return max(1, seite), min(max(1, seiten_groesse), MAX_SEITEN_GROESSE)
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
-    suchergebnisse = []
-    query = ''
-    if request.method == 'POST':
-        query = request.form['query']
-        suchergebnisse = suche_chats(query)
-    return render_template('index.html', suchergebnisse=suchergebnisse, query=query)
+    query = request.form.get('query', '') if request.method == 'POST' else request.args.get('q', '')
+    seite, seiten_groesse = lies_seite()
+    ergebnis = None
+    if query.strip():
+        ergebnis = hole_seite(query, seite, seiten_groesse)
+    suchergebnisse = ergebnis['treffer'] if ergebnis else []
+    return render_template('index.html', suchergebnisse=suchergebnisse, query=query, ergebnis=ergebnis)
+
+@app.route('/api/search')
+def api_search():
+    query = request.args.get('q', '')
+    if not query.strip():
+        return jsonify({'fehler': "Parameter 'q' fehlt"}), 400
+    seite, seiten_groesse = lies_seite()
+    return jsonify(hole_seite(query, seite, seiten_groesse))
 
-@app.route('/chat/<string:chat_id>')
+@app.route('/chat/<int:chat_id>')
 def chat_detail(chat_id):
-    # Diese Funktion lädt aus der DB den vollständigen Inhalt zum Chat
-    from search_logic import lade_chat_detail
-    chat = lade_chat_detail(chat_id)
-    return render_template('detail.html', chat=chat)
+    # Gerenderte Seite aus dem Cache; der wird nach jedem Import (Stand-Marker) verworfen
+    eintrag = detail_cache.hole(chat_id)
+    if eintrag is None:
+        detail = lade_chat_detail(chat_id)
+        if detail is None:
+            return render_template('detail.html', chat=None), 404
+        eintrag = {
+            'html': render_template('detail.html', chat=detail['chat']),
+            'etag': detail['etag'],
+            'geaendert': detail['geaendert'],
+        }
+        detail_cache.speichere(chat_id, eintrag)
+
+    antwort = make_response(eintrag['html'])
+    antwort.set_etag(eintrag['etag'])
+    antwort.last_modified = eintrag['geaendert']
+    antwort.cache_control.no_cache = True  # Browser fragt per If-None-Match nach, bekommt meist 304
+    return antwort.make_conditional(request)
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    app.run(debug=True, threaded=True)
@@ -1,42 +1,39 @@
 
 import pandas as pd
-import pymysql
+from agent.stichwort_matcher import StichwortMatcher
+from agent.db_writer import verbinde_mit_datenbank
+from agent.speicher_sqlite import ist_sqlite
 
 # 📥 Excel-Datei mit Zuordnung (Suchbegriff → Kategorie) laden
 df_infos = pd.read_excel("chat_infos.xlsx")
 
-# 🔧 Verbindung zur MySQL-Datenbank über PyMySQL
-conn = pymysql.connect(
-    host="127.0.0.1",
-    user="chatuser",
-    password="chatpass",
-    database="gptchats",
-    charset="utf8mb4",
-    cursorclass=pymysql.cursors.DictCursor
-)
+# 🔧 Verbindung zur Datenbank (MySQL oder SQLite, je nach CHAT_DB_BACKEND)
+conn = verbinde_mit_datenbank()
 cursor = conn.cursor()
+einfuegen = "INSERT OR IGNORE" if ist_sqlite(cursor) else "INSERT IGNORE"
 
 # Alle Chats holen
 cursor.execute("SELECT id, titel FROM chats")
 chat_records = cursor.fetchall()
-chat_map = {titel.lower(): chat_id for chat_id, titel in chat_records}
 
 # Alle Kategorien holen
 cursor.execute("SELECT id, name FROM kategorien")
 kat_records = cursor.fetchall()
-kat_map = {name.lower(): kat_id for kat_id, name in kat_records}
+kat_map = {row["name"].lower(): row["id"] for row in kat_records}
 
-# Kategorien vorschlagen anhand von Teil-Treffern im Titel
-zuordnungen = []
+# Alle Suchbegriffe einmal in einen Automaten – pro Titel ein Durchlauf statt Excel-Zeilen × Titel
+matcher = StichwortMatcher()
 for index, row in df_infos.iterrows():
-    suchbegriff = str(row[0]).strip().lower()
-    kategoriename = str(row[1]).strip().lower()
+    suchbegriff = str(row.iloc[0]).strip().lower()
+    kategorie_id = kat_map.get(str(row.iloc[1]).strip().lower())
+    if kategorie_id:
+        matcher.fuege_hinzu(suchbegriff, kategorie_id, wortgrenzen=False)
 
-    for titel, chat_id in chat_map.items():
-        if suchbegriff in titel:
-            kategorie_id = kat_map.get(kategoriename)
-            if kategorie_id:
-                zuordnungen.append((chat_id, kategorie_id, 3))  # Relevanz = 3 (Standard)
+# Kategorien vorschlagen anhand von Teil-Treffern im Titel
+zuordnungen = []
+for chat in chat_records:
+    for kategorie_id in matcher.werte(chat["titel"] or ""):
+        zuordnungen.append((chat["id"], kategorie_id, 60))  # Relevanz = 60 (Standard, früher 3/5)
 
 # Duplikate entfernen
 zuordnungen = list(set(zuordnungen))
@@ -44,11 +41,11 @@ zuordnungen = list(set(zuordnungen))
 # In chat_kategorien eintragen
 for chat_id, kategorie_id, relevanz in zuordnungen:
     cursor.execute(
-        "INSERT IGNORE INTO chat_kategorien (chat_id, kategorie_id, relevanz) VALUES (%s, %s, %s)",
+        f"{einfuegen} INTO chat_kategorien (chat_id, kategorie_id, relevanz) VALUES (%s, %s, %s)",
         (chat_id, kategorie_id, relevanz)
     )
 
 conn.commit()
-print("✅ Kategorievorschläge erfolgreich eingetragen (mit PyMySQL).")
+print("✅ Kategorievorschläge erfolgreich eingetragen.")
 cursor.close()
 conn.close()
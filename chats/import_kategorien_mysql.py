@@ -1,18 +1,13 @@
 
 import pandas as pd
 #import mysql.connector
-import pymysql
+from agent.db_writer import markiere_import_stand, verbinde_mit_datenbank
+from agent.speicher_sqlite import ist_sqlite
 
-# 🔧 Verbindung zur MySQL-Datenbank
-conn = pymysql.connect(
-    host="127.0.0.1",
-    user="chatuser",
-    password="chatpass",
-    database="gptchats",
-    charset="utf8mb4",
-    cursorclass=pymysql.cursors.DictCursor
-)
+# 🔧 Verbindung zur Datenbank (MySQL oder SQLite, je nach CHAT_DB_BACKEND)
+conn = verbinde_mit_datenbank()
 cursor = conn.cursor()
+einfuegen = "INSERT OR IGNORE" if ist_sqlite(cursor) else "INSERT IGNORE"
 
 # 📥 Kategorien aus Excel einlesen
 df_kategorien = pd.read_excel("chat_kategorien.xlsx")
@@ -20,10 +15,11 @@ df_kategorien = pd.read_excel("chat_kategorien.xlsx")
 # 🚀 Kategorien einfügen
 for name in df_kategorien.iloc[:, 0].dropna().unique():
     cursor.execute(
-        "INSERT IGNORE INTO kategorien (name) VALUES (%s)", (name,)
+        f"{einfuegen} INTO kategorien (name) VALUES (%s)", (name,)
     )
 
 conn.commit()
+markiere_import_stand()
 print("✅ Kategorien erfolgreich importiert.")
 cursor.close()
 conn.close()
@@ -1,29 +1,22 @@
-from langchain_chroma import Chroma
-from langchain.embeddings import HuggingFaceEmbeddings
 import pymysql
 import os
+from agent.vectorstore import init_chroma
+from agent.bm25_index import BM25Index
+from agent.hybrid_suche import suche_hybrid
 
 # === 1. Konfiguration ===
-CHROMA_DB_PATH = r"D:\\Users\\doman\\Documents\\OneDrive\\Dokumente\\Programmierung\\Projekte\\AiAgents\\chats"
 RELEVANZ_THRESHOLD = 0.36
 KEYWORD_BONUS_MAX = 0.3
 GEWICHT_EMBEDDING = 0.6
 GEWICHT_KEYWORD = 0.4
 GEWICHT_KATEGORIE = 0.25
-TITEL_WEIGHT = 1.5  # Gewichtung für Treffer im Titel
+# TITEL_WEIGHT (Gewichtung für Treffer im Titel) steckt jetzt im BM25-Index, siehe agent/config.py
+ANZAHL_TREFFER = 15
+CHUNK_POOLING = "max"  # "max" oder "mean"
 
-# === 2. Embedding-Funktion ===
-embedding_function = HuggingFaceEmbeddings(
-    model_name="intfloat/e5-large-v2",
-    model_kwargs={"device": "cpu"},
-    encode_kwargs={"normalize_embeddings": True}
-)
-
-# === 3. Vektordatenbank laden ===
-vectordb = Chroma(
-    persist_directory=CHROMA_DB_PATH,
-    embedding_function=embedding_function
-)
+# === 2./3. Embedding-Modell + Vektordatenbank (Modell/Pfad aus agent/config.py) ===
+vectordb = init_chroma()
+bm25 = BM25Index()
 
 def verbinde_mit_datenbank():
     return pymysql.connect(
@@ -86,7 +79,6 @@ if not user_input:
     exit()
 
 suchwoerter = user_input.lower().split()
-anzahl_woerter = len(suchwoerter)
 
 # === 5. Embedding-Suche durchführen ===
 # Kategorie-Relevanz vorbereiten
@@ -102,32 +94,19 @@ for row in cursor.fetchall():
     kat_by_chat.setdefault(cid, []).append(eintrag)
 
 print("\n🔍 Debug-Ausgabe für kombinierte Relevanz (mit gewichteten Keywords):\n")
-results = vectordb.similarity_search_with_score(query, k=15)
+# Vektor- und BM25-Treffer per Reciprocal-Rank-Fusion zusammengeführt (Keyword-Score = Index-Lookup statt Textscan)
+results = suche_hybrid(user_input, vectordb, bm25, k=ANZAHL_TREFFER, pooling=CHUNK_POOLING)
 
 anzeige_liste = []
 
-for i, (doc, score) in enumerate(results, 1):
-    if not isinstance(score, float):
-        continue
-
-    embedding_relevanz = 1 - score
-    title = doc.metadata.get("title", "").lower()  
-    chat_id = doc.metadata.get("chat_id", "keine chat_id").lower()      
-    inhalt = doc.page_content.lower()
+for i, treffer in enumerate(results, 1):
+    embedding_relevanz = treffer["embedding_relevanz"]
+    title = treffer["titel"].lower()
+    chat_id = treffer["chat_id"].lower()
 
-    keyword_score = 0.0
-    for wort in suchwoerter:
-        if wort in title:
-            keyword_score += TITEL_WEIGHT
-        elif wort in inhalt:
-            keyword_score += 1.0
+    # BM25 relativ zum besten Keyword-Treffer (0..1)
+    keyword_bonus = treffer["keyword_relevanz"] * KEYWORD_BONUS_MAX
 
-    # Normieren auf max mögliche Punktzahl (TITEL_WEIGHT * anzahl_woerter)
-    max_score = TITEL_WEIGHT * anzahl_woerter
-    keyword_ratio = min(keyword_score / max_score, 1.0) if anzahl_woerter > 0 else 0
-    keyword_bonus = keyword_ratio * KEYWORD_BONUS_MAX
-
-    
     # Kategorie-Relevanz berechnen
     kategorie_score = kategorie_match_score(chat_id, set(suchwoerter), kat_by_chat)
     kategorie_bonus = kategorie_score * GEWICHT_KATEGORIE
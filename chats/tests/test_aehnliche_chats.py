@@ -0,0 +1,130 @@
+"""
+k-NN-Graph "ähnliche Chats" (agent/aehnliche_chats.py): blockweises top_k gegen Brute Force und
+inkrementelle Aktualisierung von chat_nachbarn gegen eine Vollberechnung – auf SQLite.
+
+    cd chats && python -m pytest -q tests
+"""
+import contextlib
+import io
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.aehnliche_chats import top_k, aktualisiere_nachbarn
+from agent.db_writer import insert_update_chats
+from agent.speicher_sqlite import SQLiteVerbindung
+
+
+def brute_force(matrix, zeilen, k, spalten=None):
+    spalten = list(range(len(matrix))) if spalten is None else list(spalten)
+    ergebnis = {}
+    for z in zeilen:
+        scores = sorted(((s, float(matrix[z] @ matrix[s])) for s in spalten if s != z), key=lambda x: -x[1])
+        ergebnis[z] = scores[:k]
+    return ergebnis
+
+
+def normiert(zeilen, spalten, seed):
+    matrix = np.random.default_rng(seed).normal(size=(zeilen, spalten)).astype(np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+class TopKTest(unittest.TestCase):
+    def setUp(self):
+        self.matrix = normiert(37, 8, seed=1)
+
+    def pruefe_gleich(self, ist, soll):
+        self.assertEqual(set(ist), set(soll))
+        for zeile in soll:
+            self.assertEqual([s for s, _ in ist[zeile]], [s for s, _ in soll[zeile]])
+            np.testing.assert_allclose([a for _, a in ist[zeile]], [a for _, a in soll[zeile]], atol=1e-6)
+
+    def test_blockweise_wie_brute_force(self):
+        zeilen = list(range(37))
+        soll = brute_force(self.matrix, zeilen, 5)
+        for block in (1, 4, 37, 100):
+            self.pruefe_gleich(top_k(self.matrix, zeilen, k=5, block=block), soll)
+
+    def test_nur_ausgewaehlte_spalten(self):
+        zeilen, spalten = [0, 3, 5, 20], [3, 7, 11, 20, 30]
+        # Zeile 3 und 20 sind selbst Kandidaten und dürfen sich nicht finden
+        self.pruefe_gleich(top_k(self.matrix, zeilen, k=3, block=2, spalten=spalten),
+                           brute_force(self.matrix, zeilen, 3, spalten))
+
+    def test_k_groesser_als_kandidaten(self):
+        ergebnis = top_k(self.matrix, [0, 1], k=10, spalten=[0, 1, 2])
+        self.assertEqual(sorted(s for s, _ in ergebnis[0]), [1, 2])   # ohne sich selbst
+        self.assertEqual(top_k(self.matrix, [0], k=3, spalten=[]), {0: []})
+
+
+class VektorErsatz:
+    """vectordb.get() wie Chroma, nur die Zusammenfassungs-Dokumente."""
+
+    def __init__(self):
+        self.embeddings = {}
+
+    def get(self, include=None, **kwargs):
+        chat_ids = list(self.embeddings)
+        return {"ids": chat_ids, "embeddings": [self.embeddings[c] for c in chat_ids],
+                "metadatas": [{"chat_id": c, "art": "zusammenfassung"} for c in chat_ids]}
+
+
+class NachbarGraphTest(unittest.TestCase):
+    K = 4
+
+    def setUp(self):
+        self.conn = SQLiteVerbindung(":memory:")
+        self.cursor = self.conn.cursor()
+        self.vectordb = VektorErsatz()
+        for i, vektor in enumerate(normiert(20, 6, seed=2)):
+            self.lege_an(f"c{i}", vektor)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def lege_an(self, chat_id, vektor):
+        insert_update_chats(chat_id, chat_id, "2024-01-01 10:00:00", "2024-01-01 10:00:00", 1,
+                            f"https://chatgpt.com/c/{chat_id}", "", self.cursor, "h")
+        self.vectordb.embeddings[chat_id] = [float(x) for x in vektor]
+
+    def aktualisiere(self, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return aktualisiere_nachbarn(self.cursor, self.vectordb, k=self.K, **kwargs)
+
+    def graph(self):
+        self.cursor.execute("SELECT chat_id, rang, nachbar_id, aehnlichkeit FROM chat_nachbarn ORDER BY chat_id, rang")
+        graph = {}
+        for row in self.cursor.fetchall():
+            graph.setdefault(row["chat_id"], []).append((row["nachbar_id"], round(float(row["aehnlichkeit"]), 4)))
+        return graph
+
+    def test_inkrementell_wie_vollberechnung(self):
+        self.assertEqual(self.aktualisiere(voll=True), 20)
+        self.assertTrue(all(len(liste) == self.K for liste in self.graph().values()))
+
+        # neuer Chat, ein geänderter Chat und ein neues Duplikat
+        rng = np.random.default_rng(3)
+        self.lege_an("neu", self.vectordb.embeddings["c5"] + rng.normal(scale=0.05, size=6))
+        self.vectordb.embeddings["c7"] = [float(x) for x in rng.normal(size=6)]
+        self.cursor.execute("UPDATE chats SET duplikat_von = %s WHERE chat_id = %s", ("c0", "c1"))
+
+        aktualisiert = self.aktualisiere(geaenderte_chat_ids=["neu", "c7"])
+        inkrementell = self.graph()
+        self.assertLess(aktualisiert, 21)   # nicht alles neu gerechnet
+        self.aktualisiere(voll=True)
+        self.assertEqual(inkrementell, self.graph())
+
+        self.cursor.execute("SELECT id FROM chats WHERE chat_id = %s", ("c1",))
+        self.assertNotIn(self.cursor.fetchone()["id"], inkrementell)
+
+    def test_ohne_embeddings_nichts_zu_tun(self):
+        self.vectordb.embeddings = {}
+        self.assertEqual(self.aktualisiere(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+"""
+Chunking langer Chats (agent/chunking.py) und Chunk-Dokumente mit IDs chat_id#n (agent/vectorstore.py).
+Die Prüfungen gelten für tiktoken ebenso wie für die Wort-Näherung ohne tiktoken.
+
+    cd chats && python -m pytest -q tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+
+from agent.chunking import erzeuge_chunks, aggregiere_chunk_treffer, zaehle_tokens
+from agent.vectorstore import erzeuge_chunk_dokumente
+
+
+def nachrichten(anzahl):
+    return [{"rolle": "user" if i % 2 == 0 else "assistant", "text": " ".join(f"wort{i}x{j}" for j in range(20))}
+            for i in range(anzahl)]
+
+
+class ChunkingTest(unittest.TestCase):
+    def test_chunks_sind_begrenzt_und_decken_den_text_ab(self):
+        verlauf = nachrichten(10)
+        chunks = erzeuge_chunks(verlauf, max_tokens=40, overlap_tokens=10)
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(zaehle_tokens(chunk), 40)
+        self.assertTrue(chunks[0].startswith("user: wort0x0"))
+        self.assertTrue(chunks[-1].endswith("wort9x19"))
+
+    def test_kurzer_chat_ein_chunk_leerer_keiner(self):
+        verlauf = [{"rolle": "user", "text": "hallo"}]
+        self.assertEqual(erzeuge_chunks(verlauf, max_tokens=40, overlap_tokens=10), ["user: hallo"])
+        self.assertEqual(erzeuge_chunks([], max_tokens=40, overlap_tokens=10), [])
+
+    def test_benachbarte_chunks_ueberlappen(self):
+        chunks = erzeuge_chunks(nachrichten(10), max_tokens=40, overlap_tokens=10)
+        for vorher, nachher in zip(chunks, chunks[1:]):
+            # das vorletzte Wort (das letzte kann angeschnitten sein) steht auch am Anfang des nächsten Chunks
+            self.assertIn(vorher.split()[-2], nachher.split()[:10])
+
+    def test_wachsender_chat_behaelt_die_vorderen_chunks(self):
+        kurz = erzeuge_chunks(nachrichten(6), max_tokens=40, overlap_tokens=10)
+        lang = erzeuge_chunks(nachrichten(12), max_tokens=40, overlap_tokens=10)
+        # bis auf den letzten (angeschnittenen) Chunk identisch -> gleiche Hashes, kein neues Embedding
+        self.assertEqual(lang[:len(kurz) - 1], kurz[:-1])
+
+    def test_overlap_muss_kleiner_als_fenster_sein(self):
+        with self.assertRaises(ValueError):
+            erzeuge_chunks(nachrichten(1), max_tokens=10, overlap_tokens=10)
+
+    def test_chunk_dokumente_haben_feste_ids(self):
+        docs = erzeuge_chunk_dokumente("abc", "Docker", nachrichten(10))
+        self.assertEqual(list(docs), [f"abc#{i}" for i in range(len(docs))])
+        for i, (doc_id, doc) in enumerate(docs.items()):
+            self.assertEqual((doc.metadata["chat_id"], doc.metadata["art"], doc.metadata["chunk"]), ("abc", "chunk", i))
+            self.assertTrue(doc.page_content.startswith("passage: Titel: Docker\n"))
+        # gleicher Inhalt -> gleiche IDs und Hashes (Upsert statt neuer Dokumente)
+        nochmal = erzeuge_chunk_dokumente("abc", "Docker", nachrichten(10))
+        self.assertEqual([d.metadata["hash"] for d in nochmal.values()], [d.metadata["hash"] for d in docs.values()])
+
+
+def treffer(chat_id, distanz):
+    return Document(page_content=f"{chat_id} {distanz}", metadata={"chat_id": chat_id}), distanz
+
+
+class ChunkTrefferTest(unittest.TestCase):
+    def setUp(self):
+        self.treffer = [treffer("a", 0.4), treffer("b", 0.3), treffer("a", 0.2), treffer("c", 0.9), treffer("a", 0.6)]
+
+    def test_max_bester_chunk_zaehlt(self):
+        ergebnis = aggregiere_chunk_treffer(self.treffer)
+        self.assertEqual([(d.metadata["chat_id"], s) for d, s in ergebnis], [("a", 0.2), ("b", 0.3), ("c", 0.9)])
+        self.assertEqual(ergebnis[0][0].page_content, "a 0.2")
+
+    def test_mean_und_k(self):
+        ergebnis = aggregiere_chunk_treffer(self.treffer, k=2, modus="mean")
+        self.assertEqual([d.metadata["chat_id"] for d, _ in ergebnis], ["b", "a"])
+        self.assertAlmostEqual(ergebnis[1][1], 0.4)
+        self.assertEqual(ergebnis[1][0].page_content, "a 0.2")  # Dokument bleibt der beste Chunk
+
+
+if __name__ == "__main__":
+    unittest.main()
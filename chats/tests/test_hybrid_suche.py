@@ -0,0 +1,124 @@
+"""
+Keyword-Suche (BM25F, agent/bm25_index.py) und Rangfusion (RRF, agent/hybrid_suche.py).
+
+    cd chats && python -m pytest -q tests
+"""
+import math
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+
+from agent.bm25_index import BM25Index, FELD_GEWICHTE, tokenisiere
+from agent.hybrid_suche import rrf_fusion, suche_hybrid
+
+
+class BM25Test(unittest.TestCase):
+    def setUp(self):
+        self.index = BM25Index(pfad=None)
+        self.index.aktualisiere("a", "Docker Compose", "Netzwerke", "ports freigeben")
+        self.index.aktualisiere("b", "Pandas", "DataFrames mit Docker laden", "merge join")
+        self.index.aktualisiere("c", "Python", "venv anlegen", "pip install")
+
+    def test_tokenisierung_ohne_stoppwoerter(self):
+        self.assertEqual(tokenisiere("Der User fragt: Wie nutze ich Docker-Compose?"), ["fragt", "nutze", "docker", "compose"])
+
+    def test_score_entspricht_bm25f(self):
+        n, df = 3, 2
+        idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+        laengen = {"a": FELD_GEWICHTE["titel"] * 2 + 1 + 2, "b": FELD_GEWICHTE["titel"] + 3 + 2}  # "mit" ist Stoppwort
+        avgdl = (laengen["a"] + laengen["b"] + FELD_GEWICHTE["titel"] + 2 + 2) / n
+
+        def erwartet(tf, laenge):
+            return idf * tf * (self.index.k1 + 1) / (tf + self.index.k1 * (1 - self.index.b + self.index.b * laenge / avgdl))
+
+        treffer = dict(self.index.suche("docker"))
+        self.assertAlmostEqual(treffer["a"], erwartet(FELD_GEWICHTE["titel"], laengen["a"]))
+        self.assertAlmostEqual(treffer["b"], erwartet(1.0, laengen["b"]))
+        self.assertEqual(set(treffer), {"a", "b"})
+
+    def test_titel_zaehlt_mehr(self):
+        # "docker" im Titel von a, nur in der Zusammenfassung von b
+        self.assertEqual([cid for cid, _ in self.index.suche("docker")], ["a", "b"])
+
+    def test_aktualisieren_und_entfernen(self):
+        self.index.aktualisiere("c", zusammenfassung="docker im venv")   # Titel und Text bleiben
+        self.assertEqual({cid for cid, _ in self.index.suche("docker")}, {"a", "b", "c"})
+        self.assertEqual([cid for cid, _ in self.index.suche("pip")], ["c"])
+        self.index.entferne("a")
+        self.assertEqual({cid for cid, _ in self.index.suche("docker")}, {"b", "c"})
+        self.assertEqual(self.index.suche("compose"), [])
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(BM25Index(pfad=None).suche("docker"), [])
+
+    def test_inkrementell_speichern_und_laden(self):
+        ordner = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, ordner, True)
+        pfad = os.path.join(ordner, "bm25.sqlite")
+        index = BM25Index(pfad=pfad)
+        index.aktualisiere("a", "Docker Compose", "Netzwerke", "ports")
+        index.aktualisiere("b", "Pandas", "DataFrames", "merge")
+        index.speichere()
+        index.entferne("b")
+        index.aktualisiere("c", "Python", "venv", "pip")
+        index.speichere()
+
+        geladen = BM25Index(pfad=pfad)
+        self.assertEqual(sorted(geladen.felder), ["a", "c"])
+        self.assertEqual(geladen.suche("docker compose"), index.suche("docker compose"))
+
+
+class VektorErsatz:
+    """similarity_search_with_score mit festen Distanzen, wie Chroma sie liefert."""
+
+    def __init__(self, distanzen):
+        self.distanzen = distanzen
+
+    def similarity_search_with_score(self, query, k):
+        treffer = [(Document(page_content=cid, metadata={"chat_id": cid.split("#")[0], "title": cid.upper()}), d)
+                   for cid, d in self.distanzen]
+        return sorted(treffer, key=lambda x: x[1])[:k]
+
+
+class RRFTest(unittest.TestCase):
+    def test_rrf_fusion(self):
+        scores = rrf_fusion([["a", "b"], ["b", "c"]], rrf_k=60)
+        self.assertAlmostEqual(scores["a"], 1 / 61)
+        self.assertAlmostEqual(scores["b"], 1 / 62 + 1 / 61)
+        self.assertAlmostEqual(scores["c"], 1 / 62)
+        gewichtet = rrf_fusion([["a", "b"], ["b", "c"]], rrf_k=60, gewichte=[2.0, 0.0])
+        self.assertEqual(max(gewichtet, key=gewichtet.get), "a")
+        self.assertEqual(gewichtet["c"], 0.0)
+
+    def test_hybrid_fuehrt_beide_ranglisten_zusammen(self):
+        bm25 = BM25Index(pfad=None)
+        bm25.aktualisiere("a", "Docker Compose", "", "")
+        bm25.aktualisiere("b", "Docker", "Docker Swarm", "docker stack")
+        bm25.aktualisiere("d", "Kochen", "", "")
+        # Vektor: a vorn (bester Chunk a#1), dann c; b fehlt
+        vectordb = VektorErsatz([("a", 0.6), ("a#1", 0.2), ("c", 0.4)])
+
+        treffer = suche_hybrid("docker", vectordb, bm25, k=10)
+        self.assertEqual([t["chat_id"] for t in treffer], ["a", "b", "c"])   # a in beiden Listen
+        a, b, c = treffer
+        self.assertEqual((a["vektor_rang"], a["bm25_rang"]), (1, 2))
+        self.assertEqual((b["vektor_rang"], b["bm25_rang"], b["embedding_relevanz"], b["keyword_relevanz"]), (None, 1, 0.0, 1.0))
+        self.assertEqual((c["bm25_rang"], c["keyword_relevanz"]), (None, 0.0))
+        self.assertEqual(a["embedding_relevanz"], 0.9)    # 1 - 0.2/2 vom besten Chunk
+        self.assertEqual((a["titel"], b["titel"]), ("A#1", ""))
+        self.assertAlmostEqual(a["score"], 1 / 61 + 1 / 62)
+
+    def test_hybrid_ohne_vektor_ist_reines_bm25(self):
+        bm25 = BM25Index(pfad=None)
+        bm25.aktualisiere("a", "Docker", "", "")
+        bm25.aktualisiere("b", "Kochen", "docker", "")
+        self.assertEqual([t["chat_id"] for t in suche_hybrid("docker", None, bm25)], [cid for cid, _ in bm25.suche("docker")])
+
+
+if __name__ == "__main__":
+    unittest.main()
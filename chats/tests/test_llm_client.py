@@ -0,0 +1,90 @@
+"""
+OllamaClient gegen den Ollama-Stub (agent/ollama_stub.py): Wiederholung, LLMFehler, Antwort-Cache.
+
+    cd chats && python -m pytest -q tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.llm_cache import LLMCache
+from agent.llm_client import OllamaClient, LLMFehler
+from agent.ollama_stub import OllamaStub
+
+
+def generate_anfragen(stub):
+    return [payload for pfad, payload in stub.anfragen if pfad == "/api/generate"]
+
+
+class OllamaClientTest(unittest.TestCase):
+    def client(self, stub, **kwargs):
+        client = OllamaClient(basis_url=stub.url, timeout_verbindung=2, timeout_token=5, timeout_gesamt=10, **kwargs)
+        self.addCleanup(client.close)
+        return client
+
+    def test_gestreamte_antwort_und_callback_mit_payload(self):
+        with OllamaStub(antwort=lambda prompt, payload: f"{payload['model']}: {prompt.upper()}") as stub:
+            tokens = []
+            antwort = self.client(stub).generiere("hallo welt", modell="llama3", bei_token=tokens.append)
+        self.assertEqual(antwort, "llama3: HALLO WELT")
+        self.assertEqual("".join(tokens), antwort)
+        self.assertTrue(generate_anfragen(stub)[0]["stream"])
+
+    def test_wiederholung_nach_serverfehler(self):
+        with OllamaStub(antwort=lambda prompt: "ok", fehler_status=[503]) as stub:
+            self.assertEqual(self.client(stub, max_versuche=3).generiere("x"), "ok")
+        self.assertEqual(len(generate_anfragen(stub)), 2)
+
+    def test_llmfehler_ohne_wiederholung_bei_client_fehler(self):
+        with OllamaStub(fehler_status=[400]) as stub:
+            with self.assertRaises(LLMFehler) as fehler:
+                self.client(stub, max_versuche=3).generiere("x")
+        self.assertEqual((fehler.exception.art, fehler.exception.status, fehler.exception.versuche), ("http", 400, 1))
+        self.assertFalse(fehler.exception.wiederholbar)
+        self.assertEqual(len(generate_anfragen(stub)), 1)
+
+    def test_llmfehler_nach_letztem_versuch(self):
+        with OllamaStub(fehler_status=[500, 500, 500]) as stub:
+            with self.assertRaises(LLMFehler) as fehler:
+                self.client(stub, max_versuche=2).generiere("x")
+        self.assertEqual((fehler.exception.status, fehler.exception.versuche), (500, 2))
+        self.assertEqual(len(generate_anfragen(stub)), 2)
+
+    def test_cache_treffer_spart_die_anfrage(self):
+        ordner = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, ordner, True)
+        cache = LLMCache(os.path.join(ordner, "llm_cache.sqlite"))
+        with OllamaStub(antwort=lambda prompt: "Zusammenfassung") as stub:
+            client = self.client(stub, cache=cache)
+            erste = client.generiere("chat", vorlage="v1")
+            tokens = []
+            zweite = client.generiere("chat", vorlage="v1", bei_token=tokens.append)
+            client.generiere("chat", vorlage="v2")  # neue Vorlagen-Version: frische Antwort
+        self.assertEqual((erste, zweite, tokens), ("Zusammenfassung", "Zusammenfassung", ["Zusammenfassung"]))
+        self.assertEqual(len(generate_anfragen(stub)), 2)
+        self.assertEqual((cache.treffer, cache.fehlschlaege), (1, 2))
+        cache.setze_statistik_zurueck()  # nächster Lauf des Import-Dienstes
+        self.assertEqual((cache.statistik()["treffer"], cache.statistik()["fehlschlaege"]), (0, 0))
+        self.assertEqual(len(cache), 2)
+
+
+class OllamaStubTest(unittest.TestCase):
+    def test_fehler_im_callback_werden_nicht_verschluckt(self):
+        def kaputt(prompt):
+            return len(prompt) + "x"  # TypeError im Callback selbst
+
+        stub = OllamaStub(antwort=kaputt)
+        self.addCleanup(stub._server.server_close)
+        with self.assertRaises(TypeError):
+            stub._erzeuge_antwort({"prompt": "hallo"})
+        stub = OllamaStub(antwort=lambda prompt, payload: payload["model"])
+        self.addCleanup(stub._server.server_close)
+        self.assertEqual(stub._erzeuge_antwort({"prompt": "hallo", "model": "llama3"}), "llama3")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+Schema-Migrationen (agent/migrationen.py) gegen SQLite: Reihenfolge, Idempotenz, Abbruch bei doppelten chat_ids,
+EXPLAIN-Prüfung der heißen Abfragen. Läuft ohne Embedding-Stack (numpy, Chroma).
+
+    cd chats && python -m pytest -q tests
+"""
+import contextlib
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent import migrationen
+from agent.migrationen import MIGRATIONEN, migriere, angewendete_versionen, pruefe_abfragen, _index_spalten
+from agent.speicher_sqlite import SQLiteVerbindung
+
+
+def still(funktion, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return funktion(*args)
+
+
+class MigrationenTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = SQLiteVerbindung(":memory:")
+        self.cursor = self.conn.cursor()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_versionen_lueckenlos_aufsteigend(self):
+        self.assertEqual([version for version, _, _ in MIGRATIONEN], list(range(1, len(MIGRATIONEN) + 1)))
+
+    def test_reihenfolge_und_idempotenz(self):
+        reihenfolge = []
+
+        def protokolliert(version, funktion):
+            return lambda cursor: (reihenfolge.append(version), funktion(cursor))
+
+        original = migrationen.MIGRATIONEN
+        migrationen.MIGRATIONEN = [(v, name, protokolliert(v, f)) for v, name, f in reversed(original)]
+        try:
+            self.assertEqual(still(migriere, self.cursor, self.conn), len(original))
+        finally:
+            migrationen.MIGRATIONEN = original
+        # aufsteigend nach Version, egal wie die Liste sortiert ist
+        self.assertEqual(reihenfolge, [v for v, _, _ in original])
+        # zweiter Lauf: nichts mehr offen
+        self.assertEqual(still(migriere, self.cursor, self.conn), 0)
+        # jede Migration verträgt auch ein erneutes Ausführen (nachgerüstete Datenbanken)
+        for _, _, funktion in MIGRATIONEN:
+            still(funktion, self.cursor)
+        self.assertEqual(angewendete_versionen(self.cursor), {v for v, _, _ in MIGRATIONEN})
+
+    def test_heisse_abfragen_nutzen_indizes(self):
+        still(migriere, self.cursor, self.conn)
+        self.cursor.execute("INSERT INTO chats (chat_id, titel) VALUES (%s, %s)", ("a", "Docker"))
+        self.assertEqual(still(pruefe_abfragen, self.cursor), [])
+
+    def test_doppelte_chat_ids_brechen_migration_3_ab(self):
+        # alte Datenbank ohne UNIQUE auf chat_id, dafür mit einem einfachen Index darauf
+        self.conn.conn.executescript(
+            "DROP TABLE chats; CREATE TABLE chats (id INTEGER PRIMARY KEY, chat_id VARCHAR(64), titel TEXT, "
+            "zusammenfassung TEXT, inhalts_hash CHAR(64), duplikat_von VARCHAR(64)); "
+            "CREATE INDEX idx_chat_id ON chats (chat_id);"
+        )
+        self.cursor.executemany("INSERT INTO chats (chat_id) VALUES (%s)", [("a",), ("a",), ("b",)])
+        with self.assertRaisesRegex(RuntimeError, r"chat_ids kommen in chats mehrfach vor \(z\. B\. a \(2x\)\)"):
+            still(migriere, self.cursor, self.conn)
+        self.assertEqual(angewendete_versionen(self.cursor), {1, 2})
+
+        self.cursor.execute("DELETE FROM chats WHERE id = 2")
+        self.assertEqual(still(migriere, self.cursor, self.conn), len(MIGRATIONEN) - 2)
+        self.assertIn((["chat_id"], True), _index_spalten(self.cursor, "chats").values())
+
+    def test_migration_4_rechnet_alte_relevanzen_um(self):
+        werte = [None, 0, 1, 3, 5, 20, 40, 100]
+        self.cursor.executemany("INSERT INTO chat_kategorien (chat_id, kategorie_id, relevanz, quelle) VALUES (%s, %s, %s, %s)",
+                                [(i, 1, relevanz, "manuell") for i, relevanz in enumerate(werte)])
+        still(migriere, self.cursor, self.conn)
+        self.cursor.execute("SELECT relevanz FROM chat_kategorien ORDER BY chat_id")
+        umgerechnet = [None, 0, 20, 60, 100, 20, 40, 100]
+        self.assertEqual([row["relevanz"] for row in self.cursor.fetchall()], umgerechnet)
+        # neue Werte liegen nie bei 1-5: erneutes Ausführen ändert nichts
+        still(MIGRATIONEN[3][2], self.cursor)
+        self.cursor.execute("SELECT relevanz FROM chat_kategorien ORDER BY chat_id")
+        self.assertEqual([row["relevanz"] for row in self.cursor.fetchall()], umgerechnet)
+
+
+if __name__ == "__main__":
+    unittest.main()
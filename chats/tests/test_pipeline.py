@@ -0,0 +1,131 @@
+"""
+Import-Pipeline (agent/pipeline.py) und DB-Stufe (task_runner.db_schritt): Fehlerzählung je Stufe,
+Rollback und Einzel-Wiederholung eines gescheiterten DB-Blocks – gegen SQLite.
+
+    cd chats && python -m pytest -q tests
+"""
+import contextlib
+import io
+import os
+import sys
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.pipeline import Pipeline
+from agent.speicher_sqlite import SQLiteVerbindung
+from agent import task_runner
+from agent.task_runner import ChatArbeit, db_schritt
+
+
+def still(funktion, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return funktion(*args)
+
+
+def stufen(statistik):
+    return {s["stufe"]: (s["eingang"], s["ausgang"], s["fehler"]) for s in statistik}
+
+
+class PipelineTest(unittest.TestCase):
+    def test_verwerfen_fehler_und_reihenfolge_der_stufen(self):
+        gesehen = []
+
+        def pruefe(x):
+            if x == 3:
+                raise ValueError("kaputt")
+            return None if x % 5 == 0 else x  # None = verwerfen (z. B. unveränderter Chat), kein Fehler
+
+        pipeline = (
+            Pipeline(queue_groesse=2)
+            .stufe("parse", pruefe)
+            .stufe("mal", lambda x: x * 10, worker=3)
+            .stufe("db", lambda block: gesehen.extend(block) or block, batch_groesse=4, batch_wartezeit=0.01)
+        )
+        statistik = still(pipeline.lauf, iter(range(1, 11)))
+        self.assertEqual(stufen(statistik), {"parse": (10, 7, 1), "mal": (7, 7, 0), "db": (7, 7, 0)})
+        self.assertEqual(sorted(gesehen), [10, 20, 40, 60, 70, 80, 90])
+        self.assertEqual(pipeline.quelle_gelesen, 10)
+
+    def test_fehlende_elemente_einer_batch_stufe_sind_fehler(self):
+        pipeline = (
+            Pipeline()
+            .stufe("parse", lambda x: x)
+            .stufe("db", lambda block: [x for x in block if x != 2], batch_groesse=10, batch_wartezeit=0.01)
+        )
+        self.assertEqual(stufen(still(pipeline.lauf, iter([1, 2, 3])))["db"], (3, 2, 1))
+
+    def test_abgebrochene_batch_stufe_zaehlt_den_ganzen_block(self):
+        def kaputt(block):
+            raise RuntimeError("DB weg")
+
+        pipeline = Pipeline().stufe("db", kaputt, batch_groesse=10, batch_wartezeit=0.01)
+        self.assertEqual(stufen(still(pipeline.lauf, iter([1, 2, 3])))["db"], (3, 0, 3))
+
+
+class Leer:
+    """BM25-/Duplikat-Index-Ersatz: db_schritt ruft nur aktualisiere/entferne/speichere."""
+
+    def aktualisiere(self, *args):
+        pass
+
+    def entferne(self, *args):
+        pass
+
+    def speichere(self):
+        pass
+
+
+def arbeit(chat_id, nachrichten=None, **kwargs):
+    jetzt = datetime(2024, 1, 1, 12, 0)
+    return ChatArbeit(chat_id=chat_id, titel=f"Chat {chat_id}", erstellt_am=jetzt, letzte_aenderung=jetzt,
+                      chat_link=f"https://chat.openai.com/c/{chat_id}",
+                      nachrichten=nachrichten or [{"rolle": "user", "text": f"Frage {chat_id}"}],
+                      inhalts_hash=f"hash-{chat_id}", inhalt=f"Chat {chat_id}", llm_noetig=True, **kwargs)
+
+
+class DBSchrittTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = SQLiteVerbindung(":memory:")
+        self.cursor = self.conn.cursor()
+        self.cursor.execute("INSERT INTO kategorien (name) VALUES (%s)", ("Docker",))
+        self.kategorien = {"Docker": self.cursor.lastrowid}
+        self.conn.commit()
+        # keine Stand-Datei unter CHROMA_PATH schreiben
+        self._markiere = task_runner.markiere_import_stand
+        task_runner.markiere_import_stand = lambda *args: None
+
+    def tearDown(self):
+        task_runner.markiere_import_stand = self._markiere
+        self.conn.close()
+
+    def test_block_wird_zurueckgerollt_und_einzeln_wiederholt(self):
+        # "b" scheitert erst in speichere_chat_nachrichten – nach dem INSERT in chats
+        arbeiten = [arbeit("a", kategorien_llm={"Docker": 80}), arbeit("b", nachrichten=["kein dict"]), arbeit("c")]
+        bekannte_hashes, llm_kategorisiert = {}, set()
+        gespeichert = still(db_schritt, arbeiten, self.kategorien, self.conn, self.cursor, Leer(), Leer(),
+                            bekannte_hashes, llm_kategorisiert)
+
+        self.assertEqual([a.chat_id for a in gespeichert], ["a", "c"])
+        self.cursor.execute("SELECT chat_id, inhalts_hash FROM chats ORDER BY chat_id")
+        self.assertEqual([(r["chat_id"], r["inhalts_hash"]) for r in self.cursor.fetchall()],
+                         [("a", "hash-a"), ("c", "hash-c")])  # kein halber Chat "b" im Commit
+        self.cursor.execute("SELECT COUNT(*) AS n FROM chat_messages")
+        self.assertEqual(self.cursor.fetchone()["n"], 2)
+        self.assertEqual(bekannte_hashes, {"a": "hash-a", "c": "hash-c"})
+        self.assertEqual(llm_kategorisiert, {"a"})
+
+    def test_fehlgeschlagenes_llm_ohne_hash(self):
+        bekannte_hashes, llm_kategorisiert = {"a": "alt"}, {"a"}
+        still(db_schritt, [arbeit("a", llm_fehlgeschlagen=True)], self.kategorien, self.conn, self.cursor,
+              Leer(), Leer(), bekannte_hashes, llm_kategorisiert)
+        self.cursor.execute("SELECT inhalts_hash, zusammenfassung FROM chats WHERE chat_id = %s", ("a",))
+        zeile = self.cursor.fetchone()
+        self.assertIsNone(zeile["inhalts_hash"])
+        self.assertEqual(zeile["zusammenfassung"], "[Noch keine LLM-Zusammenfassung]")
+        self.assertEqual((bekannte_hashes, llm_kategorisiert), ({"a": None}, set()))
+
+
+if __name__ == "__main__":
+    unittest.main()
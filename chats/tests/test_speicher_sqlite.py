@@ -0,0 +1,162 @@
+"""
+Import-Schreibpfad (db_writer) und Volltextsuche gegen das eingebettete SQLite-Backend – ohne MySQL-Server
+und ohne pymysql.
+
+    cd chats && python -m pytest -q tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+
+CHATS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CHATS)
+sys.path.insert(0, os.path.join(CHATS, "chat_agent_web"))
+
+from agent.db_writer import (
+    insert_update_chats, update_zusammenfassung, speichere_chat_nachrichten, insert_kategorien, hole_inhalts_hashes,
+    speichere_chat_detail, uebernehme_duplikat_ergebnisse, verwerfe_hashes_offener_duplikate,
+)
+from agent.speicher_sqlite import SQLiteVerbindung, VolltextIndex, ist_sqlite
+import chat_detail
+
+
+class SQLiteSchreibpfadTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = SQLiteVerbindung(":memory:")
+        self.cursor = self.conn.cursor()
+        self.cursor.executemany("INSERT INTO kategorien (name) VALUES (%s)", [("Python",), ("Docker",)])
+        self.cursor.execute("SELECT id, name FROM kategorien")
+        self.kategorien = {row["name"]: row["id"] for row in self.cursor.fetchall()}
+
+    def tearDown(self):
+        self.conn.close()
+
+    def lege_chat_an(self, chat_id, titel, zusammenfassung, nachrichten, inhalts_hash="h"):
+        db_id = insert_update_chats(chat_id, titel, "2024-01-01 10:00:00", "2024-01-02 10:00:00", len(nachrichten),
+                                    f"https://chatgpt.com/c/{chat_id}", zusammenfassung, self.cursor, inhalts_hash)
+        # wie im Import: erst Platzhalter, die Zusammenfassung kommt danach
+        update_zusammenfassung(db_id, zusammenfassung, self.cursor)
+        speichere_chat_nachrichten(db_id, nachrichten, self.cursor)
+        return db_id
+
+    def test_cursor_ist_sqlite(self):
+        self.assertTrue(ist_sqlite(self.cursor))
+
+    def test_chat_upsert_und_hashes(self):
+        db_id = self.lege_chat_an("a", "Docker Compose", "Netzwerke", [{"rolle": "user", "text": "hallo"}], "h1")
+        # Re-Import: gleiche Zeile, neuer Hash, Nachrichten ersetzt statt angehängt
+        self.assertEqual(self.lege_chat_an("a", "Docker Compose", "Netzwerke",
+                                           [{"rolle": "user", "text": "neu"}, {"rolle": "assistant", "text": "ok"}],
+                                           "h2"), db_id)
+        self.assertEqual(hole_inhalts_hashes(self.cursor), {"a": "h2"})
+        self.cursor.execute("SELECT text FROM chat_messages WHERE chat_id = %s ORDER BY position", (db_id,))
+        self.assertEqual([row["text"] for row in self.cursor.fetchall()], ["neu", "ok"])
+
+    def test_kategorien_und_detail(self):
+        db_id = self.lege_chat_an("a", "Docker Compose", "Netzwerke", [{"rolle": "user", "text": "hallo"}])
+        insert_kategorien({"Docker": 80, "Python": 40, "Unbekannt": 10}, self.kategorien, {"Docker"}, db_id, self.cursor)
+        insert_kategorien({"Docker": 60}, self.kategorien, {"Docker"}, db_id, self.cursor)
+
+        daten, etag, aktualisiert_am = speichere_chat_detail(db_id, self.cursor)
+        self.assertEqual([(k["name"], k["relevanz"], k["quelle"]) for k in daten["kategorien"]],
+                         [("Docker", 60, "llama3"), ("Python", 40, "manuell")])
+        self.assertEqual(daten["nachrichten"], [{"rolle": "user", "text": "hallo", "erstellt_am": None}])
+        # unveränderter Inhalt: gleicher ETag, Zeitstempel bleibt stehen
+        self.assertEqual(speichere_chat_detail(db_id, self.cursor)[1:], (etag, aktualisiert_am))
+        self.assertIsNone(speichere_chat_detail(db_id + 1, self.cursor))
+
+    def test_duplikate_uebernehmen(self):
+        original = self.lege_chat_an("a", "Docker Compose", "Netzwerke im Compose-File",
+                                     [{"rolle": "user", "text": "compose netzwerk"}])
+        kopie = self.lege_chat_an("b", "Docker Compose (Kopie)", "noch offen",
+                                  [{"rolle": "user", "text": "compose netzwerk"}])
+        insert_kategorien({"Docker": 80}, self.kategorien, {"Docker"}, original, self.cursor)
+        insert_kategorien({"Python": 20}, self.kategorien, set(), kopie, self.cursor)
+
+        self.assertEqual(uebernehme_duplikat_ergebnisse({"b": "a"}, self.cursor),
+                         [(kopie, "b", "Netzwerke im Compose-File")])
+        self.cursor.execute("SELECT kategorie_id, quelle FROM chat_kategorien WHERE chat_id = %s ORDER BY quelle", (kopie,))
+        self.assertEqual([(row["kategorie_id"], row["quelle"]) for row in self.cursor.fetchall()],
+                         [(self.kategorien["Docker"], "llama3"), (self.kategorien["Python"], "manuell")])
+
+    def test_duplikate_eines_gescheiterten_originals_verlieren_den_hash(self):
+        self.lege_chat_an("a", "Docker", "[Noch keine LLM-Zusammenfassung]", [{"rolle": "user", "text": "x"}], None)
+        self.lege_chat_an("b", "Docker (Kopie)", "x", [{"rolle": "user", "text": "x"}], "hb")
+        self.lege_chat_an("c", "Pandas", "y", [{"rolle": "user", "text": "y"}], "hc")
+        self.lege_chat_an("d", "Pandas (Kopie)", "y", [{"rolle": "user", "text": "y"}], "hd")
+        uebernehme_duplikat_ergebnisse({"b": "a", "d": "c"}, self.cursor)
+
+        self.assertEqual(verwerfe_hashes_offener_duplikate(["b", "d"], self.cursor), ["b"])
+        self.assertEqual(hole_inhalts_hashes(self.cursor), {"a": None, "b": None, "c": "hc", "d": "hd"})
+        self.assertEqual(verwerfe_hashes_offener_duplikate([], self.cursor), [])
+
+    def test_volltextsuche(self):
+        self.lege_chat_an("a", "Docker Compose", "Netzwerke im Compose-File", [{"rolle": "user", "text": "ports freigeben"}])
+        self.lege_chat_an("b", "Pandas", "DataFrames zusammenführen", [{"rolle": "user", "text": "merge mit docker daten"}])
+        self.lege_chat_an("c", "Docker Compose", "Netzwerke im Compose-File", [{"rolle": "user", "text": "ports freigeben"}])
+        index = VolltextIndex(verbindung=self.conn)
+
+        treffer = index.suche("docker", k=10)
+        self.assertEqual({chat_id for chat_id, _ in treffer}, {"a", "b", "c"})
+        self.assertEqual(sorted(chat_id for chat_id, _ in index.suche("freigeben", k=10)), ["a", "c"])
+        self.assertEqual(index.suche("", k=10), [])
+
+        # Duplikate tauchen in der Suche nicht mehr auf
+        uebernehme_duplikat_ergebnisse({"c": "a"}, self.cursor)
+        self.assertEqual({chat_id for chat_id, _ in index.suche("docker", k=10)}, {"a", "b"})
+        self.assertEqual([chat_id for chat_id, _ in index.suche("freigeben", k=10)], ["a"])
+        index.close()  # fremde Verbindung bleibt offen
+        self.assertEqual(len(index), 3)
+
+
+class SQLiteDetailansichtTest(unittest.TestCase):
+    """lade_chat_detail (/chat/<id>) mit dem SQLite-Backend – eigene Datei, weil jede Anfrage die Verbindung schließt."""
+
+    def setUp(self):
+        self.ordner = tempfile.mkdtemp()
+        self.pfad = os.path.join(self.ordner, "gptchats.sqlite")
+        with SQLiteVerbindung(self.pfad) as conn:
+            cursor = conn.cursor()
+            self.chat = insert_update_chats("a", "Docker Compose", "2024-01-01 10:00:00", "2024-01-02 10:00:00", 1,
+                                            "https://chatgpt.com/c/a", "Netzwerke", cursor, "h")
+            self.nachbar = insert_update_chats("b", "Docker Swarm", "2024-01-01 10:00:00", "2024-01-02 10:00:00", 0,
+                                               "https://chatgpt.com/c/b", "Cluster", cursor, "h")
+            speichere_chat_nachrichten(self.chat, [{"rolle": "user", "text": "hallo"}], cursor)
+            conn.commit()
+        self._verbinde = chat_detail.erzeuge_db_verbindung
+        chat_detail.erzeuge_db_verbindung = lambda: SQLiteVerbindung(self.pfad)
+
+    def tearDown(self):
+        chat_detail.erzeuge_db_verbindung = self._verbinde
+        shutil.rmtree(self.ordner, ignore_errors=True)
+
+    def test_detail_wird_materialisiert_und_gelesen(self):
+        erster = chat_detail.lade_chat_detail(self.chat)      # noch nicht in chat_details: bauen und committen
+        zweiter = chat_detail.lade_chat_detail(self.chat)     # jetzt aus chat_details (json.loads)
+        self.assertEqual(erster, zweiter)
+        self.assertEqual(zweiter["chat"]["titel"], "Docker Compose")
+        self.assertEqual(zweiter["chat"]["nachrichten"], [{"rolle": "user", "text": "hallo", "erstellt_am": None}])
+        self.assertEqual(zweiter["chat"]["aehnliche"], [])
+        # Last-Modified braucht ein datetime, keinen Text aus SQLite
+        self.assertIsInstance(zweiter["geaendert"], datetime)
+        self.assertIsNone(chat_detail.lade_chat_detail(self.nachbar + 1))
+
+    def test_aehnliche_chats_aendern_etag_und_zeitstempel(self):
+        ohne = chat_detail.lade_chat_detail(self.chat)
+        spaeter = datetime(2030, 1, 1, 12, 0)
+        with SQLiteVerbindung(self.pfad) as conn:
+            conn.cursor().execute(
+                "INSERT INTO chat_nachbarn (chat_id, rang, nachbar_id, aehnlichkeit, aktualisiert_am) VALUES (%s, %s, %s, %s, %s)",
+                (self.chat, 0, self.nachbar, 0.91234, spaeter))
+            conn.commit()
+        mit = chat_detail.lade_chat_detail(self.chat)
+        self.assertEqual(mit["chat"]["aehnliche"], [{"id": self.nachbar, "titel": "Docker Swarm", "aehnlichkeit": 0.912}])
+        self.assertNotEqual(mit["etag"], ohne["etag"])
+        self.assertEqual(mit["geaendert"], spaeter)
+
+
+if __name__ == "__main__":
+    unittest.main()
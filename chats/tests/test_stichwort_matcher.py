@@ -0,0 +1,73 @@
+"""
+Aho-Corasick-Automat (agent/stichwort_matcher.py): überlappende Treffer, Wortgrenzen, erneutes Kompilieren.
+
+    cd chats && python -m pytest -q tests
+"""
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.stichwort_matcher import StichwortMatcher, Treffer, kategorie_matcher, _klein
+
+
+def teilwort_matcher(*muster):
+    matcher = StichwortMatcher()
+    for m in muster:
+        matcher.fuege_hinzu(m, wortgrenzen=False)
+    return matcher
+
+
+class StichwortMatcherTest(unittest.TestCase):
+    def test_ueberlappende_treffer(self):
+        matcher = teilwort_matcher("he", "she", "his", "hers")
+        self.assertEqual(sorted(matcher.finde("ushers")), [
+            Treffer(1, 4, "she", "she"), Treffer(2, 4, "he", "he"), Treffer(2, 6, "hers", "hers"),
+        ])
+
+    def test_wortgrenzen(self):
+        matcher = StichwortMatcher.aus_mapping({"docker": "Docker", "ki": "KI"})
+        self.assertEqual(matcher.werte("Docker-Compose und KI"), {"Docker", "KI"})
+        self.assertEqual(matcher.werte("dockerfile, Kiste"), set())
+        self.assertEqual(matcher.werte("docker_compose"), set())  # _ zählt wie im Regex als Wortzeichen
+        teilwort = StichwortMatcher.aus_mapping({"docker": "Docker", "ki": "KI"}, wortgrenzen=False)
+        self.assertEqual(teilwort.werte("dockerfile, Kiste"), {"Docker", "KI"})
+
+    def test_gross_klein_und_werte(self):
+        matcher = kategorie_matcher({"python": 1, "Machine Learning": 2}, wortgrenzen=False)
+        self.assertEqual(matcher.werte("PYTHON für machine learning"), {1, 2})
+        self.assertEqual(matcher.finde(""), [])
+        self.assertEqual(StichwortMatcher().finde("text"), [])
+
+    def test_erneutes_kompilieren_verdoppelt_nichts(self):
+        matcher = teilwort_matcher("he", "she")
+        self.assertEqual(len(matcher.finde("she")), 2)
+        matcher.fuege_hinzu("hers", wortgrenzen=False)
+        self.assertEqual(sorted(t.muster for t in matcher.finde("she")), ["he", "she"])
+        matcher.kompiliere().kompiliere()
+        self.assertEqual(sorted(t.muster for t in matcher.finde("ushers")), ["he", "hers", "she"])
+
+    def test_parallel_erster_aufruf(self):
+        matcher = teilwort_matcher("he", "she", "hers")
+        ergebnisse = []
+        threads = [threading.Thread(target=lambda: ergebnisse.append(len(matcher.finde("ushers")))) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(ergebnisse, [3] * 8)
+
+    def test_kleinschreibung_mit_laengenaenderung(self):
+        # "İ".lower() ist zwei Zeichen lang – die Positionen müssen trotzdem zum Originaltext passen
+        self.assertEqual(len("İ".lower()), 2)
+        text = "İstanbul Docker"
+        self.assertEqual(len(_klein(text)), len(text))
+        treffer = StichwortMatcher().fuege_hinzu("docker", "Docker").finde(text)
+        self.assertEqual(treffer, [Treffer(9, 15, "docker", "Docker")])
+        self.assertEqual(text[treffer[0].start:treffer[0].ende], "Docker")
+
+
+if __name__ == "__main__":
+    unittest.main()
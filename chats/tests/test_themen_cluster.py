@@ -0,0 +1,164 @@
+"""
+Themen-Clustering (agent/themen_cluster.py): Mini-Batch-k-Means, c-TF-IDF-Schlüsselwörter, Abdeckung durch
+Kategorien nach Migration 4 und inkrementelle Zuordnung neuer Chats – auf SQLite.
+
+    cd chats && python -m pytest -q tests
+"""
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.db_writer import insert_update_chats
+from agent.migrationen import migriere
+from agent.speicher_sqlite import SQLiteVerbindung
+from agent.themen_cluster import mini_batch_kmeans, ordne_zu, schluesselwoerter, clustere, ordne_neue_chats_zu
+
+THEMEN = {
+    "docker": ("Docker Compose Netzwerk", "Container Ports im Compose-File freigeben"),
+    "pandas": ("Pandas DataFrame merge", "DataFrames über Spalten zusammenführen"),
+    "kochen": ("Rezept Linsensuppe", "Suppe mit Linsen und Curry kochen"),
+}
+
+
+def blobs(anzahl, dimension=8, rauschen=0.05, seed=0):
+    """Je Thema ein Bündel um eine eigene Achse – klar getrennte Cluster."""
+    rng = np.random.default_rng(seed)
+    vektoren = {}
+    for achse, thema in enumerate(THEMEN):
+        zentrum = np.eye(dimension)[achse]
+        vektoren[thema] = [zentrum + rng.normal(scale=rauschen, size=dimension) for _ in range(anzahl)]
+    return vektoren
+
+
+def normiert(liste):
+    matrix = np.asarray(liste, dtype=np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+class KMeansTest(unittest.TestCase):
+    def test_findet_getrennte_cluster(self):
+        vektoren = blobs(30)
+        matrix = normiert([v for liste in vektoren.values() for v in liste])
+        zentroiden = mini_batch_kmeans(matrix, 3, batch_groesse=32, iterationen=50)
+        np.testing.assert_allclose(np.linalg.norm(zentroiden, axis=1), 1, rtol=1e-5)
+
+        cluster, aehnlichkeit = ordne_zu(matrix, zentroiden)
+        je_thema = [set(cluster[i * 30:(i + 1) * 30].tolist()) for i in range(3)]
+        self.assertEqual([len(c) for c in je_thema], [1, 1, 1])            # jedes Thema in genau einem Cluster
+        self.assertEqual(len(set.union(*je_thema)), 3)                      # und jedes in einem eigenen
+        self.assertTrue((aehnlichkeit > 0.9).all())
+
+    def test_k_groesser_als_n(self):
+        matrix = normiert(blobs(1)["docker"] + blobs(1)["pandas"])
+        self.assertEqual(len(mini_batch_kmeans(matrix, 10)), 2)
+
+    def test_schluesselwoerter_ctfidf(self):
+        woerter = schluesselwoerter({
+            0: ["Docker Compose Netzwerk", "Docker Volumes", "Python Docker SDK"],
+            1: ["Python venv", "venv pip 2024"],
+        }, anzahl=2)
+        self.assertEqual(woerter[0][0], "docker")
+        self.assertEqual(woerter[1], ["venv", "pip"])   # python steht in beiden Clustern, Zahlen zählen nicht
+
+
+class VektorErsatz:
+    def __init__(self):
+        self.embeddings = {}
+
+    def get(self, include=None, **kwargs):
+        chat_ids = list(self.embeddings)
+        return {"ids": chat_ids, "embeddings": [self.embeddings[c] for c in chat_ids],
+                "metadatas": [{"chat_id": c} for c in chat_ids]}
+
+
+class ClusterLaufTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = SQLiteVerbindung(":memory:")
+        self.cursor = self.conn.cursor()
+        self.ordner = tempfile.mkdtemp()
+        self.pfad = os.path.join(self.ordner, "themen_zentroiden.npy")
+        self.vectordb = VektorErsatz()
+        self.cursor.executemany("INSERT INTO kategorien (name) VALUES (%s)", [("Docker",), ("Kochen",)])
+        self.cursor.execute("SELECT id, name FROM kategorien")
+        kategorien = {row["name"]: row["id"] for row in self.cursor.fetchall()}
+
+        self.ids = {}
+        for thema, vektoren in blobs(12).items():
+            titel, zusammenfassung = THEMEN[thema]
+            for i, vektor in enumerate(vektoren):
+                db_id = self.lege_an(f"{thema}{i}", titel, zusammenfassung, vektor)
+                self.ids.setdefault(thema, []).append(db_id)
+                if thema == "docker":    # alte Skala 1-5 (import_chat_infos_pymysql)
+                    self.zuordnen(db_id, kategorien["Docker"], 3)
+                elif thema == "kochen":  # neue Skala, aber unter der Schwelle 40
+                    self.zuordnen(db_id, kategorien["Kochen"], 20)
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.ordner, ignore_errors=True)
+
+    def lege_an(self, chat_id, titel, zusammenfassung, vektor):
+        self.vectordb.embeddings[chat_id] = [float(x) for x in vektor]
+        return insert_update_chats(chat_id, titel, "2024-01-01 10:00:00", "2024-01-01 10:00:00", 1,
+                                   f"https://chatgpt.com/c/{chat_id}", zusammenfassung, self.cursor, "h")
+
+    def zuordnen(self, chat_db_id, kategorie_id, relevanz):
+        self.cursor.execute("INSERT INTO chat_kategorien (chat_id, kategorie_id, relevanz, quelle) VALUES (%s, %s, %s, %s)",
+                            (chat_db_id, kategorie_id, relevanz, "manuell"))
+
+    def clustere(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            themen = clustere(self.cursor, self.vectordb, k=3, pfad=self.pfad)
+        self.cursor.execute("SELECT chat_id, thema_id FROM chat_themen")
+        zuordnung = {row["chat_id"]: row["thema_id"] for row in self.cursor.fetchall()}
+        return {zuordnung[self.ids[thema][0]]: thema for thema in THEMEN}, {t["id"]: t for t in themen}, zuordnung
+
+    def test_migration_4_macht_alte_relevanzen_sichtbar(self):
+        thema_von, themen, _ = self.clustere()
+        vorschlaege = {thema_von[c] for c, t in themen.items() if t["vorschlag"]}
+        self.assertEqual(vorschlaege, {"docker", "pandas", "kochen"})  # Relevanz 3 und 20 liegen unter 40
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            migriere(self.cursor, self.conn)
+        self.cursor.execute("SELECT DISTINCT relevanz FROM chat_kategorien ORDER BY relevanz")
+        self.assertEqual([row["relevanz"] for row in self.cursor.fetchall()], [20, 60])  # 3 -> 60, 20 bleibt
+
+        thema_von, themen, _ = self.clustere()
+        nach_thema = {thema_von[c]: t for c, t in themen.items()}
+        self.assertEqual((nach_thema["docker"]["top_kategorie"], nach_thema["docker"]["abdeckung"]), ("docker", 1.0))
+        self.assertFalse(nach_thema["docker"]["vorschlag"])
+        self.assertTrue(nach_thema["pandas"]["vorschlag"] and nach_thema["kochen"]["vorschlag"])
+        self.assertEqual(nach_thema["pandas"]["groesse"], 12)
+        self.assertIn("pandas", nach_thema["pandas"]["schluesselwoerter"])
+        self.cursor.execute("SELECT COUNT(*) AS n FROM themen WHERE vorschlag = 1")
+        self.assertEqual(self.cursor.fetchone()["n"], 2)
+
+    def test_neue_chats_und_duplikate_inkrementell(self):
+        self.assertEqual(ordne_neue_chats_zu(self.cursor, self.vectordb, ["x"], pfad=self.pfad), 0)  # noch kein Modell
+        thema_von, _, _ = self.clustere()
+        pandas = {t: c for c, t in thema_von.items()}["pandas"]
+
+        neu = self.lege_an("neu", "Pandas groupby", "", blobs(1, seed=7)["pandas"][0])
+        self.cursor.execute("UPDATE chats SET duplikat_von = %s WHERE id = %s", ("docker0", self.ids["docker"][1]))
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(ordne_neue_chats_zu(self.cursor, self.vectordb, ["neu"], pfad=self.pfad), 1)
+
+        self.cursor.execute("SELECT chat_id, thema_id FROM chat_themen")
+        zuordnung = {row["chat_id"]: row["thema_id"] for row in self.cursor.fetchall()}
+        self.assertEqual(zuordnung[neu], pandas)
+        self.assertNotIn(self.ids["docker"][1], zuordnung)
+        self.cursor.execute("SELECT id, groesse FROM themen")
+        groessen = {thema_von[row["id"]]: row["groesse"] for row in self.cursor.fetchall()}
+        self.assertEqual(groessen, {"docker": 11, "pandas": 13, "kochen": 12})
+
+
+if __name__ == "__main__":
+    unittest.main()
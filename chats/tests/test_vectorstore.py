@@ -0,0 +1,112 @@
+"""
+Embedding-Schreibpfad (agent/vectorstore.py): Upsert über feste IDs gegen eine flüchtige Chroma-Collection,
+eingebettet mit einem deterministischen Test-Encoder statt des echten Modells.
+
+    cd chats && python -m pytest -q tests
+"""
+import contextlib
+import hashlib
+import io
+import os
+import sys
+import unittest
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+
+from agent.vectorstore import EmbeddingSchreiber, speichere_embedding, hole_chat_embeddings, entferne_chat_dokumente
+
+
+class HashEmbeddings(Embeddings):
+    """Zählt die Encoder-Aufrufe; gleicher Text -> gleicher Vektor."""
+
+    def __init__(self):
+        self.aufrufe = []
+
+    def _vektor(self, text):
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        return [b / 255 for b in digest[:8]]
+
+    def embed_documents(self, texts):
+        self.aufrufe.append(len(texts))
+        return [self._vektor(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vektor(text)
+
+
+def still(funktion, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return funktion(*args, **kwargs)
+
+
+class EmbeddingUpsertTest(unittest.TestCase):
+    def setUp(self):
+        self.encoder = HashEmbeddings()
+        self.vectordb = Chroma(collection_name=f"test_{uuid.uuid4().hex}", embedding_function=self.encoder)
+
+    def tearDown(self):
+        self.vectordb.delete_collection()
+
+    def ids(self):
+        return sorted(self.vectordb.get(include=[])["ids"])
+
+    def test_reimport_ueberschreibt_statt_anzuhaengen(self):
+        still(speichere_embedding, "a", "Docker", "Netzwerke", "alt", self.vectordb)
+        still(speichere_embedding, "a", "Docker", "Netzwerke", "neu", self.vectordb)
+        self.assertEqual(self.ids(), ["a"])
+        self.assertIn("Inhalt: neu", self.vectordb.get(ids=["a"])["documents"][0])
+
+    def test_overwrite_false_ueberspringt_vorhandene(self):
+        still(speichere_embedding, "a", "Docker", "Netzwerke", "alt", self.vectordb)
+        still(speichere_embedding, "a", "Docker", "Netzwerke", "neu", self.vectordb, overwrite=False)
+        self.assertIn("Inhalt: alt", self.vectordb.get(ids=["a"])["documents"][0])
+
+    def test_schreiber_puffert_und_schreibt_blockweise(self):
+        schreiber = EmbeddingSchreiber(self.vectordb, batch_groesse=3)
+        still(schreiber.hinzufuegen, "a", "A", "s", "x")
+        still(schreiber.hinzufuegen, "b", "B", "s", "x")
+        still(schreiber.hinzufuegen, "a", "A", "s", "y")   # gleicher Chat im selben Block: letzter Stand gewinnt
+        self.assertEqual(self.ids(), [])                     # noch nichts geschrieben
+        self.assertEqual(still(schreiber.flush), 2)
+        self.assertEqual(self.encoder.aufrufe, [2])          # ein Encoder-Aufruf für den ganzen Block
+        self.assertIn("Inhalt: y", self.vectordb.get(ids=["a"])["documents"][0])
+        self.assertEqual(still(schreiber.flush), 0)
+
+        for chat_id in "cde":
+            still(schreiber.hinzufuegen, chat_id, chat_id.upper(), "s", "x")  # der dritte löst den Flush aus
+        self.assertEqual(self.ids(), ["a", "b", "c", "d", "e"])
+
+    def test_alte_dokumente_mit_zufalls_ids_werden_ersetzt(self):
+        # Stand vor dem Upsert: add_documents ohne IDs, mehrfach pro Chat
+        still(self.vectordb.add_texts, ["alt 1", "alt 2"], metadatas=[{"chat_id": "a"}, {"chat_id": "a"}])
+        still(speichere_embedding, "a", "Docker", "Netzwerke", "neu", self.vectordb)
+        self.assertEqual(self.ids(), ["a"])
+        self.assertEqual(list(hole_chat_embeddings(self.vectordb)), ["a"])
+
+    def test_chunks_mit_ids_und_veraltete_chunks(self):
+        lang = [{"rolle": "user", "text": " ".join(f"w{i}" for i in range(1200))}]
+        still(speichere_embedding, "a", "Docker", "Netzwerke", "x", self.vectordb, nachrichten=lang)
+        chunk_ids = [i for i in self.ids() if i != "a"]
+        self.assertGreater(len(chunk_ids), 1)
+        self.assertEqual(sorted(chunk_ids), sorted(f"a#{n}" for n in range(len(chunk_ids))))
+        # nur die Zusammenfassung zählt als Chat-Vektor
+        self.assertEqual(list(hole_chat_embeddings(self.vectordb)), ["a"])
+
+        # Chat ist kürzer geworden: überzählige Chunks verschwinden
+        still(speichere_embedding, "a", "Docker", "Netzwerke", "x", self.vectordb, nachrichten=[{"rolle": "user", "text": "kurz"}])
+        self.assertEqual(self.ids(), ["a", "a#0"])
+
+    def test_duplikate_entfernen(self):
+        still(speichere_embedding, "a", "Docker", "Netzwerke", "x", self.vectordb)
+        still(speichere_embedding, "b", "Docker", "Netzwerke", "x", self.vectordb)
+        self.assertEqual(still(entferne_chat_dokumente, self.vectordb, ["b"]), 1)
+        self.assertEqual(self.ids(), ["a"])
+        self.assertEqual(entferne_chat_dokumente(self.vectordb, []), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+Map-Reduce-Zusammenfassung langer Chats (agent/zusammenfassen.py) mit einem aufzeichnenden Ersatz-Client.
+
+    cd chats && python -m pytest -q tests
+"""
+import contextlib
+import io
+import os
+import sys
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.chunking import erzeuge_chunks
+from agent.llm_client import LLMFehler
+from agent.zusammenfassen import (
+    fasse_chat_zusammen, ZUSAMMENFASSUNG_FEHLGESCHLAGEN, ZUSAMMENFASSUNG_VORLAGE, ABSCHNITT_VORLAGE, REDUKTION_VORLAGE,
+)
+
+MAX_TOKENS = 30
+
+
+class AufzeichnenderClient:
+    """generiere() wie OllamaClient; antwortet je Vorlage, scheitert bei Prompts mit einem der Fehler-Wörter."""
+
+    def __init__(self, fehler_bei=(), abschnitt_woerter=2):
+        self.fehler_bei = fehler_bei
+        self.abschnitt_woerter = abschnitt_woerter
+        self.aufrufe = []
+        self._lock = threading.Lock()
+
+    def generiere(self, prompt, vorlage=None, **kwargs):
+        with self._lock:
+            self.aufrufe.append((vorlage, prompt))
+            nummer = len(self.aufrufe)
+        if any(wort in prompt for wort in self.fehler_bei) or vorlage in self.fehler_bei:
+            raise LLMFehler("http", "kaputt", status=500)
+        if vorlage == ABSCHNITT_VORLAGE:
+            return " ".join(f"teil{nummer}" for _ in range(self.abschnitt_woerter))
+        return f"{vorlage}:{nummer}"
+
+    def prompts(self, vorlage):
+        return [p for v, p in self.aufrufe if v == vorlage]
+
+
+def nachrichten(anzahl):
+    return [{"rolle": "user", "text": " ".join(f"n{i}w{j}" for j in range(12))} for i in range(anzahl)]
+
+
+class ZusammenfassenTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(self.pool.shutdown)
+
+    def fasse(self, verlauf, client):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fasse_chat_zusammen(verlauf, client, max_tokens=MAX_TOKENS, pool=self.pool)
+
+    def test_kurzer_chat_ein_aufruf(self):
+        client = AufzeichnenderClient()
+        self.assertEqual(self.fasse(nachrichten(1), client), f"{ZUSAMMENFASSUNG_VORLAGE}:1")
+        self.assertEqual([v for v, _ in client.aufrufe], [ZUSAMMENFASSUNG_VORLAGE])
+        self.assertEqual(self.fasse([], client), "[Noch keine LLM-Zusammenfassung]")
+
+    def test_langer_chat_map_reduce(self):
+        verlauf = nachrichten(8)
+        abschnitte = erzeuge_chunks(verlauf, max_tokens=MAX_TOKENS, overlap_tokens=0)
+        self.assertGreater(len(abschnitte), 2)
+        client = AufzeichnenderClient()
+        ergebnis = self.fasse(verlauf, client)
+
+        # jeder Abschnitt genau einmal, der ganze Thread ist abgedeckt
+        map_prompts = client.prompts(ABSCHNITT_VORLAGE)
+        self.assertEqual(len(map_prompts), len(abschnitte))
+        self.assertEqual(sorted(p.split("\n\n", 1)[1] for p in map_prompts), sorted(abschnitte))
+        self.assertIn("n7w11", "".join(map_prompts))
+        # ein abschließender Reduce über alle Teile, in Reihenfolge der Abschnitte
+        reduce_prompts = client.prompts(REDUKTION_VORLAGE)
+        self.assertEqual(len(reduce_prompts), 1)
+        self.assertEqual(reduce_prompts[0].count("\n- "), len(abschnitte))
+        self.assertEqual(ergebnis, f"{REDUKTION_VORLAGE}:{len(client.aufrufe)}")
+
+    def test_wachsender_chat_wiederholt_die_vorderen_prompts(self):
+        alt, neu = AufzeichnenderClient(), AufzeichnenderClient()
+        self.fasse(nachrichten(6), alt)
+        self.fasse(nachrichten(10), neu)
+        # gleiche Prompts -> Treffer im LLM-Cache; nur der angeschnittene letzte Abschnitt ändert sich
+        alte = set(alt.prompts(ABSCHNITT_VORLAGE))
+        self.assertEqual(len(alte & set(neu.prompts(ABSCHNITT_VORLAGE))), len(alte) - 1)
+
+    def test_lange_teilzusammenfassungen_werden_vorverdichtet(self):
+        client = AufzeichnenderClient(abschnitt_woerter=12)
+        ergebnis = self.fasse(nachrichten(12), client)
+        vorverdichtet = [p for p in client.prompts(ABSCHNITT_VORLAGE) if "\n\n- " in p]
+        self.assertTrue(vorverdichtet)
+        self.assertEqual(ergebnis, f"{REDUKTION_VORLAGE}:{len(client.aufrufe)}")
+
+    def test_gescheiterte_abschnitte(self):
+        # ein Abschnitt scheitert: der Rest wird trotzdem verdichtet
+        client = AufzeichnenderClient(fehler_bei=("n0w0",))
+        self.assertTrue(self.fasse(nachrichten(8), client).startswith(REDUKTION_VORLAGE))
+        abschnitte = erzeuge_chunks(nachrichten(8), max_tokens=MAX_TOKENS, overlap_tokens=0)
+        self.assertEqual(client.prompts(REDUKTION_VORLAGE)[0].count("\n- "), len(abschnitte) - 1)
+        # alle Abschnitte oder der Reduce scheitern: Platzhalter, damit der Import den Chat erneut versucht
+        self.assertEqual(self.fasse(nachrichten(8), AufzeichnenderClient(fehler_bei=(ABSCHNITT_VORLAGE,))),
+                         ZUSAMMENFASSUNG_FEHLGESCHLAGEN)
+        self.assertEqual(self.fasse(nachrichten(8), AufzeichnenderClient(fehler_bei=(REDUKTION_VORLAGE,))),
+                         ZUSAMMENFASSUNG_FEHLGESCHLAGEN)
+        self.assertEqual(self.fasse(nachrichten(1), AufzeichnenderClient(fehler_bei=(ZUSAMMENFASSUNG_VORLAGE,))),
+                         ZUSAMMENFASSUNG_FEHLGESCHLAGEN)
+
+
+if __name__ == "__main__":
+    unittest.main()